@@ -10,7 +10,7 @@ Copyright 2014 Miguel Grinberg.
 from flask import Flask
 from structlog import get_logger
 
-from .config import config
+from .config import check_config, config
 from . import dashboard  # noqa: F401
 
 
@@ -27,14 +27,27 @@ def create_app(profile='production'):
 
     # apply configuration
     app.config.from_object(config[profile])
+    check_config(app.config)
     # init_app configuration hook is used for logging/structlog setup
     config[profile].init_app(app)
 
     logger = get_logger("ltddasher")
     logger.debug('Starting LTD Dasher')
 
+    # create the shared Jinja environment and compile templates up front
+    from .dashboard.render import init_jinja_env
+    init_jinja_env(app.config)
+    from .dashboard.fragments import init_fragment_cache
+    init_fragment_cache(app.config)
+
     # register blueprints
     from .routes import api as api_blueprint
     app.register_blueprint(api_blueprint, url_prefix=None)
 
+    # queue that runs dashboard builds in the background
+    from .jobs import BuildQueue
+    from .worker import get_build_stages
+    app.extensions['build_queue'] = BuildQueue(app.config,
+                                               get_build_stages(app.config))
+
     return app
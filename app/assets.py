@@ -0,0 +1,250 @@
+"""Manifest of the dashboard's static assets and incremental asset sync.
+
+The manifest lists the path and SHA-256 digest of every file in
+``app/dashboard/assets`` along with a ``version`` that identifies the whole
+bundle. It is generated when the Docker image is built::
+
+   python -m app.assets
+
+A copy of the manifest is uploaded with the assets to a product's
+``_dasher-assets`` prefix. `sync_assets` compares that copy with the local
+manifest and only uploads files that are new or changed (or nothing at all
+if the versions match).
+"""
+
+import hashlib
+import json
+import os
+import threading
+
+from botocore.exceptions import ClientError
+from ltdconveyor.s3 import (create_dir_redirect_object, upload_file,
+                            upload_object)
+from structlog import get_logger
+
+
+__all__ = ['ASSETS_DIR', 'MANIFEST_PATH', 'BUCKET_MANIFEST_NAME',
+           'build_manifest', 'write_manifest', 'get_manifest',
+           'diff_manifests', 'sync_assets']
+
+
+# Local directory of compiled static assets
+ASSETS_DIR = os.path.join(os.path.dirname(__file__), 'dashboard', 'assets')
+
+# Local path of the manifest generated at image build time
+MANIFEST_PATH = os.path.join(os.path.dirname(__file__), 'dashboard',
+                             'assets-manifest.json')
+
+# Name of the manifest object uploaded to an assets prefix in the bucket
+BUCKET_MANIFEST_NAME = '_manifest.json'
+
+_manifest = None
+_manifest_lock = threading.Lock()
+
+# Sync digests of the assets already synced by this process, keyed by
+# (bucket name, bucket prefix)
+_synced = {}
+_synced_lock = threading.Lock()
+
+
+def build_manifest(assets_dir=ASSETS_DIR):
+    """Build a manifest of the files in an assets directory.
+
+    Parameters
+    ----------
+    assets_dir : `str`, optional
+        Local directory of static assets.
+
+    Returns
+    -------
+    manifest : `dict`
+        Manifest with a ``files`` field that maps POSIX-style paths, relative
+        to ``assets_dir``, to SHA-256 digests of the file contents, and a
+        ``version`` field that is a digest of ``files``.
+    """
+    files = {}
+    for rootdir, dirnames, filenames in os.walk(assets_dir):
+        for filename in filenames:
+            local_path = os.path.join(rootdir, filename)
+            relative_path = os.path.relpath(local_path, assets_dir)
+            relative_path = relative_path.replace(os.sep, '/')
+            with open(local_path, 'rb') as f:
+                files[relative_path] = hashlib.sha256(f.read()).hexdigest()
+    version = hashlib.sha256(
+        json.dumps(files, sort_keys=True).encode('utf-8')).hexdigest()
+    return {'version': version, 'files': files}
+
+
+def write_manifest(manifest, path=MANIFEST_PATH):
+    """Write a manifest as JSON."""
+    with open(path, 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+
+
+def get_manifest():
+    """Get the manifest of the local static assets.
+
+    The manifest generated at image build time is used if present;
+    otherwise (such as in development) it is built from
+    ``app/dashboard/assets``. Either way, it's loaded once per process.
+    """
+    global _manifest
+    with _manifest_lock:
+        if _manifest is None:
+            try:
+                with open(MANIFEST_PATH, 'r') as f:
+                    _manifest = json.load(f)
+            except OSError:
+                _manifest = build_manifest()
+        return _manifest
+
+
+def diff_manifests(local_manifest, remote_manifest):
+    """Compare a local manifest with a manifest of assets in a bucket.
+
+    Parameters
+    ----------
+    local_manifest : `dict`
+        Manifest of the local assets.
+    remote_manifest : `dict` or `None`
+        Manifest of the assets in the bucket, or `None` if unknown.
+
+    Returns
+    -------
+    changed_paths : `list` of `str`
+        Paths of files that are new or changed locally, sorted.
+    removed_paths : `list` of `str`
+        Paths of files that are only in the bucket, sorted.
+    """
+    local_files = local_manifest['files']
+    remote_files = remote_manifest['files'] if remote_manifest else {}
+    changed_paths = sorted(path for path, digest in local_files.items()
+                           if remote_files.get(path) != digest)
+    removed_paths = sorted(set(remote_files) - set(local_files))
+    return changed_paths, removed_paths
+
+
+def sync_assets(bucket, bucket_prefix, metadata=None, acl=None,
+                cache_control=None, manifest=None, assets_dir=ASSETS_DIR):
+    """Sync local static assets to a prefix in an S3 bucket, uploading only
+    new or changed files.
+
+    Parameters
+    ----------
+    bucket : boto3 Bucket instance
+        S3 bucket.
+    bucket_prefix : `str`
+        Directory in the bucket for the assets.
+    metadata : `dict`, optional
+        Header metadata values for every object.
+    acl : `str`, optional
+        A pre-canned access control list for every object.
+    cache_control : `str`, optional
+        The cache-control header value for every object.
+    manifest : `dict`, optional
+        Manifest of the local assets. Default is `get_manifest`.
+    assets_dir : `str`, optional
+        Local directory of static assets.
+
+    Returns
+    -------
+    changed : `bool`
+        `True` if any object was uploaded or deleted.
+
+    Notes
+    -----
+    The bucket's copy of the manifest also records the object headers. If
+    the headers change, all files are uploaded again.
+    """
+    logger = get_logger("ltddasher")
+
+    if manifest is None:
+        manifest = get_manifest()
+    headers = {'metadata': metadata or {},
+               'acl': acl,
+               'cache_control': cache_control}
+    sync_digest = hashlib.sha256(
+        json.dumps([manifest['version'], headers],
+                   sort_keys=True).encode('utf-8')).hexdigest()
+
+    synced_key = (bucket.name, bucket_prefix)
+    with _synced_lock:
+        if _synced.get(synced_key) == sync_digest:
+            logger.debug('Assets already synced', prefix=bucket_prefix,
+                         version=manifest['version'])
+            return False
+
+    manifest_path = '/'.join((bucket_prefix, BUCKET_MANIFEST_NAME))
+    remote_manifest = _read_bucket_manifest(bucket, manifest_path)
+    if remote_manifest is not None \
+            and remote_manifest.get('headers') != headers:
+        # Headers changed, so every object has to be rewritten
+        remote_manifest = None
+    changed_paths, removed_paths = diff_manifests(manifest, remote_manifest)
+    changed = bool(changed_paths or removed_paths or remote_manifest is None)
+
+    for path in changed_paths:
+        logger.debug('Uploading asset', path=path)
+        upload_file(os.path.join(assets_dir, *path.split('/')),
+                    '/'.join((bucket_prefix, path)),
+                    bucket,
+                    metadata=metadata,
+                    acl=acl,
+                    cache_control=cache_control)
+
+    if removed_paths:
+        logger.debug('Deleting assets', paths=removed_paths)
+        bucket.delete_objects(Delete={
+            'Objects': [{'Key': '/'.join((bucket_prefix, path))}
+                        for path in removed_paths]})
+
+    if remote_manifest is None:
+        # Directory redirect objects only need to be written once
+        dirnames = set(os.path.dirname(path) for path in manifest['files'])
+        for dirname in sorted(dirnames):
+            create_dir_redirect_object(
+                '/'.join(p for p in (bucket_prefix, dirname) if p),
+                bucket,
+                metadata=metadata,
+                acl=acl,
+                cache_control=cache_control)
+
+    if changed:
+        # The manifest goes last so that it only describes assets that were
+        # successfully uploaded
+        bucket_manifest = dict(manifest, headers=headers)
+        upload_object(manifest_path,
+                      bucket,
+                      content=json.dumps(bucket_manifest, sort_keys=True),
+                      acl=acl,
+                      cache_control='no-cache',
+                      content_type='application/json')
+
+    logger.info('Synced assets', prefix=bucket_prefix,
+                version=manifest['version'],
+                uploaded=len(changed_paths),
+                deleted=len(removed_paths))
+
+    with _synced_lock:
+        _synced[synced_key] = sync_digest
+    return changed
+
+
+def _read_bucket_manifest(bucket, manifest_path):
+    try:
+        response = bucket.Object(manifest_path).get()
+    except ClientError as e:
+        if e.response['Error']['Code'] in ('403', '404', 'NoSuchKey'):
+            return None
+        raise
+    try:
+        return json.loads(response['Body'].read().decode('utf-8'))
+    except ValueError:
+        return None
+
+
+if __name__ == '__main__':
+    manifest = build_manifest()
+    write_manifest(manifest)
+    print('Wrote {0} (version {1}, {2:d} files)'.format(
+        MANIFEST_PATH, manifest['version'], len(manifest['files'])))
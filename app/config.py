@@ -4,9 +4,12 @@ import abc
 import os
 import logging
 import sys
+import tempfile
 
 import structlog
 
+from .exceptions import ConfigurationError
+
 
 BASEDIR = os.path.abspath(os.path.dirname(__file__))
 
@@ -23,6 +26,141 @@ class Config(object):
     AWS_SECRET = os.getenv('LTD_DASHER_AWS_SECRET')
     FASTLY_KEY = os.getenv('LTD_DASHER_FASTLY_KEY')
     FASTLY_SERVICE_ID = os.getenv('LTD_DASHER_FASTLY_ID')
+    # Seconds to collect surrogate keys from product builds before purging
+    # them together in one Fastly API call
+    FASTLY_PURGE_WINDOW = float(
+        os.getenv('LTD_DASHER_FASTLY_PURGE_WINDOW', '1'))
+    # Soft purge dashboards, and let Fastly serve stale dashboards while it
+    # revalidates (or for a longer time if the origin errors), in seconds
+    FASTLY_SOFT_PURGE = os.getenv(
+        'LTD_DASHER_FASTLY_SOFT_PURGE', 'false').lower() == 'true'
+    DASHBOARD_STALE_WHILE_REVALIDATE = int(
+        os.getenv('LTD_DASHER_DASHBOARD_STALE_WHILE_REVALIDATE', '60'))
+    DASHBOARD_STALE_IF_ERROR = int(
+        os.getenv('LTD_DASHER_DASHBOARD_STALE_IF_ERROR', '86400'))
+
+    # Number of threads (per process) that run each stage of product
+    # dashboard builds
+    BUILD_FETCH_WORKERS = int(
+        os.getenv('LTD_DASHER_BUILD_FETCH_WORKERS', '4'))
+    BUILD_RENDER_WORKERS = int(
+        os.getenv('LTD_DASHER_BUILD_RENDER_WORKERS', '2'))
+    BUILD_PUBLISH_WORKERS = int(
+        os.getenv('LTD_DASHER_BUILD_PUBLISH_WORKERS', '4'))
+    # Number of products that can wait between two build stages
+    BUILD_STAGE_QUEUE_SIZE = int(
+        os.getenv('LTD_DASHER_BUILD_STAGE_QUEUE_SIZE', '4'))
+    # Number of finished build jobs whose status is remembered
+    BUILD_JOB_HISTORY = int(os.getenv('LTD_DASHER_BUILD_JOB_HISTORY', '100'))
+    # Run builds synchronously within the POST /build request
+    BUILD_QUEUE_EAGER = False
+
+    # Parse the bulk dashboard endpoint's response incrementally as it's
+    # downloaded, rather than loading the whole JSON document
+    KEEPER_STREAM_BULK_DATA = os.getenv(
+        'LTD_DASHER_KEEPER_STREAM_BULK_DATA', 'true').lower() == 'true'
+
+    # Number of concurrent requests when loading individual edition and
+    # build resources (if Keeper's bulk dashboard endpoint is unavailable),
+    # per fetch thread (see KEEPER_POOL_SIZE)
+    KEEPER_FETCH_CONCURRENCY = int(
+        os.getenv('LTD_DASHER_KEEPER_FETCH_CONCURRENCY', '8'))
+
+    # Keeper API HTTP client: connection pool size (per process), connect
+    # and read timeouts (seconds), and retries with exponential backoff for
+    # 5xx responses and connection errors. Every fetch thread can have
+    # KEEPER_FETCH_CONCURRENCY requests in flight, so the pool size defaults
+    # to KEEPER_FETCH_CONCURRENCY * BUILD_FETCH_WORKERS; a smaller pool makes
+    # requests wait for, or discard, connections.
+    KEEPER_POOL_SIZE = int(os.getenv(
+        'LTD_DASHER_KEEPER_POOL_SIZE',
+        KEEPER_FETCH_CONCURRENCY * BUILD_FETCH_WORKERS))
+    KEEPER_CONNECT_TIMEOUT = float(
+        os.getenv('LTD_DASHER_KEEPER_CONNECT_TIMEOUT', '5'))
+    KEEPER_READ_TIMEOUT = float(
+        os.getenv('LTD_DASHER_KEEPER_READ_TIMEOUT', '60'))
+    KEEPER_RETRIES = int(os.getenv('LTD_DASHER_KEEPER_RETRIES', '3'))
+    KEEPER_BACKOFF_FACTOR = float(
+        os.getenv('LTD_DASHER_KEEPER_BACKOFF_FACTOR', '0.5'))
+
+    # Send conditional requests (ETag/Last-Modified) to Keeper's bulk
+    # dashboard endpoint, and skip builds if the data is not modified
+    KEEPER_CONDITIONAL_GET = os.getenv(
+        'LTD_DASHER_KEEPER_CONDITIONAL_GET', 'true').lower() == 'true'
+    # Number of products whose validators are cached
+    KEEPER_VALIDATOR_CACHE_SIZE = int(
+        os.getenv('LTD_DASHER_KEEPER_VALIDATOR_CACHE_SIZE', '100'))
+
+    # Shared, content-addressed static assets for all products. If
+    # SHARED_ASSETS_URL (the public URL of SHARED_ASSETS_PREFIX in the
+    # bucket) is set, assets are published once to
+    # (SHARED_ASSETS_PREFIX)/(manifest version)/ rather than to every
+    # product's _dasher-assets directory. SHARED_ASSETS_BUCKET is required
+    # with SHARED_ASSETS_URL (see check_config).
+    SHARED_ASSETS_URL = os.getenv('LTD_DASHER_SHARED_ASSETS_URL')
+    SHARED_ASSETS_BUCKET = os.getenv('LTD_DASHER_SHARED_ASSETS_BUCKET')
+    SHARED_ASSETS_PREFIX = os.getenv('LTD_DASHER_SHARED_ASSETS_PREFIX',
+                                     '_dasher-assets')
+    SHARED_ASSETS_SURROGATE_KEY = os.getenv(
+        'LTD_DASHER_SHARED_ASSETS_SURROGATE_KEY', 'ltd-dasher-assets')
+
+    # Reload Jinja templates when they change on disk
+    JINJA_AUTO_RELOAD = False
+    # Directory for compiled Jinja templates, shared by processes and
+    # persisted across process restarts
+    JINJA_BYTECODE_CACHE_DIR = os.getenv(
+        'LTD_DASHER_JINJA_BYTECODE_CACHE_DIR',
+        os.path.join(tempfile.gettempdir(), 'ltd-dasher-jinja'))
+
+    # Number of rendered edition and build items cached (per process) so
+    # that unchanged items aren't rendered again; 0 disables the cache.
+    # An item is about 2 KB, so the default costs about 10 MiB in each
+    # uWSGI process and in each render process (see RENDER_PROCESSES).
+    FRAGMENT_CACHE_SIZE = int(
+        os.getenv('LTD_DASHER_FRAGMENT_CACHE_SIZE', '5000'))
+
+    # Directory for snapshots of the datasets and pages of published
+    # dashboards, shared by processes and persisted across process restarts;
+    # pages whose datasets are unchanged are not rendered again
+    DATASET_SNAPSHOT_DIR = os.getenv(
+        'LTD_DASHER_DATASET_SNAPSHOT_DIR',
+        os.path.join(tempfile.gettempdir(), 'ltd-dasher-snapshots'))
+
+    # Size of the connection pool of the (per-process) S3 client
+    S3_MAX_POOL_CONNECTIONS = int(
+        os.getenv('LTD_DASHER_S3_MAX_POOL_CONNECTIONS', '20'))
+
+    # Number of processes (per request process) that render the dashboards
+    # of large products; 0 renders all products in the build threads
+    RENDER_PROCESSES = int(os.getenv('LTD_DASHER_RENDER_PROCESSES', '0'))
+    # Minimum number of editions and builds of a product for its dashboards
+    # to be rendered by the render processes
+    RENDER_PROCESS_THRESHOLD = int(
+        os.getenv('LTD_DASHER_RENDER_PROCESS_THRESHOLD', '5000'))
+
+    # Maximum number of releases, and of development editions, on the edition
+    # dashboard; older editions are on a separate page (v/_dasher-older/).
+    # 0 shows all editions on the edition dashboard.
+    EDITION_DASHBOARD_MAX_EDITIONS = int(
+        os.getenv('LTD_DASHER_EDITION_DASHBOARD_MAX_EDITIONS', '100'))
+
+    # Number of items of each list rendered in the dashboard pages' HTML; the
+    # browser renders the other items from the pages' JSON data (index.json).
+    # 0 renders all items in the HTML.
+    DASHBOARD_FIRST_SCREEN_ITEMS = int(
+        os.getenv('LTD_DASHER_DASHBOARD_FIRST_SCREEN_ITEMS', '0'))
+
+    # Number of days after the end of a year before its builds move from the
+    # build dashboard to the year's archive page (builds/archive/(year)/)
+    BUILD_ARCHIVE_DAYS = int(os.getenv('LTD_DASHER_BUILD_ARCHIVE_DAYS', '90'))
+    # Browser cache lifetime (seconds) of build archive pages, which Fastly
+    # caches until an archive page changes
+    BUILD_ARCHIVE_MAX_AGE = int(
+        os.getenv('LTD_DASHER_BUILD_ARCHIVE_MAX_AGE', '604800'))
+
+    # Number of concurrent uploads when publishing a product's dashboards
+    PUBLISH_CONCURRENCY = int(
+        os.getenv('LTD_DASHER_PUBLISH_CONCURRENCY', '5'))
 
     @abc.abstractclassmethod
     def init_app(cls, app):
@@ -71,6 +209,7 @@ class DevelopmentConfig(Config):
     """Local development configuration."""
 
     DEBUG = True
+    JINJA_AUTO_RELOAD = True
 
     @classmethod
     def init_app(cls, app):
@@ -86,6 +225,10 @@ class TestConfig(Config):
     AWS_SECRET = "aws_test_secret"
     FASTLY_KEY = "fastly_test_key"
     FASTLY_SERVICE_ID = "fastly_test_id"
+    BUILD_QUEUE_EAGER = True
+    KEEPER_BACKOFF_FACTOR = 0.
+    JINJA_BYTECODE_CACHE_DIR = None
+    DATASET_SNAPSHOT_DIR = None
 
     @classmethod
     def init_app(cls, app):
@@ -136,6 +279,26 @@ class ProductionConfig(Config):
         )
 
 
+def check_config(config):
+    """Check the consistency of an application configuration.
+
+    Parameters
+    ----------
+    config : `flask.config`
+        Flask configuration.
+
+    Raises
+    ------
+    app.exceptions.ConfigurationError
+        Raised if the configuration is invalid.
+    """
+    if config['SHARED_ASSETS_URL'] and not config['SHARED_ASSETS_BUCKET']:
+        # Otherwise each product would get its own copy of the shared assets
+        raise ConfigurationError(
+            'LTD_DASHER_SHARED_ASSETS_BUCKET must be set with '
+            'LTD_DASHER_SHARED_ASSETS_URL')
+
+
 config = {
     'development': DevelopmentConfig,
     'testing': TestConfig,
@@ -0,0 +1,129 @@
+"""Cache of the rendered markup of dashboard items.
+
+Most editions, and almost all builds, don't change between dashboard
+builds, so the HTML of each item (from the ``_edition_item.jinja`` and
+``_build_item.jinja`` templates) is cached and spliced into the dashboard
+pages. Only new or changed items are rendered by Jinja.
+
+Items are cached by the values of the fields their template uses, along
+with the template name and the digest of the templates (see
+`app.dashboard.render.get_templates_digest`), so a cached fragment is never
+stale. The cache is per-process and holds up to ``FRAGMENT_CACHE_SIZE``
+fragments (about 2 KB each), evicting the least recently used first.
+"""
+
+from collections import OrderedDict
+import threading
+
+
+__all__ = ['FragmentCache', 'init_fragment_cache', 'get_fragment_cache']
+
+
+class FragmentCache(object):
+    """LRU cache of rendered HTML fragments, with hit and miss counters.
+
+    Parameters
+    ----------
+    max_size : `int`, optional
+        Maximum number of fragments. Nothing is cached if ``0``.
+    """
+
+    def __init__(self, max_size=5000):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._fragments = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_render(self, key, render):
+        """Get a fragment from the cache, or render and cache it.
+
+        Parameters
+        ----------
+        key : hashable
+            Cache key of the fragment.
+        render : callable
+            Function, called without arguments, that renders the fragment
+            if it's not cached.
+
+        Returns
+        -------
+        fragment : `str`
+            The rendered fragment.
+        """
+        with self._lock:
+            try:
+                self._fragments.move_to_end(key)
+            except KeyError:
+                self.misses += 1
+            else:
+                self.hits += 1
+                return self._fragments[key]
+
+        # Rendered outside the lock so that threads render concurrently
+        fragment = render()
+
+        if self.max_size > 0:
+            with self._lock:
+                self._fragments[key] = fragment
+                while len(self._fragments) > self.max_size:
+                    self._fragments.popitem(last=False)
+                    self.evictions += 1
+        return fragment
+
+    def clear(self):
+        """Remove all fragments (the counters are kept)."""
+        with self._lock:
+            self._fragments.clear()
+
+    def stats(self):
+        """Get the cache's counters.
+
+        Returns
+        -------
+        stats : `dict`
+            The cache's ``size`` and ``max_size``, the number of ``hits``,
+            ``misses`` and ``evictions``, and the ``hit_rate`` (`None`
+            before the first lookup).
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._fragments),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else None,
+            }
+
+
+def init_fragment_cache(config):
+    """Create the process-wide `FragmentCache` (see `get_fragment_cache`)
+    with the size set by the ``FRAGMENT_CACHE_SIZE`` configuration.
+
+    This is called by `app.create_app`.
+    """
+    global _cache
+    cache = FragmentCache(max_size=config['FRAGMENT_CACHE_SIZE'])
+    with _cache_lock:
+        _cache = cache
+    return cache
+
+
+def get_fragment_cache():
+    """Get the process-wide `FragmentCache`.
+
+    If `init_fragment_cache` hasn't been called, a cache with the default
+    size is created.
+    """
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = FragmentCache()
+        return _cache
+
+
+_cache = None
+_cache_lock = threading.Lock()
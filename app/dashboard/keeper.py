@@ -0,0 +1,124 @@
+"""HTTP client for the LTD Keeper API."""
+
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+__all__ = ['KeeperClient', 'get_keeper_client']
+
+
+# HTTP status codes from Keeper that are worth retrying
+RETRY_STATUS_CODES = (500, 502, 503, 504)
+
+# Cache of KeeperClient instances, keyed by their settings
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+class KeeperClient(object):
+    """Client for the LTD Keeper API that owns a pooled `requests.Session`.
+
+    Connections are kept alive and reused across requests. Requests that
+    fail with a 5xx status or a connection error are retried with
+    exponential backoff.
+
+    Parameters
+    ----------
+    pool_size : `int`, optional
+        Maximum number of connections to keep open per host. This should be
+        at least as large as the number of threads sharing the client.
+    connect_timeout : `float`, optional
+        Timeout, in seconds, for establishing a connection.
+    read_timeout : `float`, optional
+        Timeout, in seconds, between bytes received from the server.
+    retries : `int`, optional
+        Maximum number of retries for a request.
+    backoff_factor : `float`, optional
+        Backoff factor for retries. The delay before the *n*\\ th retry is
+        ``backoff_factor * 2 ** (n - 1)`` seconds.
+    """
+
+    def __init__(self, pool_size=10, connect_timeout=5., read_timeout=60.,
+                 retries=3, backoff_factor=0.5):
+        self.timeout = (connect_timeout, read_timeout)
+
+        retry = Retry(total=retries,
+                      connect=retries,
+                      read=retries,
+                      status=retries,
+                      backoff_factor=backoff_factor,
+                      status_forcelist=RETRY_STATUS_CODES,
+                      raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=pool_size,
+                              pool_maxsize=pool_size,
+                              max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    @classmethod
+    def from_config(cls, config):
+        """Create a client from the ``KEEPER_*`` Flask configuration
+        settings.
+        """
+        return cls(**_settings_from_config(config))
+
+    def get(self, url, **kwargs):
+        """Send a GET request.
+
+        Parameters
+        ----------
+        url : `str`
+            URL of the resource.
+        **kwargs
+            Additional keyword arguments passed to
+            `requests.Session.get`.
+
+        Returns
+        -------
+        response : `requests.Response`
+            The response.
+        """
+        kwargs.setdefault('timeout', self.timeout)
+        return self.session.get(url, **kwargs)
+
+
+def get_keeper_client(config=None):
+    """Get the process-wide `KeeperClient` for a configuration.
+
+    Parameters
+    ----------
+    config : `flask.config`, optional
+        Flask configuration. If `None`, a client with default settings is
+        returned.
+
+    Returns
+    -------
+    client : `KeeperClient`
+        A shared client instance.
+    """
+    if config is None:
+        settings = {}
+    else:
+        settings = _settings_from_config(config)
+    key = tuple(sorted(settings.items()))
+    with _clients_lock:
+        try:
+            return _clients[key]
+        except KeyError:
+            client = KeeperClient(**settings)
+            _clients[key] = client
+            return client
+
+
+def _settings_from_config(config):
+    return {
+        'pool_size': config['KEEPER_POOL_SIZE'],
+        'connect_timeout': config['KEEPER_CONNECT_TIMEOUT'],
+        'read_timeout': config['KEEPER_READ_TIMEOUT'],
+        'retries': config['KEEPER_RETRIES'],
+        'backoff_factor': config['KEEPER_BACKOFF_FACTOR'],
+    }
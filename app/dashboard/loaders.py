@@ -2,32 +2,176 @@
 
 import os
 import json
+from contextlib import closing
+from concurrent.futures import ThreadPoolExecutor
 
+import ijson
 import requests
 from structlog import get_logger
 
+from ..exceptions import KeeperError, KeeperNotModified
+from .keeper import get_keeper_client
+from .records import (Build, Edition, project_records,
+                      record_json_default)
+
+
+def load_bulk_dashboard_data(product_url, keeper=None,
+                             validator_cache=None, stream=False):
+    """Retrieve data about the product, its editions and builds from the
+    Keeper API's bulk ``/products/(slug)/dashboard`` endpoint.
+
+    Parameters
+    ----------
+    product_url : `str`
+        URL for the product's resource in the Keeper API (e.g.,
+        `"https://keeper.lsst.codes/products/developer"`).
+    keeper : `app.dashboard.keeper.KeeperClient`, optional
+        Keeper API client. The default client is used if `None`.
+    validator_cache : `app.dashboard.validatorcache.ValidatorCache`, optional
+        If set, the request is a conditional GET using the product's cached
+        validators, and the validators of a fresh response are staged in
+        the cache.
+    stream : `bool`, optional
+        If `True`, the response body is parsed incrementally as it's
+        downloaded, and each edition and build is projected into a record
+        as soon as it's parsed (see `_parse_bulk_stream`). The whole JSON
+        document is never held in memory.
+
+    Returns
+    -------
+    product_data : `dict`
+        Dictionary with the product resource data.
+    edition_data : `dict`
+        Dictionary of `~app.dashboard.records.Edition` records, keyed by
+        edition slug.
+    build_data : `dict`
+        Dictionary of `~app.dashboard.records.Build` records, keyed by
+        build slug.
+
+    Raises
+    ------
+    requests.HTTPError
+        Raised if the bulk endpoint responds with an error status.
+    app.exceptions.KeeperNotModified
+        Raised if the data hasn't changed since the cached response.
+    app.exceptions.KeeperError
+        Raised if the bulk endpoint responds with ``304 Not Modified``
+        although no validators are cached for the product (e.g., after a
+        restart or an eviction), since there's no data to use.
+    """
+    if keeper is None:
+        keeper = get_keeper_client()
 
-def load_bulk_dashboard_data(product_url):
     bulk_url = "%s/dashboard" % product_url
 
     logger = get_logger("ltddasher")
     logger.info("Getting data from bulk endpoint", url=bulk_url)
 
-    r = requests.get(bulk_url)
-    r.raise_for_status()
+    headers = {}
+    cached = None
+    if validator_cache is not None:
+        cached = validator_cache.get(product_url)
+        if cached is not None:
+            if cached.etag is not None:
+                headers['If-None-Match'] = cached.etag
+            if cached.last_modified is not None:
+                headers['If-Modified-Since'] = cached.last_modified
+
+    r = keeper.get(bulk_url, headers=headers, stream=stream)
+    with closing(r):
+        if r.status_code == 304:
+            if cached is None:
+                raise KeeperError(
+                    'Unexpected 304 response without cached validators: '
+                    '{0}'.format(bulk_url),
+                    failed_urls=[bulk_url])
+            logger.info("Bulk endpoint data not modified", url=bulk_url)
+            raise KeeperNotModified(product_url)
+        r.raise_for_status()
 
-    data = r.json()
+        if stream:
+            product_data, edition_data, build_data = _parse_bulk_stream(r)
+        else:
+            data = r.json()
+            product_data = data['product']
+            edition_data = project_records(Edition, data['editions'])
+            build_data = project_records(Build, data['builds'])
 
-    product_data = data['product']
-    edition_data = {e['slug']: e for e in data['editions']}
-    build_data = {b['slug']: b for b in data['builds']}
+    if validator_cache is not None:
+        validator_cache.stage(product_url,
+                              r.headers.get('ETag'),
+                              r.headers.get('Last-Modified'))
 
     logger.info("Finished getting data from bulk endpoint", url=bulk_url)
 
     return product_data, edition_data, build_data
 
 
-def load_product_data(product_url):
+def _parse_bulk_stream(response):
+    """Parse a streamed response from the bulk dashboard endpoint.
+
+    Parameters
+    ----------
+    response : `requests.Response`
+        Response, requested with ``stream=True``.
+
+    Returns
+    -------
+    product_data : `dict`
+        Dictionary with the product resource data.
+    edition_data : `dict`
+        Dictionary of `~app.dashboard.records.Edition` records, keyed by
+        edition slug.
+    build_data : `dict`
+        Dictionary of `~app.dashboard.records.Build` records, keyed by
+        build slug.
+
+    Raises
+    ------
+    ValueError
+        Raised if the response isn't a JSON document with ``product``,
+        ``editions`` and ``builds`` fields.
+    """
+    # Decode any gzip or deflate content encoding while reading
+    response.raw.decode_content = True
+
+    product_data = None
+    edition_data = {}
+    build_data = {}
+    datasets = {'editions.item': (Edition, edition_data),
+                'builds.item': (Build, build_data)}
+    builder = None
+    try:
+        for prefix, event, value in ijson.parse(response.raw,
+                                                use_float=True):
+            if builder is None:
+                # Only the product and each edition or build are built as
+                # objects
+                if event == 'start_map' \
+                        and (prefix == 'product' or prefix in datasets):
+                    builder = ijson.ObjectBuilder()
+                    builder_prefix = prefix
+                    builder.event(event, value)
+                continue
+
+            builder.event(event, value)
+            if event == 'end_map' and prefix == builder_prefix:
+                if prefix == 'product':
+                    product_data = builder.value
+                else:
+                    record_class, records = datasets[prefix]
+                    record = record_class.from_json(builder.value)
+                    records[record.slug] = record
+                builder = None
+    except ijson.JSONError as e:
+        raise ValueError('Invalid bulk dashboard JSON: {0}'.format(e))
+
+    if product_data is None:
+        raise ValueError('Bulk dashboard JSON has no product')
+    return product_data, edition_data, build_data
+
+
+def load_product_data(product_url, keeper=None):
     """Retrieve data about the product and its editions from the Keeper API.
 
     Parameters
@@ -35,6 +179,8 @@ def load_product_data(product_url):
     product_url : `str`
         URL for the product's resource in the Keeper API (e.g.,
         `"https://keeper.lsst.codes/products/developer"`).
+    keeper : `app.dashboard.keeper.KeeperClient`, optional
+        Keeper API client. The default client is used if `None`.
 
     Returns
     -------
@@ -55,12 +201,14 @@ def load_product_data(product_url):
     # }
     logger = get_logger("ltddasher")
     logger = logger.debug('load_product_data')
-    r = requests.get(product_url)
+    if keeper is None:
+        keeper = get_keeper_client()
+    r = keeper.get(product_url)
     return r.json()
 
 
-def load_edition_data(product_url):
-    r"""Retrieve all edition resources for a particular product from the
+def load_edition_data(product_url, keeper=None, concurrency=1):
+    """Retrieve all edition resources for a particular product from the
     Keeper API.
 
     Parameters
@@ -68,60 +216,147 @@ def load_edition_data(product_url):
     product_url : `str`
         URL for the product's resource in the Keeper API (e.g.,
         `"https://keeper.lsst.codes/products/developer"`).
+    keeper : `app.dashboard.keeper.KeeperClient`, optional
+        Keeper API client. The default client is used if `None`.
+    concurrency : `int`, optional
+        Maximum number of edition resources to request concurrently.
 
     Returns
     -------
     edition_data : `dict`
-        Dictionary keyed by edition slug, containing `dict`\ s of edition
-        data.
+        Dictionary of `~app.dashboard.records.Edition` records, keyed by
+        edition slug.
+
+    Raises
+    ------
+    app.exceptions.KeeperError
+        Raised if any edition resource can't be retrieved.
     """
     logger = get_logger("ltddasher")
     logger = logger.debug('load_edition_data')
 
+    if keeper is None:
+        keeper = get_keeper_client()
+
     edition_root_url = product_url + '/editions/'
-    r = requests.get(edition_root_url)
+    r = keeper.get(edition_root_url)
     edition_urls = r.json()['editions']
 
-    edition_data = {}
-    for edition_url in edition_urls:
-        # {
-        #     "build_url": "https://keeper.lsst.codes/builds/1278",
-        #     "date_created": "2017-01-27T20:43:55Z",
-        #     "date_ended": null,
-        #     "date_rebuilt": "2017-01-27T20:45:04Z",
-        #     "product_url": "https://keeper.lsst.codes/products/developer",
-        #     "published_url": "https://developer.lsst.io/v/DM-8995",
-        #     "self_url": "https://keeper.lsst.codes/editions/327",
-        #     "slug": "DM-8995",
-        #     "surrogate_key": "1482f52465e34e3da958edbfcaf6de35",
-        #     "title": "DM-8995",
-        #     "tracked_refs": [
-        #         "tickets/DM-8995"
-        #     ]
-        # }
-        r = requests.get(edition_url)
-        edition_object = r.json()
-        edition_data[edition_object['slug']] = edition_object
+    # Each edition resource looks like:
+    # {
+    #     "build_url": "https://keeper.lsst.codes/builds/1278",
+    #     "date_created": "2017-01-27T20:43:55Z",
+    #     "date_ended": null,
+    #     "date_rebuilt": "2017-01-27T20:45:04Z",
+    #     "product_url": "https://keeper.lsst.codes/products/developer",
+    #     "published_url": "https://developer.lsst.io/v/DM-8995",
+    #     "self_url": "https://keeper.lsst.codes/editions/327",
+    #     "slug": "DM-8995",
+    #     "surrogate_key": "1482f52465e34e3da958edbfcaf6de35",
+    #     "title": "DM-8995",
+    #     "tracked_refs": [
+    #         "tickets/DM-8995"
+    #     ]
+    # }
+    edition_objects = _load_resources(edition_urls, keeper,
+                                      concurrency=concurrency)
+    edition_data = project_records(Edition, edition_objects)
     return edition_data
 
 
-def load_build_data(product_url):
+def load_build_data(product_url, keeper=None, concurrency=1):
+    """Retrieve all build resources for a particular product from the
+    Keeper API.
+
+    Parameters
+    ----------
+    product_url : `str`
+        URL for the product's resource in the Keeper API (e.g.,
+        `"https://keeper.lsst.codes/products/developer"`).
+    keeper : `app.dashboard.keeper.KeeperClient`, optional
+        Keeper API client. The default client is used if `None`.
+    concurrency : `int`, optional
+        Maximum number of build resources to request concurrently.
+
+    Returns
+    -------
+    build_data : `dict`
+        Dictionary of `~app.dashboard.records.Build` records, keyed by
+        build slug.
+
+    Raises
+    ------
+    app.exceptions.KeeperError
+        Raised if any build resource can't be retrieved.
+    """
     logger = get_logger("ltddasher")
     logger = logger.debug('load_build_data')
 
+    if keeper is None:
+        keeper = get_keeper_client()
+
     build_root_url = product_url + '/builds/'
-    r = requests.get(build_root_url)
+    r = keeper.get(build_root_url)
     build_urls = r.json()['builds']
 
-    build_data = {}
-    for build_url in build_urls:
-        r = requests.get(build_url)
-        build_object = r.json()
-        build_data[build_object['slug']] = build_object
-
+    build_objects = _load_resources(build_urls, keeper,
+                                    concurrency=concurrency)
+    build_data = project_records(Build, build_objects)
     return build_data
 
 
+def _load_resources(urls, keeper, concurrency=1):
+    """Retrieve a list of Keeper resources, up to ``concurrency`` at a time.
+
+    Parameters
+    ----------
+    urls : `list` of `str`
+        Resource URLs.
+    keeper : `app.dashboard.keeper.KeeperClient`
+        Keeper API client.
+    concurrency : `int`, optional
+        Maximum number of concurrent requests.
+
+    Returns
+    -------
+    resources : `list` of `dict`
+        Resource data, in the same order as ``urls``.
+
+    Raises
+    ------
+    app.exceptions.KeeperError
+        Raised, once all requests have finished, if any resource couldn't
+        be retrieved.
+    """
+    logger = get_logger("ltddasher")
+
+    def load(url):
+        try:
+            r = keeper.get(url)
+            r.raise_for_status()
+            return r.json()
+        except (requests.RequestException, ValueError) as e:
+            logger.warning('Failed to load Keeper resource', url=url,
+                           error=str(e))
+            return e
+
+    if concurrency > 1 and len(urls) > 1:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            # map yields results in the order of urls
+            results = list(executor.map(load, urls))
+    else:
+        results = [load(url) for url in urls]
+
+    failed_urls = [url for url, result in zip(urls, results)
+                   if isinstance(result, Exception)]
+    if failed_urls:
+        raise KeeperError(
+            'Failed to load {0:d} of {1:d} resources from Keeper'.format(
+                len(failed_urls), len(urls)),
+            failed_urls=failed_urls)
+    return results
+
+
 def _cache_path(cache_dir, product_slug, dataset_type):
     assert dataset_type in ('product', 'editions', 'builds')
     name = '{product}_{dataset_type}'.format(product=product_slug,
@@ -135,24 +370,30 @@ def cache_data_for_dev(json_data, cache_dir, product_slug, dataset_type):
         os.makedirs(cache_dir, exist_ok=True)
     cache_path = _cache_path(cache_dir, product_slug, dataset_type)
     with open(cache_path, 'w') as f:
-        json.dump(json_data, f, indent=2, sort_keys=True)
+        json.dump(json_data, f, indent=2, sort_keys=True,
+                  default=record_json_default)
 
 
-def load_dataset_with_caching(cache_dir, product_slug, dataset_type):
+def load_dataset_with_caching(cache_dir, product_slug, dataset_type,
+                              keeper=None):
     cache_path = _cache_path(cache_dir, product_slug, dataset_type)
     try:
-        with open(cache_path, 'r') as f:
-            cache_data = json.load(f, encoding='utf-8')
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            cache_data = json.load(f)
+        if dataset_type == 'editions':
+            cache_data = project_records(Edition, cache_data.values())
+        elif dataset_type == 'builds':
+            cache_data = project_records(Build, cache_data.values())
     except OSError:
         # Can't find cached data, so reload it
         product_url = 'https://keeper.lsst.codes/products/{slug}'.format(
             slug=product_slug)
         if dataset_type == 'product':
-            cache_data = load_product_data(product_url)
+            cache_data = load_product_data(product_url, keeper=keeper)
         elif dataset_type == 'editions':
-            cache_data = load_edition_data(product_url)
+            cache_data = load_edition_data(product_url, keeper=keeper)
         elif dataset_type == 'builds':
-            cache_data = load_build_data(product_url)
+            cache_data = load_build_data(product_url, keeper=keeper)
         else:
             raise RuntimeError(
                 'Unknown dataset_type: {0}'.format(dataset_type))
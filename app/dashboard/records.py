@@ -0,0 +1,118 @@
+"""Compact records of edition and build resources.
+
+Keeper's edition and build resources have many more fields than the
+dashboards use. The loaders project each resource into an `Edition` or
+`Build` record that only keeps the fields used by hydration and the
+templates, and reserves slots for the fields that hydration adds (see
+`app.dashboard.render`). Records use ``__slots__`` rather than a
+``__dict__``, so a product with tens of thousands of builds takes a
+fraction of the memory of the JSON dictionaries.
+"""
+
+__all__ = ['Edition', 'Build', 'project_records', 'record_json_default']
+
+
+class _Record(object):
+    """Base class for records with ``__slots__``.
+
+    Subclasses list the fields kept from the Keeper resource in
+    ``_json_fields`` and the fields added by hydration in ``_extra_fields``.
+    """
+
+    __slots__ = ()
+
+    _json_fields = ()
+
+    _extra_fields = ()
+
+    @classmethod
+    def from_json(cls, data):
+        """Create a record from a Keeper resource's JSON data.
+
+        Parameters
+        ----------
+        data : `dict`
+            Resource data. Fields that the record doesn't keep are
+            dropped.
+
+        Returns
+        -------
+        record : `_Record`
+            The record. Fields missing from ``data``, and hydration fields,
+            are `None`.
+        """
+        record = cls.__new__(cls)
+        for name in cls._json_fields:
+            setattr(record, name, data.get(name))
+        for name in cls._extra_fields:
+            setattr(record, name, None)
+        return record
+
+    def to_json(self):
+        """Serialize the record's Keeper fields as a JSON-compatible `dict`.
+        """
+        return {name: getattr(self, name) for name in self._json_fields}
+
+    def __eq__(self, other):
+        if type(other) is not type(self):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name)
+                   for name in self.__slots__)
+
+    def __repr__(self):
+        return '{0}({1!r})'.format(type(self).__name__, self.slug)
+
+
+class Edition(_Record):
+    """An edition of a product, from Keeper's ``/editions/(id)`` resource.
+    """
+
+    _json_fields = ('slug', 'published_url', 'date_rebuilt', 'tracked_refs')
+
+    _extra_fields = ('datetime_rebuilt', 'age', 'github_ref_url',
+                     'jira_ticket_name', 'jira_url', 'is_release',
+                     'alt_title')
+
+    __slots__ = _json_fields + _extra_fields
+
+
+class Build(_Record):
+    """A build of a product, from Keeper's ``/builds/(id)`` resource."""
+
+    _json_fields = ('slug', 'published_url', 'date_created', 'git_refs')
+
+    _extra_fields = ('datetime_created', 'age', 'github_ref_url',
+                     'jira_ticket_name', 'jira_url')
+
+    __slots__ = _json_fields + _extra_fields
+
+
+def project_records(record_class, resources):
+    """Project Keeper resources into records, keyed by slug.
+
+    Parameters
+    ----------
+    record_class : `type`
+        `Edition` or `Build`.
+    resources : iterable of `dict`
+        JSON data of the resources.
+
+    Returns
+    -------
+    records : `dict`
+        Records keyed by slug, in the order of ``resources``.
+    """
+    records = {}
+    for data in resources:
+        record = record_class.from_json(data)
+        records[record.slug] = record
+    return records
+
+
+def record_json_default(obj):
+    """Serialize records with `json.dump` (use as its ``default``)."""
+    if isinstance(obj, _Record):
+        return obj.to_json()
+    raise TypeError(
+        'Object of type {0} is not JSON serializable'.format(
+            type(obj).__name__))
@@ -2,11 +2,18 @@
 
 import os
 import datetime
+import hashlib
+import heapq
+import json
+from operator import attrgetter
 import re
+import threading
 
+from markupsafe import Markup
 from structlog import get_logger
 import jinja2
 
+from .fragments import get_fragment_cache
 from .jinjafilters import filter_simple_date
 
 
@@ -30,93 +37,656 @@ SERIES_NAMES = {
     'dmtr': 'Data Management Test Report',
 }
 
+# key that marks a product dataset already processed by hydrate_product_data
+_HYDRATED_KEY = '_dasher_hydrated'
+
+# record fields used by the item templates, which key their cached markup
+EDITION_ITEM_FIELDS = ('slug', 'published_url', 'date_rebuilt', 'is_release',
+                       'alt_title', 'github_ref_url', 'jira_ticket_name',
+                       'jira_url')
+BUILD_ITEM_FIELDS = ('slug', 'published_url', 'date_created',
+                     'github_ref_url', 'jira_ticket_name', 'jira_url')
+
+# record fields in the JSON data of the dashboard pages
+EDITION_DATA_FIELDS = EDITION_ITEM_FIELDS + ('tracked_refs',)
+BUILD_DATA_FIELDS = BUILD_ITEM_FIELDS + ('git_refs',)
+
 
 def render_edition_dashboard(product_data, edition_data,
-                             asset_dir='/_dasher-assets'):
-    """Render the edition template with data."""
+                             asset_dir='/_dasher-assets', now=None,
+                             overflow_count=0, overflow=False,
+                             first_screen_items=0, hydrated=False):
+    """Render the edition template with data.
+
+    Parameters
+    ----------
+    product_data : `dict`
+        Dataset describing the product resource.
+    edition_data : `dict`
+        Dictionary of `~app.dashboard.records.Edition` records, keyed by
+        edition slug.
+    asset_dir : `str`, optional
+        URL of the static assets directory.
+    now : `datetime.datetime`, optional
+        Current time, for the ages of editions. Pass the same value to
+        both dashboards of a build. Default is `datetime.datetime.now`.
+    overflow_count : `int`, optional
+        Number of older editions on the overflow page (see
+        `split_edition_overflow`), which is linked from the edition
+        dashboard if there are any.
+    overflow : `bool`, optional
+        If `True`, the page is the overflow page of older editions rather
+        than the edition dashboard.
+    first_screen_items : `int`, optional
+        If set, only the first ``first_screen_items`` editions of each
+        section are rendered; the others are rendered by the browser from
+        the page's JSON data (see `render_edition_data`). All editions are
+        rendered if ``0``.
+    hydrated : `bool`, optional
+        If `True`, the records are already hydrated with the same ``now``
+        and aren't hydrated again.
+    """
     logger = get_logger("ltddasher")
     logger.debug('render_edition_dashboard')
 
-    env = create_jinja_env()
+    sections = _get_edition_sections(
+        product_data, edition_data, now or datetime.datetime.now(),
+        hydrate=not hydrated)
+    return _render_edition_page(product_data, sections, asset_dir=asset_dir,
+                                overflow_count=overflow_count,
+                                overflow=overflow,
+                                first_screen_items=first_screen_items)
 
-    # hydrate the datasets with datetime objects
-    _insert_datetime(edition_data)
-    _insert_age(edition_data)
 
-    _insert_github_handle(product_data)
-    _insert_ci_data(product_data)
-    _insert_github_ref_url(product_data, edition_data)
-    _insert_jira_url(edition_data)
-    _insert_doc_handle(product_data)
-    _insert_is_release(edition_data)
-    _normalize_product_title(product_data)
+def _render_edition_page(product_data, sections,
+                         asset_dir='/_dasher-assets', overflow_count=0,
+                         overflow=False, first_screen_items=0):
+    """Render an edition dashboard page from its sorted release and
+    development sections (see `_get_edition_sections`).
+    """
+    env = get_jinja_env()
+    release_editions, development_editions = sections
+    template = env.get_template('edition_dashboard.jinja')
+    rendered_page = template.render(
+        asset_dir=asset_dir,
+        product=product_data,
+        release_items=_render_items(
+            env, '_edition_item.jinja',
+            _first_screen(release_editions, first_screen_items),
+            EDITION_ITEM_FIELDS),
+        release_total=len(release_editions),
+        development_items=_render_items(
+            env, '_edition_item.jinja',
+            _first_screen(development_editions, first_screen_items),
+            EDITION_ITEM_FIELDS),
+        development_total=len(development_editions),
+        overflow_count=overflow_count,
+        overflow=overflow)
+    return rendered_page
 
-    # The main edition is always a release; label it as 'Current' for
-    # template presentation.
-    # More work should be done on how LTD designates releases.
-    if 'main' in edition_data:
-        edition_data['main']['alt_title'] = 'Current'
-        edition_data['main']['is_release'] = True
+
+def render_edition_data(product_data, edition_data, now=None,
+                        overflow_count=0, overflow=False, hydrated=False,
+                        **kwargs):
+    """Render the JSON data of an edition dashboard page.
+
+    The data has the same editions, in the same order, as the page rendered
+    by `render_edition_dashboard` with the same arguments. Other keyword
+    arguments of `render_edition_dashboard` are ignored.
+
+    Returns
+    -------
+    json_data : `str`
+        Minified JSON document with the ``product`` (its ``slug`` and
+        ``published_url``), the ``releases`` and ``development`` sections
+        (lists of editions with the `EDITION_DATA_FIELDS`), and the URL of
+        the data of the ``overflow`` page, if any, or of the edition
+        dashboard (``recent``), from the overflow page.
+    """
+    sections = _get_edition_sections(
+        product_data, edition_data, now or datetime.datetime.now(),
+        hydrate=not hydrated)
+    return _render_edition_doc(product_data, sections,
+                               overflow_count=overflow_count,
+                               overflow=overflow)
+
+
+def _render_edition_doc(product_data, sections, overflow_count=0,
+                        overflow=False, **kwargs):
+    """Render the JSON data of an edition dashboard page from its sorted
+    sections (see `_get_edition_sections`).
+    """
+    release_editions, development_editions = sections
+    doc = {
+        'product': _get_product_summary(product_data),
+        'releases': _get_items_data(release_editions,
+                                    EDITION_DATA_FIELDS),
+        'development': _get_items_data(development_editions,
+                                       EDITION_DATA_FIELDS),
+    }
+    if overflow:
+        doc['recent'] = product_data['published_url'] + '/v/index.json'
+    elif overflow_count:
+        doc['overflow'] = product_data['published_url'] \
+            + '/v/_dasher-older/index.json'
+    return _dump_data(doc)
+
+
+def _get_edition_sections(product_data, edition_data, now, hydrate=True):
+    """Hydrate editions (unless ``hydrate`` is `False`) and split them into
+    the release and development sections, sorted from youngest to oldest.
+    """
+    if hydrate:
+        hydrate_edition_data(product_data, edition_data, now)
 
     # Extract recently-updated editions
     # Releases are never included in the development lists
     development_editions = []
     release_editions = []
     for _, edition in edition_data.items():
-        if edition['is_release']:
+        if edition.is_release:
             release_editions.append(edition)
         else:
             development_editions.append(edition)
 
     # Sort editions youngest to oldest
-    release_editions.sort(key=lambda x: x['age'])
-    development_editions.sort(key=lambda x: x['age'])
+    release_editions.sort(key=lambda x: x.age)
+    development_editions.sort(key=lambda x: x.age)
+    return release_editions, development_editions
+
+
+def hydrate_edition_data(product_data, edition_data, now):
+    """Hydrate the product and its editions with the fields used by the
+    templates (see `hydrate_product_data` and `_hydrate_dataset`), and label
+    the main edition as the 'Current' release.
+
+    Parameters
+    ----------
+    product_data : `dict`
+        Dataset describing the product resource.
+    edition_data : `dict`
+        Dictionary of `~app.dashboard.records.Edition` records, keyed by
+        edition slug. The records are modified in place.
+    now : `datetime.datetime`
+        Current time, for the ages of editions.
 
-    template = env.get_template('edition_dashboard.jinja')
-    rendered_page = template.render(
-        asset_dir=asset_dir,
-        product=product_data,
-        releases=release_editions,
-        development_editions=development_editions)
-    return rendered_page
+    Returns
+    -------
+    edition_data : `dict`
+        The same records.
+    """
+    hydrate_product_data(product_data)
+    _hydrate_dataset(product_data, edition_data,
+                     now=now,
+                     datetime_str_key='date_rebuilt',
+                     datetime_key='datetime_rebuilt',
+                     git_refs_key='tracked_refs',
+                     insert_is_release=True)
+    _label_main_edition(edition_data)
+    return edition_data
+
+
+def split_edition_overflow(edition_data, max_editions):
+    """Select the editions shown on the edition dashboard, and the older
+    editions that overflow to a separate page.
+
+    The edition dashboard shows the main edition, and the ``max_editions``
+    most recently rebuilt releases and development editions. They are
+    selected with a heap (`heapq.nsmallest`) rather than by sorting all
+    editions, since products can have thousands of stale ticket branch
+    editions.
+
+    Parameters
+    ----------
+    edition_data : `dict`
+        Dictionary of `~app.dashboard.records.Edition` records, keyed by
+        edition slug, hydrated by `hydrate_edition_data`.
+    max_editions : `int`
+        Maximum number of releases, and of development editions, on the
+        edition dashboard. All editions are shown if ``0``.
+
+    Returns
+    -------
+    editions : `dict`
+        Editions shown on the edition dashboard, keyed by slug.
+    overflow : `dict`
+        Older editions, keyed by slug.
+    """
+    if not max_editions or len(edition_data) <= max_editions:
+        return edition_data, {}
+
+    release_editions = []
+    development_editions = []
+    for slug, edition in edition_data.items():
+        if slug == 'main':
+            continue
+        if edition.is_release:
+            release_editions.append(edition)
+        else:
+            development_editions.append(edition)
+
+    shown_slugs = {'main'}
+    for section in (release_editions, development_editions):
+        if len(section) > max_editions:
+            section = heapq.nsmallest(max_editions, section,
+                                      key=attrgetter('age'))
+        shown_slugs.update(edition.slug for edition in section)
+
+    editions = {}
+    overflow = {}
+    for slug, edition in edition_data.items():
+        if slug in shown_slugs:
+            editions[slug] = edition
+        else:
+            overflow[slug] = edition
+    return editions, overflow
+
+
+def _label_main_edition(edition_data):
+    """Label the main edition of a dataset as the 'Current' release."""
+    # The main edition is always a release; label it as 'Current' for
+    # template presentation.
+    # More work should be done on how LTD designates releases.
+    if 'main' in edition_data:
+        edition_data['main'].alt_title = 'Current'
+        edition_data['main'].is_release = True
 
 
 def render_build_dashboard(product_data, build_data,
-                           asset_dir='/_dasher-assets'):
-    """Render the builds template with data."""
+                           asset_dir='/_dasher-assets', now=None,
+                           archive_years=(), archive_year=None,
+                           first_screen_items=0, hydrated=False):
+    """Render the builds template with data.
+
+    Parameters
+    ----------
+    product_data : `dict`
+        Dataset describing the product resource.
+    build_data : `dict`
+        Dictionary of `~app.dashboard.records.Build` records, keyed by
+        build slug.
+    asset_dir : `str`, optional
+        URL of the static assets directory.
+    now : `datetime.datetime`, optional
+        Current time, for the ages of builds. Pass the same value to both
+        dashboards of a build. Default is `datetime.datetime.now`.
+    archive_years : sequence of `int`, optional
+        Years of the product's build archive pages, linked from the recent
+        build dashboard (see `split_build_archives`).
+    archive_year : `int`, optional
+        If set, the page is the archive page of this year's builds rather
+        than the recent build dashboard. Archive pages don't link to other
+        archive pages, so they don't change when another year is archived.
+    first_screen_items : `int`, optional
+        If set, only the first ``first_screen_items`` builds are rendered;
+        the others are rendered by the browser from the page's JSON data
+        (see `render_build_data`). All builds are rendered if ``0``.
+    hydrated : `bool`, optional
+        If `True`, the records are already hydrated with the same ``now``
+        (see `hydrate_build_data`) and aren't hydrated again.
+    """
     logger = get_logger("ltddasher")
     logger.debug('render_build_dashboard')
 
-    env = create_jinja_env()
+    builds = _get_build_list(product_data, build_data,
+                             now or datetime.datetime.now(),
+                             hydrate=not hydrated)
+    return _render_build_page(product_data, builds, asset_dir=asset_dir,
+                              archive_years=archive_years,
+                              archive_year=archive_year,
+                              first_screen_items=first_screen_items)
 
-    # hydrate the datasets with datetime objects
-    _insert_datetime(build_data,
-                     datetime_str_key='date_created',
-                     datetime_key='datetime_created')
-    _insert_age(build_data,
-                datetime_str_key='date_created')
-
-    _insert_ci_data(product_data)
-    _insert_doc_handle(product_data)
-    _insert_github_ref_url(product_data, build_data,
-                           git_refs_key='git_refs')
-    _insert_jira_url(build_data,
-                     git_refs_key='git_refs')
-    _normalize_product_title(product_data)
 
-    builds = [b for _, b in build_data.items()]
-    builds.sort(key=lambda x: x['age'])
+def _render_build_page(product_data, builds, asset_dir='/_dasher-assets',
+                       archive_years=(), archive_year=None,
+                       first_screen_items=0):
+    """Render a build dashboard page from its sorted builds (see
+    `_get_build_list`).
+    """
+    env = get_jinja_env()
     template = env.get_template('build_dashboard.jinja')
     rendered_page = template.render(
         asset_dir=asset_dir,
         product=product_data,
-        builds=builds)
+        build_items=_render_items(env, '_build_item.jinja',
+                                  _first_screen(builds, first_screen_items),
+                                  BUILD_ITEM_FIELDS),
+        build_total=len(builds),
+        archive_years=archive_years,
+        archive_year=archive_year)
     return rendered_page
 
 
-def create_jinja_env():
+def render_build_data(product_data, build_data, now=None,
+                      archive_years=(), archive_year=None, hydrated=False,
+                      **kwargs):
+    """Render the JSON data of a build dashboard page.
+
+    The data has the same builds, in the same order, as the page rendered
+    by `render_build_dashboard` with the same arguments. Other keyword
+    arguments of `render_build_dashboard` are ignored.
+
+    Returns
+    -------
+    json_data : `str`
+        Minified JSON document with the ``product`` (its ``slug`` and
+        ``published_url``), the ``builds`` (with the `BUILD_DATA_FIELDS`),
+        and either the URLs of the data of the ``archives`` (from the recent
+        build dashboard), or the ``archive_year`` and the URL of the data
+        of the recent build dashboard (``recent``).
+    """
+    builds = _get_build_list(product_data, build_data,
+                             now or datetime.datetime.now(),
+                             hydrate=not hydrated)
+    return _render_build_doc(product_data, builds,
+                             archive_years=archive_years,
+                             archive_year=archive_year)
+
+
+def _render_build_doc(product_data, builds, archive_years=(),
+                      archive_year=None, **kwargs):
+    """Render the JSON data of a build dashboard page from its sorted builds
+    (see `_get_build_list`).
+    """
+    doc = {
+        'product': _get_product_summary(product_data),
+        'builds': _get_items_data(builds, BUILD_DATA_FIELDS),
+    }
+    if archive_year is not None:
+        doc['archive_year'] = archive_year
+        doc['recent'] = product_data['published_url'] \
+            + '/builds/index.json'
+    else:
+        doc['archives'] = [
+            product_data['published_url']
+            + '/builds/archive/{0:d}/index.json'.format(year)
+            for year in archive_years]
+    return _dump_data(doc)
+
+
+def hydrate_build_data(product_data, build_data, now):
+    """Hydrate the product and its builds with the fields used by the
+    templates (see `hydrate_product_data` and `_hydrate_dataset`).
+
+    Parameters
+    ----------
+    product_data : `dict`
+        Dataset describing the product resource.
+    build_data : `dict`
+        Dictionary of `~app.dashboard.records.Build` records, keyed by
+        build slug. The records are modified in place.
+    now : `datetime.datetime`
+        Current time, for the ages of builds.
+
+    Returns
+    -------
+    build_data : `dict`
+        The same records.
+    """
+    hydrate_product_data(product_data)
+    _hydrate_dataset(product_data, build_data,
+                     now=now,
+                     datetime_str_key='date_created',
+                     datetime_key='datetime_created',
+                     git_refs_key='git_refs')
+    return build_data
+
+
+def _get_build_list(product_data, build_data, now, hydrate=True):
+    """Hydrate builds (unless ``hydrate`` is `False`) and sort them from
+    youngest to oldest.
+    """
+    if hydrate:
+        hydrate_build_data(product_data, build_data, now)
+
+    builds = [b for _, b in build_data.items()]
+    builds.sort(key=lambda x: x.age)
+    return builds
+
+
+def _first_screen(items, first_screen_items):
+    """Get the items of a list that are rendered by the server."""
+    if first_screen_items:
+        return items[:first_screen_items]
+    return items
+
+
+def _get_product_summary(product_data):
+    return {'slug': product_data['slug'],
+            'published_url': product_data['published_url']}
+
+
+def _get_items_data(items, fields):
+    return [{name: getattr(item, name) for name in fields}
+            for item in items]
+
+
+def _dump_data(doc):
+    """Serialize a JSON data document, minified and with sorted keys so that
+    the same data always has the same serialization.
+    """
+    return json.dumps(doc, separators=(',', ':'), sort_keys=True)
+
+
+def split_build_archives(build_data, now, archive_days):
+    """Split a product's builds between the recent build dashboard and
+    yearly archive pages.
+
+    A year is archived, or closed, once it ended at least ``archive_days``
+    days before ``now``; its builds then move from the recent build
+    dashboard to the year's archive page. New builds are never created in
+    a closed year, so an archive page only changes if its builds are
+    deleted.
+
+    Parameters
+    ----------
+    build_data : `dict`
+        Dictionary of `~app.dashboard.records.Build` records, keyed by
+        build slug, hydrated by `hydrate_build_data`.
+    now : `datetime.datetime`
+        Current time.
+    archive_days : `int`
+        Number of days after the end of a year before its builds are
+        archived.
+
+    Returns
+    -------
+    recent_builds : `dict`
+        Builds of the years that aren't closed, keyed by slug.
+    archives : `dict`
+        Builds of each closed year, keyed by slug, keyed by year (newest
+        year first).
+    """
+    archive_delta = datetime.timedelta(days=archive_days)
+    recent_builds = {}
+    archives = {}
+    for slug, build in build_data.items():
+        year = build.datetime_created.year
+        if datetime.datetime(year + 1, 1, 1) + archive_delta <= now:
+            archives.setdefault(year, {})[slug] = build
+        else:
+            recent_builds[slug] = build
+    archives = {year: archives[year]
+                for year in sorted(archives, reverse=True)}
+    return recent_builds, archives
+
+
+def render_dashboard_page(product_data, page, asset_dir='/_dasher-assets',
+                          now=None, hydrated=False):
+    """Render a dashboard page from its specification.
+
+    Parameters
+    ----------
+    product_data : `dict`
+        Dataset describing the product resource.
+    page : `tuple`
+        ``(kind, records, options)`` specification of the page, where
+        ``kind`` is ``'editions'`` (for `render_edition_dashboard`) or
+        ``'builds'`` (for `render_build_dashboard`), ``records`` is the
+        dictionary of records shown on the page, and ``options`` is a
+        `dict` of other keyword arguments of the render function.
+    asset_dir : `str`, optional
+        URL of the static assets directory.
+    now : `datetime.datetime`, optional
+        Current time, for the ages of editions and builds.
+    hydrated : `bool`, optional
+        If `True`, the records are already hydrated with the same ``now``
+        and aren't hydrated again.
+
+    Returns
+    -------
+    html_data : `str`
+        The rendered page.
+    """
+    kind, records, options = page
+    render = PAGE_RENDERERS[kind]
+    return render(product_data, records, asset_dir=asset_dir, now=now,
+                  hydrated=hydrated, **options)
+
+
+def render_dashboard_data(product_data, page, now=None, hydrated=False):
+    """Render the JSON data of a dashboard page from its specification (see
+    `render_dashboard_page`).
+
+    Returns
+    -------
+    json_data : `str`
+        The minified JSON data (see `render_edition_data` and
+        `render_build_data`).
+    """
+    kind, records, options = page
+    render = DATA_RENDERERS[kind]
+    return render(product_data, records, now=now, hydrated=hydrated,
+                  **options)
+
+
+def get_data_path(page_path):
+    """Get the path of the JSON data of a dashboard page, next to the page
+    (``index.json`` for ``index.html``).
+    """
+    return os.path.splitext(page_path)[0] + '.json'
+
+
+def render_page_documents(product_data, page_path, page,
+                          asset_dir='/_dasher-assets', now=None,
+                          hydrated=False):
+    """Render a dashboard page and its JSON data (see
+    `render_dashboard_page` and `render_dashboard_data`).
+
+    The records are hydrated (unless ``hydrated`` is `True`) and sorted
+    once, for both documents.
+
+    Returns
+    -------
+    documents : `dict`
+        The rendered page and JSON data, keyed by path (``page_path`` and
+        its `get_data_path`).
+    """
+    kind, records, options = page
+    get_items, render_page, render_data = PAGE_KINDS[kind]
+    items = get_items(product_data, records, now or datetime.datetime.now(),
+                      hydrate=not hydrated)
+    return {
+        page_path: render_page(product_data, items, asset_dir=asset_dir,
+                               **options),
+        get_data_path(page_path): render_data(product_data, items,
+                                              **options),
+    }
+
+
+def _render_items(env, template_name, items, fields):
+    """Render the markup of edition or build items, using the fragment
+    cache (see `app.dashboard.fragments`).
+
+    Parameters
+    ----------
+    env : `jinja2.Environment`
+        Jinja2 environment.
+    template_name : `str`
+        Name of the item template.
+    items : `list`
+        `~app.dashboard.records.Edition` or `~app.dashboard.records.Build`
+        records, in page order.
+    fields : `tuple` of `str`
+        Record fields used by the item template.
+
+    Returns
+    -------
+    fragments : `list` of `markupsafe.Markup`
+        Markup of each item.
+    """
+    template = env.get_template(template_name)
+    cache = get_fragment_cache()
+    key_prefix = (template_name, get_templates_digest())
+    fragments = []
+    for item in items:
+        key = key_prefix + tuple(getattr(item, name) for name in fields)
+        fragments.append(Markup(cache.get_or_render(
+            key, lambda: template.render(item=item))))
+    return fragments
+
+
+# render functions of the kinds of pages (see render_dashboard_page and
+# render_dashboard_data)
+PAGE_RENDERERS = {
+    'editions': render_edition_dashboard,
+    'builds': render_build_dashboard,
+}
+DATA_RENDERERS = {
+    'editions': render_edition_data,
+    'builds': render_build_data,
+}
+
+# functions that sort the records of the kinds of pages, and render a page
+# and its JSON data from the sorted records (see render_page_documents)
+PAGE_KINDS = {
+    'editions': (_get_edition_sections, _render_edition_page,
+                 _render_edition_doc),
+    'builds': (_get_build_list, _render_build_page, _render_build_doc),
+}
+
+
+def hydrate_product_data(product):
+    """Insert the product fields used by the dashboard templates (GitHub
+    handle, CI dashboard, document handle and normalized title).
+
+    The fields only depend on the product, so they're computed once even
+    if several dashboards of the product are rendered from the same
+    dataset.
+
+    Parameters
+    ----------
+    product : `dict`
+        Dataset describing the product resource. It is modified in place.
+
+    Returns
+    -------
+    product : `dict`
+        The same dataset.
+    """
+    if product.get(_HYDRATED_KEY):
+        return product
+    _insert_github_handle(product)
+    _insert_ci_data(product)
+    _insert_doc_handle(product)
+    _normalize_product_title(product)
+    product[_HYDRATED_KEY] = True
+    return product
+
+
+def create_jinja_env(auto_reload=True, bytecode_cache_dir=None):
     """Create a Jinja2 `~jinja2.Environment`.
 
+    Parameters
+    ----------
+    auto_reload : `bool`, optional
+        If `True`, templates are reloaded when they change on the file
+        system.
+    bytecode_cache_dir : `str`, optional
+        Directory for a `jinja2.FileSystemBytecodeCache` of compiled
+        templates, so that templates don't need to be compiled again
+        when a process restarts. No bytecode cache is used if `None`.
+
     Returns
     -------
     env : `jinja2.Environment`
@@ -124,85 +694,163 @@ def create_jinja_env():
         ``templates/``.
     """
     template_dir = os.path.join(os.path.dirname(__file__), 'templates')
+    bytecode_cache = None
+    if bytecode_cache_dir is not None:
+        os.makedirs(bytecode_cache_dir, exist_ok=True)
+        bytecode_cache = jinja2.FileSystemBytecodeCache(bytecode_cache_dir)
     env = jinja2.Environment(
         loader=jinja2.FileSystemLoader(template_dir),
-        autoescape=jinja2.select_autoescape(['html'])
+        autoescape=jinja2.select_autoescape(['html']),
+        auto_reload=auto_reload,
+        bytecode_cache=bytecode_cache
     )
     env.filters['simple_date'] = filter_simple_date
     return env
 
 
-def _insert_datetime(dataset,
-                     datetime_str_key='date_rebuilt',
-                     datetime_key='datetime_rebuilt'):
-    """Inserts a field into every item of an editions
-    or build dataset with a `datetime.datetime` instance corresponding to a
-    ISO datetime string from the Keeper API.
+def init_jinja_env(config):
+    """Create the process-wide Jinja2 environment (see `get_jinja_env`) and
+    load all templates into its cache.
+
+    This is called by `app.create_app`.
+
+    Parameters
+    ----------
+    config : `flask.config`
+        Flask configuration. ``JINJA_AUTO_RELOAD`` and
+        ``JINJA_BYTECODE_CACHE_DIR`` configure the environment (see
+        `create_jinja_env`).
+
+    Returns
+    -------
+    env : `jinja2.Environment`
+        The shared Jinja2 environment.
     """
-    for k, d in dataset.items():
-        d[datetime_key] = _parse_keeper_datetime(d[datetime_str_key])
-    return dataset
+    global _jinja_env
+    env = create_jinja_env(
+        auto_reload=config['JINJA_AUTO_RELOAD'],
+        bytecode_cache_dir=config['JINJA_BYTECODE_CACHE_DIR'])
+    for template_name in env.list_templates(extensions=['jinja']):
+        env.get_template(template_name)
+    with _jinja_env_lock:
+        _jinja_env = env
+    return env
+
 
+def get_jinja_env():
+    """Get the process-wide Jinja2 environment.
 
-def _insert_age(dataset,
-                datetime_str_key='date_rebuilt',
-                age_key='age'):
-    """Inserts the age (from now) of a build into every item of an edition
-    or build dataset.
+    The environment, and its cache of compiled templates, is shared by
+    all threads. If `init_jinja_env` hasn't been called, an environment
+    with the default settings of `create_jinja_env` is created.
 
-    Age is persisted as a `datetime.timedelta` instance.
+    Returns
+    -------
+    env : `jinja2.Environment`
+        The shared Jinja2 environment.
     """
-    for k, d in dataset.items():
-        dt = _parse_keeper_datetime(d[datetime_str_key])
-        d[age_key] = datetime.datetime.now() - dt
-    return dataset
+    global _jinja_env
+    with _jinja_env_lock:
+        if _jinja_env is None:
+            _jinja_env = create_jinja_env()
+        return _jinja_env
 
 
-def _insert_github_ref_url(product, edition_dataset,
-                           git_refs_key='tracked_refs',
-                           key='github_ref_url'):
-    """Insert the GitHub branch URL for every edition.
+def get_templates_digest():
+    """Get a SHA-256 digest of the sources of all templates.
 
-    FIXME: this is an MVP for single-repo products. This needs to be
-    re-thought for multi-repo LTD products.
+    The digest is computed once per process, unless the Jinja environment
+    reloads templates (see `create_jinja_env`). It changes whenever a
+    template changes, so it can be used as part of the cache key of
+    rendered pages and fragments.
     """
-    base_repo_url = product['doc_repo'].rstrip('.git')
-    for k, d in edition_dataset.items():
-        # Editions that don't use the git_refs tracking mode will have
-        # tracked_refs equal to None.
-        try:
-            git_ref = d[git_refs_key][0]
-        except (TypeError, IndexError):
-            # None is not indexable
-            continue
+    global _templates_digest
+    with _jinja_env_lock:
+        if _templates_digest is None \
+                or (_jinja_env is not None and _jinja_env.auto_reload):
+            _templates_digest = _compute_templates_digest(
+                os.path.join(os.path.dirname(__file__), 'templates'))
+        return _templates_digest
+
+
+def _compute_templates_digest(template_dir):
+    """Compute the SHA-256 digest of the regular files in a templates
+    directory and its subdirectories, in sorted order of their POSIX-style
+    relative paths.
+    """
+    paths = []
+    for rootdir, dirnames, filenames in os.walk(template_dir):
+        for filename in filenames:
+            local_path = os.path.join(rootdir, filename)
+            if os.path.isfile(local_path):
+                relative_path = os.path.relpath(local_path, template_dir)
+                paths.append((relative_path.replace(os.sep, '/'),
+                              local_path))
+
+    h = hashlib.sha256()
+    for relative_path, local_path in sorted(paths):
+        h.update(relative_path.encode('utf-8'))
+        with open(local_path, 'rb') as f:
+            h.update(hashlib.sha256(f.read()).digest())
+    return h.hexdigest()
 
-        # https://github.com/lsst-sqre/ltd-dasher/tree/tickets/DM-9023
-        url = base_repo_url + '/tree/' + git_ref
-        d[key] = url
 
+_jinja_env = None
+_templates_digest = None
+_jinja_env_lock = threading.Lock()
 
-def _insert_jira_url(edition_dataset, git_refs_key='tracked_refs',
-                     url_key='jira_url', name_key='jira_ticket_name'):
-    """Insert the name and URL of a JIRA ticket associated with an edition.
 
-    FIXME: this is an MVP for single-repo products. This needs to be
-    re-thought for multi-repo LTD products.
+def _hydrate_dataset(product, dataset, now,
+                     datetime_str_key='date_rebuilt',
+                     datetime_key='datetime_rebuilt',
+                     git_refs_key='tracked_refs',
+                     insert_is_release=False):
+    """Set the fields used by the dashboard templates in every
+    `~app.dashboard.records.Edition` or `~app.dashboard.records.Build`
+    record of a dataset, in a single pass.
+
+    The fields are:
+
+    - ``datetime_key``: a `datetime.datetime` parsed from the ISO datetime
+      string from the Keeper API.
+    - ``age``: the age (from ``now``) as a `datetime.timedelta`.
+    - ``github_ref_url``: the GitHub URL of the item's first git ref.
+    - ``jira_ticket_name`` and ``jira_url``: the JIRA ticket of the git ref,
+      for ``tickets/`` branches.
+    - ``is_release`` and ``alt_title``: whether the slug looks like a
+      release, if ``insert_is_release`` is `True` (see
+      `_insert_is_release`).
+
+    FIXME: the GitHub and JIRA URLs are an MVP for single-repo products.
+    This needs to be re-thought for multi-repo LTD products.
     """
-    for k, d in edition_dataset.items():
+    base_repo_url = product['doc_repo'].rstrip('.git')
+    for d in dataset.values():
+        dt = _parse_keeper_datetime(getattr(d, datetime_str_key))
+        setattr(d, datetime_key, dt)
+        d.age = now - dt
+
+        if insert_is_release:
+            _insert_is_release(d)
+
         # Editions that don't use the git_refs tracking mode will have
         # tracked_refs equal to None.
         try:
-            git_ref = d[git_refs_key][0]
+            git_ref = getattr(d, git_refs_key)[0]
         except (TypeError, IndexError):
             # None is not indexable
             continue
 
+        # https://github.com/lsst-sqre/ltd-dasher/tree/tickets/DM-9023
+        d.github_ref_url = base_repo_url + '/tree/' + git_ref
+
         match = TICKET_BRANCH_PATTERN.search(git_ref)
         if match is not None:
             ticket_name = match.group(1)
-            d[name_key] = ticket_name
-            d[url_key] = 'https://jira.lsstcorp.org/browse/{0}'.format(
+            d.jira_ticket_name = ticket_name
+            d.jira_url = 'https://jira.lsstcorp.org/browse/{0}'.format(
                 ticket_name)
+    return dataset
 
 
 def _insert_github_handle(product, handle_key='github_handle'):
@@ -256,22 +904,19 @@ def _normalize_product_title(product):
     product['title'] = product['title'].strip(': ')
 
 
-def _insert_is_release(editions,
-                       is_release_key='is_release',
-                       alt_title_key='alt_title'):
-    """Insert a field indicating whether this edition is likely a release or
+def _insert_is_release(edition):
+    """Set a field indicating whether this edition is likely a release or
     not.
 
     Heuristic for guessing a release: edition slug begins with `v` and a digit.
     """
-    for k, d in editions.items():
-        slug = d['slug']
-        match = RELEASE_PATTERN.search(slug)
-        if match is not None:
-            d[is_release_key] = True
-            d[alt_title_key] = slug
-        else:
-            d[is_release_key] = False
+    slug = edition.slug
+    match = RELEASE_PATTERN.search(slug)
+    if match is not None:
+        edition.is_release = True
+        edition.alt_title = slug
+    else:
+        edition.is_release = False
 
 
 def _strip_prefix(string, prefix):
@@ -289,13 +934,28 @@ def _strip_suffix(string, suffix):
 
 
 def _parse_keeper_datetime(date_string):
-    return datetime.datetime.strptime(date_string, '%Y-%m-%dT%H:%M:%SZ')
+    """Parse a Keeper API datetime string (``YYYY-MM-DDTHH:MM:SSZ``).
+
+    Keeper always uses this fixed format, so the fields are sliced directly
+    rather than parsed with `~datetime.datetime.strptime`, which is several
+    times slower.
+    """
+    if len(date_string) != 20 or date_string[10] != 'T' \
+            or date_string[19] != 'Z':
+        # Not the fixed format; let strptime raise a helpful error
+        return datetime.datetime.strptime(date_string, '%Y-%m-%dT%H:%M:%SZ')
+    return datetime.datetime(int(date_string[0:4]),
+                             int(date_string[5:7]),
+                             int(date_string[8:10]),
+                             int(date_string[11:13]),
+                             int(date_string[14:16]),
+                             int(date_string[17:19]))
 
 
 def render_development_index():
     """Render an index.html document for the root of the development builds.
     """
-    env = create_jinja_env()
+    env = get_jinja_env()
     template = env.get_template('dev_index.jinja')
     rendered_page = template.render()
     return rendered_page
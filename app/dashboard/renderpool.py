@@ -0,0 +1,195 @@
+"""Process pool for rendering the dashboards of large products.
+
+Rendering is CPU-bound and holds the GIL, so rendering the dashboards of a
+product with tens of thousands of builds in a request process stalls that
+process's other threads. If ``RENDER_PROCESSES`` is set, products with at
+least ``RENDER_PROCESS_THRESHOLD`` editions and builds are rendered by a
+pool of worker processes instead (see `render_dashboard_pages`).
+
+Datasets are sent to the worker processes as compact JSON, which is how
+LTD Keeper provides them, and the rendered HTML pages are sent back. Each
+page is a separate task, so the pages of one product render in parallel.
+
+If a worker process dies (e.g., killed for running out of memory), the pool
+is broken: it's shut down, the product is rendered in the calling thread,
+and the next large product gets a new pool.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import datetime
+import json
+import multiprocessing
+import os
+import sys
+import threading
+
+from structlog import get_logger
+
+from .fragments import init_fragment_cache
+from .records import (Build, Edition, project_records,
+                      record_json_default)
+from .render import init_jinja_env, render_page_documents
+
+
+__all__ = ['get_render_pool', 'render_dashboard_pages']
+
+
+# record classes of the kinds of pages
+_RECORD_CLASSES = {'editions': Edition, 'builds': Build}
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_render_pool(config):
+    """Get the process-wide pool of render processes, or `None` if the pool
+    is disabled.
+
+    Parameters
+    ----------
+    config : `flask.config`
+        Flask configuration. ``RENDER_PROCESSES`` sets the number of worker
+        processes (the pool is disabled if ``0``). ``JINJA_AUTO_RELOAD``,
+        ``JINJA_BYTECODE_CACHE_DIR`` and ``FRAGMENT_CACHE_SIZE`` configure
+        the worker processes' Jinja environments and fragment caches (see
+        `app.dashboard.render.init_jinja_env` and
+        `app.dashboard.fragments.init_fragment_cache`).
+
+    Returns
+    -------
+    pool : `concurrent.futures.ProcessPoolExecutor` or `None`
+        The pool.
+
+    Notes
+    -----
+    Worker processes are started with the ``spawn`` method, rather than
+    forked, since the request process runs other threads. They run the
+    Python interpreter given by `get_python_executable`, since
+    `sys.executable` is the uWSGI binary in a uWSGI process.
+    """
+    global _pool
+    if not config['RENDER_PROCESSES']:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            process_config = {
+                key: config[key]
+                for key in ('JINJA_AUTO_RELOAD', 'JINJA_BYTECODE_CACHE_DIR',
+                            'FRAGMENT_CACHE_SIZE')}
+            mp_context = multiprocessing.get_context('spawn')
+            mp_context.set_executable(get_python_executable())
+            _pool = ProcessPoolExecutor(
+                max_workers=config['RENDER_PROCESSES'],
+                mp_context=mp_context,
+                initializer=_init_render_process,
+                initargs=(process_config,))
+        return _pool
+
+
+def get_python_executable():
+    """Get the path of the Python interpreter that runs the worker
+    processes of the render pool.
+
+    Returns
+    -------
+    executable : `str`
+        `sys.executable`, unless the interpreter is embedded in another
+        program (such as uWSGI), in which case it's the ``pythonX.Y``
+        interpreter of the same installation (`sys.exec_prefix`).
+    """
+    if os.path.basename(sys.executable).startswith('python'):
+        return sys.executable
+    return os.path.join(sys.exec_prefix, 'bin',
+                        'python{0}.{1}'.format(*sys.version_info[:2]))
+
+
+def _discard_render_pool(pool):
+    """Shut down a broken render pool, so that `get_render_pool` creates a
+    new one.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def render_dashboard_pages(pool, product_data, pages, asset_dir,
+                           now=None):
+    """Render dashboard pages of a product, and their JSON data, in the
+    worker processes.
+
+    Each page is submitted as a separate task, so that a product's pages
+    (e.g., its yearly build archive pages) are spread over the pool.
+
+    Parameters
+    ----------
+    pool : `concurrent.futures.ProcessPoolExecutor`
+        Pool of render processes (see `get_render_pool`).
+    product_data : `dict`
+        Dataset describing the product resource.
+    pages : `dict`
+        Mapping of page paths to the pages' ``(kind, records, options)``
+        specifications (see `app.dashboard.render.render_dashboard_page`).
+    asset_dir : `str`
+        Absolute URL of the static assets directory.
+    now : `datetime.datetime`, optional
+        Current time, for the ages of editions and builds. Default is
+        `datetime.datetime.now`.
+
+    Returns
+    -------
+    documents : `dict`
+        Mapping of the page paths, and of the paths of their JSON data (see
+        `app.dashboard.render.get_data_path`), to the rendered documents.
+
+    Notes
+    -----
+    Unlike `~app.dashboard.render.render_page_documents`, this function
+    doesn't set rendering fields in the records, unless the pool is broken
+    and the pages are rendered in the calling thread instead.
+    """
+    now = now or datetime.datetime.now()
+    documents = {}
+    try:
+        futures = []
+        for path, page in pages.items():
+            payload = json.dumps(
+                [product_data, path, page, asset_dir, now.isoformat()],
+                separators=(',', ':'),
+                default=record_json_default).encode('utf-8')
+            futures.append(pool.submit(_render_payload, payload))
+
+        # Gather the documents in page order
+        for future in futures:
+            documents.update(future.result())
+    except BrokenProcessPool:
+        logger = get_logger("ltddasher")
+        logger.warning("render pool is broken; rendering in thread",
+                       product=product_data['slug'])
+        _discard_render_pool(pool)
+        documents = {}
+        for path, page in pages.items():
+            documents.update(render_page_documents(
+                product_data, path, page, asset_dir=asset_dir, now=now))
+    return documents
+
+
+def _init_render_process(config):
+    """Initialize a worker process of the render pool."""
+    init_jinja_env(config)
+    init_fragment_cache(config)
+
+
+def _render_payload(payload):
+    """Render a dashboard page and its JSON data from a serialized payload
+    (in a worker process).
+    """
+    product_data, path, (kind, records, options), asset_dir, now = \
+        json.loads(payload.decode('utf-8'))
+    now = datetime.datetime.fromisoformat(now)
+    records = project_records(_RECORD_CLASSES[kind], records.values())
+    return render_page_documents(product_data, path,
+                                 (kind, records, options),
+                                 asset_dir=asset_dir, now=now)
@@ -0,0 +1,181 @@
+"""Snapshots of the datasets and pages of published dashboards.
+
+After a product's dashboards are published, a snapshot of the datasets they
+were rendered from, and of the rendered pages, is saved to
+``DATASET_SNAPSHOT_DIR``. The next build of the product compares the fresh
+Keeper data with the snapshot (see `diff_datasets`) and only re-renders the
+pages whose records changed; the other pages are reused from the snapshot.
+
+Snapshots are JSON files, shared by all processes and kept across process
+restarts.
+"""
+
+import json
+import os
+import tempfile
+import threading
+
+from structlog import get_logger
+
+
+__all__ = ['SNAPSHOT_VERSION', 'SnapshotStore', 'get_snapshot_store',
+           'make_snapshot', 'diff_datasets']
+
+
+# Version of the snapshot format; snapshots of other versions are ignored
+SNAPSHOT_VERSION = 3
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+class SnapshotStore(object):
+    """Directory of per-product snapshots.
+
+    Parameters
+    ----------
+    directory : `str`
+        Directory for the snapshot files. It's created if necessary.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def load(self, product_slug):
+        """Load a product's snapshot.
+
+        Parameters
+        ----------
+        product_slug : `str`
+            Slug of the product.
+
+        Returns
+        -------
+        snapshot : `dict` or `None`
+            The snapshot (see `make_snapshot`), or `None` if the product has
+            no usable snapshot.
+        """
+        try:
+            with open(self._path(product_slug), 'r', encoding='utf-8') as f:
+                snapshot = json.load(f)
+        except OSError:
+            return None
+        except ValueError:
+            logger = get_logger("ltddasher")
+            logger.warning('Ignoring corrupt snapshot',
+                           product_slug=product_slug)
+            return None
+        if snapshot.get('version') != SNAPSHOT_VERSION:
+            return None
+        return snapshot
+
+    def save(self, product_slug, snapshot):
+        """Save a product's snapshot, replacing the previous one.
+
+        The snapshot is written to a temporary file that's then renamed, so
+        that other processes never load a partially-written snapshot.
+
+        Parameters
+        ----------
+        product_slug : `str`
+            Slug of the product.
+        snapshot : `dict`
+            The snapshot (see `make_snapshot`).
+        """
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(snapshot, f, separators=(',', ':'))
+            os.replace(tmp_path, self._path(product_slug))
+        except Exception:
+            os.remove(tmp_path)
+            raise
+
+    def _path(self, product_slug):
+        return os.path.join(self.directory, product_slug + '.json')
+
+
+def get_snapshot_store(config):
+    """Get the `SnapshotStore` for the ``DATASET_SNAPSHOT_DIR``
+    configuration, or `None` if snapshots are disabled.
+    """
+    directory = config['DATASET_SNAPSHOT_DIR']
+    if directory is None:
+        return None
+    with _stores_lock:
+        if directory not in _stores:
+            _stores[directory] = SnapshotStore(directory)
+        return _stores[directory]
+
+
+def make_snapshot(render_key, edition_data, build_data, pages,
+                  page_keys=None):
+    """Make the snapshot of a product's published dashboards.
+
+    Parameters
+    ----------
+    render_key : `str`
+        Digest of the other inputs of the rendered pages (product data,
+        asset directory and templates). Pages are only reused if the key
+        is unchanged.
+    edition_data : `dict`
+        Dictionary of `~app.dashboard.records.Edition` records, keyed by
+        edition slug.
+    build_data : `dict`
+        Dictionary of `~app.dashboard.records.Build` records, keyed by
+        build slug.
+    pages : `dict`
+        Mapping of the paths of pages and their JSON data to HTML and JSON
+        data.
+    page_keys : `dict`, optional
+        Mapping of page paths to digests of the records and other template
+        arguments of each page. A page is only reused if its key is
+        unchanged, so pages without a key are never reused.
+
+    Returns
+    -------
+    snapshot : `dict`
+        The JSON-serializable snapshot.
+    """
+    return {
+        'version': SNAPSHOT_VERSION,
+        'render_key': render_key,
+        'editions': {slug: e.to_json() for slug, e in edition_data.items()},
+        'builds': {slug: b.to_json() for slug, b in build_data.items()},
+        'pages': dict(pages),
+        'page_keys': dict(page_keys or {}),
+    }
+
+
+def diff_datasets(previous, records):
+    """Compare the records of a fresh dataset with those of a snapshot.
+
+    Parameters
+    ----------
+    previous : `dict`
+        JSON data of the snapshot's records (the ``editions`` or ``builds``
+        field of a snapshot), keyed by slug.
+    records : `dict`
+        Fresh `~app.dashboard.records.Edition` or
+        `~app.dashboard.records.Build` records, keyed by slug.
+
+    Returns
+    -------
+    diff : `dict`
+        Sorted slugs of the ``added``, ``changed`` and ``removed`` records.
+    """
+    added = []
+    changed = []
+    for slug, record in records.items():
+        try:
+            previous_data = previous[slug]
+        except KeyError:
+            added.append(slug)
+            continue
+        if record.to_json() != previous_data:
+            changed.append(slug)
+    removed = [slug for slug in previous if slug not in records]
+    return {'added': sorted(added),
+            'changed': sorted(changed),
+            'removed': sorted(removed)}
@@ -0,0 +1,104 @@
+"""Cache of HTTP validators (ETag and Last-Modified) for Keeper's bulk
+dashboard endpoint.
+
+With this cache, `~app.dashboard.loaders.load_bulk_dashboard_data` sends
+conditional GET requests. When Keeper responds with ``304 Not Modified``,
+the product's dashboards are already up to date and the build can stop
+early.
+
+Validators for a fresh response are first *staged*, and only *committed*
+once the dashboards built from that response are published. Otherwise a
+failed publish would be followed by a ``304`` on the next trigger and the
+dashboards would never be repaired.
+"""
+
+from collections import namedtuple, OrderedDict
+import threading
+
+
+__all__ = ['CacheEntry', 'ValidatorCache', 'get_validator_cache']
+
+
+CacheEntry = namedtuple('CacheEntry', 'etag last_modified')
+"""The validators of a bulk dashboard response.
+
+``etag`` and ``last_modified`` are the response's ``ETag`` and
+``Last-Modified`` header values (either may be `None`). The parsed datasets
+aren't cached: a ``304`` response means the dashboards are already up to
+date, so they're never needed.
+"""
+
+
+class ValidatorCache(object):
+    """Per-product cache of HTTP validators.
+
+    Parameters
+    ----------
+    max_size : `int`, optional
+        Maximum number of products to keep; the least recently used are
+        evicted first.
+    """
+
+    def __init__(self, max_size=100):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def get(self, product_url):
+        """Get the committed `CacheEntry` for a product, or `None`."""
+        with self._lock:
+            try:
+                self._entries.move_to_end(product_url)
+            except KeyError:
+                return None
+            return self._entries[product_url]
+
+    def stage(self, product_url, etag, last_modified):
+        """Stage validators for a product from a fresh response.
+
+        Nothing is staged if the response had neither an ``ETag`` nor a
+        ``Last-Modified`` header.
+        """
+        if etag is None and last_modified is None:
+            return
+        with self._lock:
+            self._pending[product_url] = CacheEntry(etag, last_modified)
+
+    def commit(self, product_url):
+        """Commit staged validators for a product once its dashboards are
+        published.
+        """
+        with self._lock:
+            try:
+                entry = self._pending.pop(product_url)
+            except KeyError:
+                return
+            self._entries[product_url] = entry
+            self._entries.move_to_end(product_url)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """Forget all cached and staged entries."""
+        with self._lock:
+            self._entries.clear()
+            self._pending.clear()
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_validator_cache(config):
+    """Get the process-wide `ValidatorCache`, or `None` if conditional
+    requests are disabled by the ``KEEPER_CONDITIONAL_GET`` configuration.
+    """
+    global _cache
+    if not config['KEEPER_CONDITIONAL_GET']:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = ValidatorCache(
+                max_size=config['KEEPER_VALIDATOR_CACHE_SIZE'])
+        return _cache
@@ -6,3 +6,55 @@ class ValidationError(ValueError):
     a request.
     """
     pass
+
+
+class ConfigurationError(RuntimeError):
+    """Raised when the application starts with an invalid configuration."""
+    pass
+
+
+class KeeperError(RuntimeError):
+    """Raised when resources can't be retrieved from the LTD Keeper API.
+
+    Parameters
+    ----------
+    message : `str`
+        Error message.
+    failed_urls : `list` of `str`, optional
+        URLs of the resources that couldn't be retrieved.
+    """
+
+    def __init__(self, message, failed_urls=None):
+        super().__init__(message)
+        self.failed_urls = failed_urls or []
+
+
+class KeeperNotModified(Exception):
+    """Raised when Keeper responds to a conditional request with
+    ``304 Not Modified``.
+
+    Parameters
+    ----------
+    product_url : `str`
+        URL of the product resource in the Keeper API.
+    """
+
+    def __init__(self, product_url):
+        super().__init__('Not modified: {0}'.format(product_url))
+        self.product_url = product_url
+
+
+class BuildCancelled(Exception):
+    """Raised at a phase boundary of a product build that was superseded by
+    a newer trigger for the same product.
+
+    Parameters
+    ----------
+    product_url : `str`
+        URL of the product resource in the Keeper API.
+    """
+
+    def __init__(self, product_url):
+        super().__init__('Superseded by a newer build: {0}'.format(
+            product_url))
+        self.product_url = product_url
@@ -0,0 +1,185 @@
+"""Batched purges of the Fastly CDN cache.
+
+Rather than making a Fastly API call for every product, product builds
+submit their surrogate keys to a process-wide `PurgeBatcher`. The batcher
+collects keys for a short window (``FASTLY_PURGE_WINDOW`` seconds),
+removes duplicates, and purges them together with Fastly's multi-key purge
+API.
+"""
+
+from collections import OrderedDict
+from concurrent.futures import Future
+import threading
+
+import requests
+from ltdconveyor.fastly import FastlyError
+from structlog import get_logger
+
+
+__all__ = ['FASTLY_API_ROOT', 'MAX_KEYS_PER_PURGE', 'purge_keys',
+           'PurgeBatcher', 'get_purge_batcher']
+
+
+FASTLY_API_ROOT = 'https://api.fastly.com'
+
+# Maximum number of surrogate keys in one Fastly purge request
+MAX_KEYS_PER_PURGE = 256
+
+_batcher = None
+_batcher_lock = threading.Lock()
+
+
+def purge_keys(surrogate_keys, service_id, api_key, soft=False):
+    """Purge objects with any of the given surrogate keys from the Fastly
+    cache in a single request.
+
+    Parameters
+    ----------
+    surrogate_keys : `list` of `str`
+        Surrogate keys to purge (at most `MAX_KEYS_PER_PURGE`).
+    service_id : `str`
+        Fastly service ID.
+    api_key : `str`
+        Fastly API key.
+    soft : `bool`, optional
+        If `True`, objects are marked as stale rather than evicted (a
+        *soft purge*). Fastly can then keep serving them while it fetches
+        new copies, according to their ``stale-while-revalidate`` and
+        ``stale-if-error`` directives.
+
+    Returns
+    -------
+    purge_ids : `dict`
+        Mapping of surrogate keys to Fastly purge IDs.
+
+    Raises
+    ------
+    ltdconveyor.fastly.FastlyError
+        Raised if the Fastly API responds with an error.
+
+    Notes
+    -----
+    This function uses Fastly's ``/service/{service}/purge`` endpoint with
+    a space-separated ``Surrogate-Key`` header.
+    """
+    path = '/service/{service}/purge'.format(service=service_id)
+    headers = {'Fastly-Key': api_key,
+               'Surrogate-Key': ' '.join(surrogate_keys),
+               'Accept': 'application/json'}
+    if soft:
+        headers['Fastly-Soft-Purge'] = '1'
+    r = requests.post(FASTLY_API_ROOT + path, headers=headers, timeout=30)
+    if r.status_code != 200:
+        raise FastlyError(r.text)
+    return r.json()
+
+
+class PurgeBatcher(object):
+    """Collect surrogate keys and purge them in batches.
+
+    Parameters
+    ----------
+    service_id : `str`
+        Fastly service ID.
+    api_key : `str`
+        Fastly API key.
+    window : `float`, optional
+        Seconds to wait, after the first key of a batch is submitted, before
+        the batch is purged. Keys are purged immediately if ``0``.
+    max_batch_size : `int`, optional
+        A batch is purged as soon as it has this many distinct keys.
+    soft : `bool`, optional
+        If `True`, send soft purges (see `purge_keys`).
+    """
+
+    def __init__(self, service_id, api_key, window=1.,
+                 max_batch_size=MAX_KEYS_PER_PURGE, soft=False):
+        self.service_id = service_id
+        self.api_key = api_key
+        self.window = window
+        self.soft = soft
+        self.max_batch_size = min(max_batch_size, MAX_KEYS_PER_PURGE)
+        self._pending = OrderedDict()
+        self._timer = None
+        self._lock = threading.Lock()
+
+    def submit(self, surrogate_key):
+        """Submit a surrogate key to be purged with the next batch.
+
+        Parameters
+        ----------
+        surrogate_key : `str`
+            Surrogate key to purge.
+
+        Returns
+        -------
+        future : `concurrent.futures.Future`
+            Future whose result is a `dict` with the key's ``purge_id`` and
+            the ``batch_size`` (number of distinct keys purged together),
+            or that raises the purge request's exception.
+        """
+        future = Future()
+        batch = None
+        with self._lock:
+            self._pending.setdefault(surrogate_key, []).append(future)
+            if self.window <= 0 or len(self._pending) >= self.max_batch_size:
+                batch = self._take_batch()
+            elif self._timer is None:
+                self._timer = threading.Timer(self.window, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+        if batch:
+            self._purge(batch)
+        return future
+
+    def flush(self):
+        """Purge the pending batch now."""
+        with self._lock:
+            batch = self._take_batch()
+        if batch:
+            self._purge(batch)
+
+    def _take_batch(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch = self._pending
+        self._pending = OrderedDict()
+        return batch
+
+    def _purge(self, batch):
+        logger = get_logger("ltddasher")
+        surrogate_keys = list(batch.keys())
+        try:
+            purge_ids = purge_keys(surrogate_keys, self.service_id,
+                                   self.api_key, soft=self.soft)
+        except Exception as e:
+            logger.error('Fastly purge failed',
+                         surrogate_keys=surrogate_keys, error=str(e))
+            for futures in batch.values():
+                for future in futures:
+                    future.set_exception(e)
+            return
+
+        logger.info('Fastly purge', surrogate_keys=surrogate_keys,
+                    soft=self.soft)
+        for surrogate_key, futures in batch.items():
+            result = {'purge_id': purge_ids.get(surrogate_key),
+                      'batch_size': len(surrogate_keys)}
+            for future in futures:
+                future.set_result(result)
+
+
+def get_purge_batcher(config):
+    """Get the process-wide `PurgeBatcher`, configured by the
+    ``FASTLY_SERVICE_ID``, ``FASTLY_KEY``, ``FASTLY_PURGE_WINDOW`` and
+    ``FASTLY_SOFT_PURGE`` configurations.
+    """
+    global _batcher
+    with _batcher_lock:
+        if _batcher is None:
+            _batcher = PurgeBatcher(config['FASTLY_SERVICE_ID'],
+                                    config['FASTLY_KEY'],
+                                    window=config['FASTLY_PURGE_WINDOW'],
+                                    soft=config['FASTLY_SOFT_PURGE'])
+        return _batcher
@@ -0,0 +1,483 @@
+"""In-process queue of dashboard build jobs.
+
+A *job* is created for every ``POST /build`` request and consists of one
+`ProductBuild` per product URL in the request. Product builds run in the
+background, on a pipeline of stages with their own threads (see
+`BuildQueue`), so that the HTTP request can return as soon as the job is
+queued. Job status (state, per-phase timings and errors) is
+kept in memory and served from ``GET /build/<job_id>``.
+
+Builds of the same product are coalesced (single-flight): a trigger for a
+product that already has a queued build joins that build, and a trigger
+for a product that is being built schedules one follow-up build, which
+later triggers join. A `ProductBuild` can therefore be shared by several
+jobs.
+
+A running build whose output is about to be replaced by a follow-up build
+is *superseded* (latest wins): `ProductBuild.check_cancelled`, which is
+called between stages and by the stage functions at their phase
+boundaries, stops the build with the ``cancelled`` state before it spends
+more S3 uploads and Fastly purges.
+
+Note that the queue is per-process: with several uWSGI processes, a job's
+status is only available from the process that accepted the job.
+"""
+
+from collections import OrderedDict, namedtuple
+from contextlib import contextmanager
+import datetime
+import queue
+import threading
+import time
+import uuid
+
+from flask import current_app
+from structlog import get_logger
+
+from .exceptions import BuildCancelled
+
+
+__all__ = ['QUEUED', 'RUNNING', 'SUCCEEDED', 'FAILED', 'CANCELLED',
+           'ProductBuild', 'BuildJob', 'BuildStage', 'BuildQueue',
+           'get_build_queue']
+
+
+# Build states
+QUEUED = 'queued'
+RUNNING = 'running'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+
+
+class ProductBuild(object):
+    """Status of a dashboard build for a single product.
+
+    Parameters
+    ----------
+    product_url : `str`
+        URL of the product resource in the Keeper API.
+    """
+
+    def __init__(self, product_url):
+        self.product_url = product_url
+        self.state = QUEUED
+        self.phases = OrderedDict()
+        self.error = None
+        self.skipped = None
+        self.coalesced = 0
+        self.log = []
+        self.date_started = None
+        self.date_ended = None
+        self._current_phase = None
+        self._superseded = threading.Event()
+
+    @contextmanager
+    def phase(self, name):
+        """Context manager that times a phase of the build (such as
+        ``'fetch'``, ``'render'`` or ``'upload'``).
+
+        The duration, in seconds, is recorded in `phases` even if the phase
+        raises.
+        """
+        self._current_phase = name
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.phases[name] = round(time.monotonic() - start, 4)
+        self._current_phase = None
+
+    def log_event(self, event, **fields):
+        """Add an event to the build's log.
+
+        Parameters
+        ----------
+        event : `str`
+            Name of the event.
+        **fields
+            JSON-serializable details of the event.
+        """
+        entry = {'event': event, 'date': _utcnow()}
+        entry.update(fields)
+        self.log.append(entry)
+
+    def skip(self, reason):
+        """Record that the rest of the build was skipped.
+
+        Parameters
+        ----------
+        reason : `str`
+            Why the build was skipped (such as unchanged Keeper data).
+        """
+        self.skipped = reason
+
+    def supersede(self):
+        """Request that the build stops at its next phase boundary because a
+        newer build of the same product is scheduled.
+        """
+        self._superseded.set()
+
+    @property
+    def superseded(self):
+        """`True` if a newer build of the same product is scheduled."""
+        return self._superseded.is_set()
+
+    def check_cancelled(self):
+        """Stop the build if it was superseded.
+
+        Build functions call this at phase boundaries, such as before each
+        upload and before the purge.
+
+        Raises
+        ------
+        app.exceptions.BuildCancelled
+            Raised if the build was superseded.
+        """
+        if self._superseded.is_set():
+            raise BuildCancelled(self.product_url)
+
+    def start(self):
+        """Mark the build as running."""
+        self.state = RUNNING
+        self.date_started = _utcnow()
+
+    def succeed(self):
+        """Mark the build as successfully finished."""
+        self.state = SUCCEEDED
+        self.date_ended = _utcnow()
+
+    def fail(self, exception):
+        """Mark the build as failed.
+
+        Parameters
+        ----------
+        exception : `Exception`
+            The exception that stopped the build.
+        """
+        self.state = FAILED
+        self.date_ended = _utcnow()
+        self.error = {
+            'phase': self._current_phase,
+            'type': type(exception).__name__,
+            'message': str(exception),
+        }
+
+    def cancel(self):
+        """Mark the build as cancelled because it was superseded."""
+        self.state = CANCELLED
+        self.date_ended = _utcnow()
+        self.skipped = 'Superseded by a newer build'
+        self.log_event('cancelled',
+                       after_phase=next(reversed(self.phases), None))
+
+    @property
+    def finished(self):
+        """`True` if the build succeeded, failed or was cancelled."""
+        return self.state in (SUCCEEDED, FAILED, CANCELLED)
+
+    def to_dict(self):
+        """Serialize the build status as a JSON-compatible `dict`."""
+        return {
+            'product_url': self.product_url,
+            'state': self.state,
+            'date_started': self.date_started,
+            'date_ended': self.date_ended,
+            'phases': dict(self.phases),
+            'error': self.error,
+            'skipped': self.skipped,
+            'coalesced': self.coalesced,
+            'log': list(self.log),
+        }
+
+
+class BuildJob(object):
+    """A dashboard build job covering one or more products.
+
+    Parameters
+    ----------
+    products : `list` of `ProductBuild`
+        Builds of the job's products.
+    """
+
+    def __init__(self, products):
+        self.job_id = uuid.uuid4().hex
+        self.date_created = _utcnow()
+        self.products = products
+
+    @property
+    def state(self):
+        """Aggregate state of the job's product builds.
+
+        A job without product builds has nothing to do, so it's succeeded.
+        """
+        if not self.products:
+            return SUCCEEDED
+        states = set(p.state for p in self.products)
+        if states == {QUEUED}:
+            return QUEUED
+        elif states <= {SUCCEEDED, FAILED, CANCELLED}:
+            if FAILED in states:
+                return FAILED
+            elif SUCCEEDED in states:
+                return SUCCEEDED
+            else:
+                return CANCELLED
+        else:
+            return RUNNING
+
+    @property
+    def finished(self):
+        """`True` if all product builds are finished."""
+        return all(p.finished for p in self.products)
+
+    def to_dict(self):
+        """Serialize the job status as a JSON-compatible `dict`."""
+        return {
+            'job_id': self.job_id,
+            'state': self.state,
+            'date_created': self.date_created,
+            'products': [p.to_dict() for p in self.products],
+        }
+
+
+class BuildStage(namedtuple('BuildStage', ['name', 'function', 'workers'])):
+    """A stage of the build pipeline (see `BuildQueue`).
+
+    Parameters
+    ----------
+    name : `str`
+        Name of the stage, such as ``'fetch'``.
+    function : callable
+        Function that runs the stage for a product. It is called as
+        ``function(item, config, product_build)``, where ``item`` is the
+        product URL for the first stage and the return value of the
+        previous stage otherwise. Returning `None` ends the product's build
+        early.
+    workers : `int`
+        Number of threads that run the stage.
+    """
+
+    __slots__ = ()
+
+
+class BuildQueue(object):
+    """Queue that runs product builds through a pipeline of stages, such as
+    fetch, render and publish.
+
+    Each stage has its own pool of threads, and stages are connected by
+    bounded queues, so that I/O-bound and CPU-bound stages of different
+    products overlap: one product can be fetched while another renders and
+    a third uploads. When a stage's output queue is full, the stage waits,
+    which limits the number of datasets and rendered pages held in memory.
+    An exception only fails the build of the product that raised it.
+
+    Parameters
+    ----------
+    config : `flask.config`
+        Flask configuration. ``BUILD_STAGE_QUEUE_SIZE`` sets the size of
+        the queues between stages, ``BUILD_JOB_HISTORY`` sets the number of
+        finished jobs that are remembered, and if ``BUILD_QUEUE_EAGER`` is
+        `True` builds run synchronously in `submit` (for testing).
+    stages : `list` of `BuildStage`
+        Stages of a product build, in order.
+    """
+
+    def __init__(self, config, stages):
+        self._config = config
+        self._stages = list(stages)
+        self._eager = config['BUILD_QUEUE_EAGER']
+        self._max_history = config['BUILD_JOB_HISTORY']
+        # Queued builds wait in an unbounded queue so that submit never
+        # blocks; queues between stages are bounded
+        self._inboxes = [queue.Queue()]
+        for _ in self._stages[1:]:
+            self._inboxes.append(
+                queue.Queue(maxsize=config['BUILD_STAGE_QUEUE_SIZE']))
+        self._threads = []
+        self._jobs = OrderedDict()
+        # Builds by product URL that are queued, running, or scheduled to
+        # run once the running build finishes
+        self._queued = {}
+        self._running = {}
+        self._followups = {}
+        self._lock = threading.Lock()
+
+    def submit(self, product_urls):
+        """Queue a build job.
+
+        Parameters
+        ----------
+        product_urls : `list` of `str`
+            URLs of product resources in the Keeper API.
+
+        Returns
+        -------
+        job : `BuildJob`
+            The queued job.
+        """
+        products = []
+        new_builds = []
+        with self._lock:
+            for product_url in product_urls:
+                product_build, is_new = self._schedule(product_url)
+                if product_build in products:
+                    continue
+                products.append(product_build)
+                if is_new:
+                    new_builds.append(product_build)
+            job = BuildJob(products)
+            self._jobs[job.job_id] = job
+            self._prune_history()
+
+        for product_build in new_builds:
+            self._dispatch(product_build)
+        return job
+
+    def _schedule(self, product_url):
+        """Get the build that will serve a new trigger for a product.
+
+        Returns
+        -------
+        product_build : `ProductBuild`
+            The build.
+        is_new : `bool`
+            `True` if the build is new and needs to be dispatched to the
+            pipeline.
+        """
+        for pending in (self._queued, self._followups):
+            if product_url in pending:
+                product_build = pending[product_url]
+                product_build.coalesced += 1
+                return product_build, False
+
+        product_build = ProductBuild(product_url)
+        if product_url in self._running:
+            # Dispatched once the running build finishes; the running build's
+            # output would be replaced, so it stops early
+            self._followups[product_url] = product_build
+            self._running[product_url].supersede()
+            return product_build, False
+        else:
+            self._queued[product_url] = product_build
+            return product_build, True
+
+    def _dispatch(self, product_build):
+        if self._eager:
+            item = product_build.product_url
+            for index in range(len(self._stages)):
+                item = self._run_stage(index, product_build, item)
+                if item is None:
+                    break
+        else:
+            self._start_threads()
+            self._inboxes[0].put((product_build, product_build.product_url))
+
+    def _start_threads(self):
+        """Start the stages' threads, the first time a build is dispatched.
+        """
+        with self._lock:
+            if self._threads:
+                return
+            for index, stage in enumerate(self._stages):
+                for n in range(stage.workers):
+                    thread = threading.Thread(
+                        target=self._work, args=(index,),
+                        name='dasher-{0}-{1:d}'.format(stage.name, n),
+                        daemon=True)
+                    thread.start()
+                    self._threads.append(thread)
+
+    def get(self, job_id):
+        """Get a job by its ID, or `None` if the job is unknown."""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _prune_history(self):
+        """Forget the oldest finished jobs beyond ``BUILD_JOB_HISTORY``."""
+        excess = len(self._jobs) - self._max_history
+        if excess <= 0:
+            return
+        for job_id in list(self._jobs.keys()):
+            if excess <= 0:
+                break
+            if self._jobs[job_id].finished:
+                del self._jobs[job_id]
+                excess -= 1
+
+    def _work(self, index):
+        """Run a stage for the builds in its queue (in a stage thread)."""
+        inbox = self._inboxes[index]
+        while True:
+            product_build, item = inbox.get()
+            try:
+                item = self._run_stage(index, product_build, item)
+                if item is not None:
+                    # Waits while the next stage's queue is full
+                    self._inboxes[index + 1].put((product_build, item))
+            finally:
+                inbox.task_done()
+
+    def _run_stage(self, index, product_build, item):
+        """Run a stage of a product build.
+
+        Returns
+        -------
+        item : object
+            Input of the next stage, or `None` if the build is finished.
+        """
+        logger = get_logger("ltddasher")
+        stage = self._stages[index]
+        if index == 0:
+            self._start(product_build)
+        try:
+            if index > 0:
+                # The previous stage's output is stale if the build was
+                # superseded
+                product_build.check_cancelled()
+            item = stage.function(item, self._config, product_build)
+        except BuildCancelled:
+            product_build.cancel()
+            logger.info('Product build superseded',
+                        product_url=product_build.product_url,
+                        phases=dict(product_build.phases))
+        except Exception as e:
+            product_build.fail(e)
+            logger.exception('Product build failed',
+                             product_url=product_build.product_url,
+                             stage=stage.name)
+        else:
+            if item is not None and index < len(self._stages) - 1:
+                return item
+            product_build.succeed()
+            logger.info('Product build succeeded',
+                        product_url=product_build.product_url,
+                        phases=dict(product_build.phases))
+        self._finish(product_build)
+        return None
+
+    def _start(self, product_build):
+        product_url = product_build.product_url
+        with self._lock:
+            del self._queued[product_url]
+            self._running[product_url] = product_build
+        product_build.start()
+
+    def _finish(self, product_build):
+        product_url = product_build.product_url
+        with self._lock:
+            del self._running[product_url]
+            followup = self._followups.pop(product_url, None)
+            if followup is not None:
+                self._queued[product_url] = followup
+        if followup is not None:
+            self._dispatch(followup)
+
+
+def get_build_queue():
+    """Get the `BuildQueue` of the current Flask app."""
+    return current_app.extensions['build_queue']
+
+
+def _utcnow():
+    return datetime.datetime.utcnow().isoformat() + 'Z'
@@ -9,3 +9,4 @@ from .errorhandlers import *  # noqa: F401,F403,E402
 from . import build  # noqa: F401,E402
 from . import healthz  # noqa: F401,E402
 from . import root  # noqa: F401,E402
+from . import stats  # noqa: F401,E402
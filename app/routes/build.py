@@ -1,9 +1,10 @@
 """Routes at ``/build`` that implement dashboard builds."""
 
-from flask import jsonify, request, current_app
+from flask import abort, jsonify, request, url_for
 from . import api
 from .logging import log_route
-from ..worker import build_dashboard_for_product
+from ..exceptions import ValidationError
+from ..jobs import get_build_queue
 
 
 @api.route('/build', methods=['POST'])
@@ -11,10 +12,38 @@ from ..worker import build_dashboard_for_product
 def build_dashboards():
     """Build dashboard(s).
 
-    :statuscode 202: Dashboard rebuild trigger sent.
+    The build runs in the background; poll the job URL given in the
+    ``Location`` header for its status.
+
+    :statuscode 202: Dashboard rebuild job queued.
+    :statuscode 400: The body isn't a JSON object, or ``product_urls`` is
+                     missing, empty or not a list of non-empty strings.
     """
-    for product_resource_url in request.json['product_urls']:
-        build_dashboard_for_product(product_resource_url, current_app.config)
+    data = request.get_json(silent=True) or {}
+    if not isinstance(data, dict):
+        raise ValidationError('The request body must be a JSON object')
+    product_urls = data.get('product_urls')
+    if not isinstance(product_urls, list) or not product_urls \
+            or not all(isinstance(url, str) and url for url in product_urls):
+        raise ValidationError('product_urls must be a list of product URLs')
+
+    job = get_build_queue().submit(product_urls)
+
+    job_url = url_for('api.get_build_job', job_id=job.job_id, _external=True)
+    return (jsonify({'job_id': job.job_id, 'job_url': job_url}),
+            202,
+            {'Location': job_url})
+
 
-    # Ideally we'd provide a status endpoint, and put that URL in the header
-    return jsonify({}), 202, {}
+@api.route('/build/<job_id>', methods=['GET'])
+@log_route
+def get_build_job(job_id):
+    """Get the status of a dashboard build job.
+
+    :statuscode 200: OK.
+    :statuscode 404: Job is unknown (or has been forgotten).
+    """
+    job = get_build_queue().get(job_id)
+    if job is None:
+        abort(404)
+    return jsonify(job.to_dict()), 200
@@ -0,0 +1,19 @@
+"""Process statistics routes."""
+
+from flask import jsonify
+from . import api
+from ..dashboard.fragments import get_fragment_cache
+
+
+@api.route('/stats', methods=['GET'])
+def get_stats():
+    """Statistics of the process that handles the request.
+
+    Each uWSGI process has its own statistics.
+
+    :statuscode 200: OK.
+    """
+    stats = {
+        'fragment_cache': get_fragment_cache().stats(),
+    }
+    return jsonify(stats), 200
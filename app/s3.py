@@ -0,0 +1,224 @@
+"""S3 helpers for publishing dashboard objects."""
+
+import hashlib
+import json
+import threading
+
+import boto3
+from botocore.config import Config as BotocoreConfig
+from botocore.exceptions import ClientError
+from ltdconveyor.s3 import upload_object
+
+
+__all__ = ['DIGEST_METADATA_KEY', 'open_bucket', 'compute_digest',
+           'get_stored_metadata', 'get_stored_digest',
+           'upload_object_if_changed']
+
+
+# Metadata key (``x-amz-meta-dasher-digest`` header) of an object's digest
+DIGEST_METADATA_KEY = 'dasher-digest'
+
+# Cache of S3 Bucket resources, keyed by credentials, bucket name and pool
+# size
+_buckets = {}
+_buckets_lock = threading.Lock()
+
+
+def open_bucket(bucket_name, aws_access_key_id=None,
+                aws_secret_access_key=None, max_pool_connections=10):
+    """Open an S3 Bucket resource that's shared by the whole process.
+
+    The boto3 session, resource and underlying client (with its connection
+    pool) are created once for each combination of arguments, so that
+    credentials and endpoints are only resolved once and connections are
+    reused across uploads.
+
+    Parameters
+    ----------
+    bucket_name : `str`
+        Name of the S3 bucket.
+    aws_access_key_id : `str`, optional
+        The access key for your AWS account.
+    aws_secret_access_key : `str`, optional
+        The secret key for your AWS account.
+    max_pool_connections : `int`, optional
+        Maximum number of connections in the client's connection pool.
+
+    Returns
+    -------
+    bucket : boto3 Bucket instance
+        The S3 bucket.
+
+    Notes
+    -----
+    boto3 clients are thread-safe, but resources are not. Shared buckets
+    must only be used for stateless calls that go directly to the client,
+    such as ``bucket.Object(key).put()``, and never to load or cache
+    resource attributes.
+    """
+    key = (aws_access_key_id, aws_secret_access_key, bucket_name,
+           max_pool_connections)
+    with _buckets_lock:
+        try:
+            return _buckets[key]
+        except KeyError:
+            session = boto3.session.Session(
+                aws_access_key_id=aws_access_key_id,
+                aws_secret_access_key=aws_secret_access_key)
+            s3 = session.resource(
+                's3',
+                config=BotocoreConfig(
+                    max_pool_connections=max_pool_connections))
+            bucket = s3.Bucket(bucket_name)
+            _buckets[key] = bucket
+            return bucket
+
+
+def compute_digest(content, metadata=None, **headers):
+    """Compute the SHA-256 digest of an object's content and headers.
+
+    Parameters
+    ----------
+    content : `str` or `bytes`
+        Object content.
+    metadata : `dict`, optional
+        Object metadata (``x-amz-meta-*`` headers).
+    **headers
+        Other object settings, such as ``acl`` or ``cache_control``.
+
+    Returns
+    -------
+    digest : `str`
+        Hex-encoded digest. Any change to the content, metadata or headers
+        changes the digest.
+    """
+    if isinstance(content, str):
+        content = content.encode('utf-8')
+    h = hashlib.sha256(content)
+    h.update(json.dumps([metadata or {}, headers],
+                        sort_keys=True).encode('utf-8'))
+    return h.hexdigest()
+
+
+def get_stored_metadata(bucket, bucket_path):
+    """Get the metadata of an existing object.
+
+    Parameters
+    ----------
+    bucket : boto3 Bucket instance
+        S3 bucket.
+    bucket_path : `str`
+        Key of the object in the bucket.
+
+    Returns
+    -------
+    metadata : `dict` or `None`
+        The object's metadata (``x-amz-meta-*`` headers), or `None` if the
+        object doesn't exist.
+    """
+    try:
+        head = bucket.meta.client.head_object(Bucket=bucket.name,
+                                              Key=bucket_path)
+    except ClientError as e:
+        # S3 responds with 403 rather than 404 for missing objects if the
+        # credentials can't list the bucket
+        if e.response['Error']['Code'] in ('403', '404', 'NoSuchKey'):
+            return None
+        raise
+    return head.get('Metadata', {})
+
+
+def get_stored_digest(bucket, bucket_path):
+    """Get the digest stored in the metadata of an existing object.
+
+    Parameters
+    ----------
+    bucket : boto3 Bucket instance
+        S3 bucket.
+    bucket_path : `str`
+        Key of the object in the bucket.
+
+    Returns
+    -------
+    digest : `str` or `None`
+        The stored digest, or `None` if the object doesn't exist or has no
+        digest.
+    """
+    metadata = get_stored_metadata(bucket, bucket_path)
+    if metadata is None:
+        return None
+    return metadata.get(DIGEST_METADATA_KEY)
+
+
+def upload_object_if_changed(bucket_path, bucket, content='', metadata=None,
+                             acl=None, cache_control=None, content_type=None,
+                             content_encoding=None):
+    """Upload an object to S3 unless an identical object is already there.
+
+    The object's digest (see `compute_digest`) is stored in its metadata.
+    The digest of an existing object is read with a ``HEAD`` request, rather
+    than cached, since other processes may write the same objects.
+
+    Parameters
+    ----------
+    bucket_path : `str`
+        Destination path (also known as the key name) of the object in the
+        S3 bucket.
+    bucket : boto3 Bucket instance
+        S3 bucket.
+    content : `str` or `bytes`, optional
+        Object content.
+    metadata : `dict`, optional
+        Header metadata values. These keys will appear in headers as
+        ``x-amz-meta-*``.
+    acl : `str`, optional
+        A pre-canned access control list.
+    cache_control : `str`, optional
+        The cache-control header value.
+    content_type : `str`, optional
+        The object's content type (such as ``text/html``).
+    content_encoding : `str`, optional
+        The content-encoding header value, for precompressed content (such
+        as ``gzip``).
+
+    Returns
+    -------
+    changed : `bool`
+        `True` if the object was uploaded, `False` if it was unchanged.
+    """
+    headers = {'acl': acl,
+               'cache_control': cache_control,
+               'content_type': content_type}
+    if content_encoding is not None:
+        # Only part of the digest if set, so that the digests of existing
+        # objects don't change
+        headers['content_encoding'] = content_encoding
+    digest = compute_digest(content, metadata, **headers)
+    if get_stored_digest(bucket, bucket_path) == digest:
+        return False
+
+    metadata = dict(metadata) if metadata is not None else {}
+    metadata[DIGEST_METADATA_KEY] = digest
+    if content_encoding is None:
+        upload_object(bucket_path,
+                      bucket,
+                      content=content,
+                      metadata=metadata,
+                      acl=acl,
+                      cache_control=cache_control,
+                      content_type=content_type)
+    else:
+        # ltdconveyor's upload_object doesn't set the content-encoding
+        _put_object(bucket_path, bucket, content, metadata,
+                    ACL=acl,
+                    CacheControl=cache_control,
+                    ContentType=content_type,
+                    ContentEncoding=content_encoding)
+    return True
+
+
+def _put_object(bucket_path, bucket, content, metadata, **headers):
+    """Put an object, with the headers that aren't `None`."""
+    args = {key: value for key, value in headers.items()
+            if value is not None}
+    bucket.Object(bucket_path).put(Body=content, Metadata=metadata, **args)
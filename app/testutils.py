@@ -50,11 +50,8 @@ class TestClient():
         # send request to the test client and return the response
         with self.app.test_request_context(url, method=method, data=data,
                                            headers=headers):
-            rv = self.app.preprocess_request()
-            if rv is None:
-                rv = self.app.dispatch_request()
-            rv = self.app.make_response(rv)
-            rv = self.app.process_response(rv)
+            # full dispatch so that the app's error handlers apply
+            rv = self.app.full_dispatch_request()
             return Response(rv.status_code, rv.headers,
                             json.loads(rv.data.decode('utf-8')))
 
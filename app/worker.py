@@ -1,37 +1,147 @@
 """Worker functions to handle dashboard builds."""
 
+from concurrent.futures import ThreadPoolExecutor, wait
+import datetime
+from functools import partial
+import gzip
+import json
 import os
+import threading
 
-import boto3
 from structlog import get_logger
 from requests.exceptions import HTTPError
-from ltdconveyor.s3 import (upload_dir, upload_object,
-                            create_dir_redirect_object)
-from ltdconveyor.fastly import purge_key
 
+from .assets import ASSETS_DIR, get_manifest, sync_assets
+from .dashboard.keeper import get_keeper_client
+from .dashboard.validatorcache import get_validator_cache
 from .dashboard.loaders import (load_product_data, load_edition_data,
                                 load_build_data, load_bulk_dashboard_data)
-from .dashboard.render import (render_edition_dashboard,
-                               render_build_dashboard)
+from .dashboard.render import (get_data_path,
+                               get_templates_digest,
+                               hydrate_build_data,
+                               hydrate_edition_data,
+                               render_page_documents,
+                               split_build_archives,
+                               split_edition_overflow)
+from .dashboard.renderpool import get_render_pool, render_dashboard_pages
+from .dashboard.snapshots import (diff_datasets, get_snapshot_store,
+                                  make_snapshot)
+from .exceptions import KeeperNotModified
+from .fastly import get_purge_batcher
+from .jobs import BuildStage, ProductBuild
+from .s3 import (compute_digest, open_bucket, get_stored_metadata,
+                 upload_object_if_changed)
+
+
+# Paths of the dashboard pages, relative to a product's root prefix
+EDITION_PAGE = 'v/index.html'
+# The _dasher- prefix keeps it apart from the editions' directories
+EDITION_OVERFLOW_PAGE = 'v/_dasher-older/index.html'
+BUILD_PAGE = 'builds/index.html'
+BUILD_ARCHIVE_DIR = 'builds/archive/'
+BUILD_ARCHIVE_PAGE = BUILD_ARCHIVE_DIR + '{year:d}/index.html'
+
+# Maximum number of slugs of each kind of change in a dataset_diff event
+DIFF_LOG_LIMIT = 20
+
+
+# Slugs of products whose dashboards are known to use the dashboard
+# surrogate key (see find_legacy_surrogate_key)
+_migrated_products = set()
+_migrated_products_lock = threading.Lock()
+
+# Surrogate keys, by product slug, of dashboards that may have been uploaded
+# without being purged yet because the build was cancelled or failed. The
+# next build of the product purges them even if it uploads nothing.
+_unpurged_keys = {}
+_unpurged_keys_lock = threading.Lock()
+
+
+def get_build_stages(config):
+    """Get the stages of a product build, for the `~app.jobs.BuildQueue`.
+
+    Parameters
+    ----------
+    config : `flask.config`
+        Flask configuration. ``BUILD_FETCH_WORKERS``,
+        ``BUILD_RENDER_WORKERS`` and ``BUILD_PUBLISH_WORKERS`` set the
+        number of threads of each stage.
+
+    Returns
+    -------
+    stages : `list` of `app.jobs.BuildStage`
+        The fetch (`fetch_dashboard_data`), render (`render_dashboards`)
+        and publish (`publish_and_purge_dashboards`) stages.
+    """
+    return [
+        BuildStage('fetch', fetch_dashboard_data,
+                   config['BUILD_FETCH_WORKERS']),
+        BuildStage('render', render_dashboards,
+                   config['BUILD_RENDER_WORKERS']),
+        BuildStage('publish', publish_and_purge_dashboards,
+                   config['BUILD_PUBLISH_WORKERS']),
+    ]
 
 
-def build_dashboard_for_product(product_url, config):
-    """"Build the dashboard for a single (direct)
+def build_dashboard_for_product(product_url, config, product_build=None):
+    """Build the dashboard for a single product, running all stages of the
+    build in the current thread.
 
-    This function is called directly by the API route.
+    The `~app.jobs.BuildQueue` runs the same stages (see
+    `get_build_stages`) on separate threads instead.
+
+    Parameters
+    ----------
+    product_url : `str`
+        URL of the product resource in the Keeper API.
+    config : `flask.config`
+        Flask configuration.
+    product_build : `app.jobs.ProductBuild`, optional
+        Status record of this build. The duration of each phase of the
+        build is recorded here.
+
+    Raises
+    ------
+    app.exceptions.BuildCancelled
+        Raised if a newer build of the product was scheduled (see
+        `app.jobs.ProductBuild.check_cancelled`). This is checked after the
+        fetch and render phases, before each upload, and before the purge.
+    """
+    if product_build is None:
+        product_build = ProductBuild(product_url)
+
+    datasets = fetch_dashboard_data(product_url, config, product_build)
+    if datasets is None:
+        return
+    product_build.check_cancelled()
+    dashboards = render_dashboards(datasets, config, product_build)
+    product_build.check_cancelled()
+    publish_and_purge_dashboards(dashboards, config, product_build)
+
+
+def fetch_dashboard_data(product_url, config, product_build):
+    """Fetch the datasets of a product's dashboards from the Keeper API
+    (the ``fetch`` stage of a build).
 
     Parameters
     ----------
     product_url : `str`
         URL of the product resource in the Keeper API.
-    product_data : `dict`
-        Dataset describing the product resource from Keeper's
-        ``/products/(slug)`` endpoint.
     config : `flask.config`
         Flask configuration.
+    product_build : `app.jobs.ProductBuild`
+        Status record of this build.
+
+    Returns
+    -------
+    datasets : `dict` or `None`
+        The ``product_url``, ``product_data``, ``edition_data`` and
+        ``build_data`` of the product, or `None` if the build is skipped
+        because the Keeper data is unchanged since the dashboards were last
+        published.
     """
     logger = get_logger("ltddasher")
-    logger.debug('build_dashboard_for_product', product_url=product_url)
+    logger.debug('fetch_dashboard_data', product_url=product_url)
 
     # Sanity check that configs exist
     assert config['AWS_ID'] is not None
@@ -39,54 +149,425 @@ def build_dashboard_for_product(product_url, config):
     assert config['FASTLY_KEY'] is not None
     assert config['FASTLY_SERVICE_ID'] is not None
 
-    # Get data from the Keeper API
-    try:
-        product_data, edition_data, build_data = load_bulk_dashboard_data(
-            product_url
-        )
-    except HTTPError:
-        product_data = load_product_data(product_url)
-        edition_data = load_edition_data(product_url)
-        build_data = load_build_data(product_url)
+    keeper = get_keeper_client(config)
+    validator_cache = get_validator_cache(config)
+    with product_build.phase('fetch'):
+        try:
+            product_data, edition_data, build_data = load_bulk_dashboard_data(
+                product_url, keeper=keeper, validator_cache=validator_cache,
+                stream=config['KEEPER_STREAM_BULK_DATA'])
+        except KeeperNotModified:
+            # Dashboards were already published from this same data
+            product_build.skip('Keeper data not modified')
+            return None
+        except HTTPError:
+            concurrency = config['KEEPER_FETCH_CONCURRENCY']
+            product_data = load_product_data(product_url, keeper=keeper)
+            edition_data = load_edition_data(product_url, keeper=keeper,
+                                             concurrency=concurrency)
+            build_data = load_build_data(product_url, keeper=keeper,
+                                         concurrency=concurrency)
+
+    return {'product_url': product_url,
+            'product_data': product_data,
+            'edition_data': edition_data,
+            'build_data': build_data}
+
+
+def render_dashboards(datasets, config, product_build):
+    """Render a product's dashboard pages (the ``render`` stage of a
+    build).
+
+    The edition dashboard only shows the most recently rebuilt editions;
+    older editions overflow to a separate page (see
+    `app.dashboard.render.split_edition_overflow`). The build dashboard is
+    split between a page of recent builds and yearly archive pages (see
+    `app.dashboard.render.split_build_archives`).
+
+    If the product has a snapshot of its last published dashboards (see
+    `app.dashboard.snapshots`), the fresh datasets are compared with it and
+    the differences are reported in the build's log. A page is only
+    rendered again if its records, the product, the asset directory or the
+    templates changed; otherwise the snapshot's page is reused. Closed
+    archive pages are therefore rendered once.
+
+    Each page has a JSON document of its editions or builds next to it
+    (``index.json``). If ``DASHBOARD_FIRST_SCREEN_ITEMS`` is set, pages
+    only have the first screen of each list; the browser renders the rest
+    from the JSON data.
+
+    Products with at least ``RENDER_PROCESS_THRESHOLD`` editions and builds
+    are rendered by the render process pool, if enabled (see
+    `app.dashboard.renderpool`).
+
+    Parameters
+    ----------
+    datasets : `dict`
+        Datasets of the product, from `fetch_dashboard_data`.
+    config : `flask.config`
+        Flask configuration.
+    product_build : `app.jobs.ProductBuild`
+        Status record of this build.
+
+    Returns
+    -------
+    dashboards : `dict`
+        The ``product_url``, ``product_data``, ``edition_data`` and
+        ``build_data`` of the product, the ``render_key`` and
+        ``page_keys`` of its pages (see
+        `app.dashboard.snapshots.make_snapshot`), and its ``pages``: a
+        mapping of the paths of pages and their JSON data, relative to the
+        product's root prefix, to HTML and JSON data.
+    """
+    logger = get_logger("ltddasher")
+    product_data = datasets['product_data']
+    edition_data = datasets['edition_data']
+    build_data = datasets['build_data']
 
     # absolute URL for asset directory
-    asset_dir = product_data['published_url'] + '/_dasher-assets'
+    asset_dir = get_asset_dir(product_data, config)
+
+    # All pages show ages relative to the same time
+    now = datetime.datetime.now()
+
+    # Computed before rendering adds fields to product_data
+    render_key = _get_render_key(product_data, asset_dir)
+
+    page_specs = _get_page_specs(product_data, edition_data, build_data,
+                                 now, config)
+    page_keys = {path: _get_page_key(records, options)
+                 for path, (_, records, options) in page_specs.items()}
+    pages = _get_reusable_pages(product_data['slug'], render_key, page_keys,
+                                edition_data, build_data, config,
+                                product_build)
+    page_specs = {path: page for path, page in page_specs.items()
+                  if path not in pages}
+
+    # Large products are rendered in a separate process so that they don't
+    # hold this process's GIL
+    render_pool = get_render_pool(config)
+    dataset_size = len(edition_data) + len(build_data)
+    use_render_pool = render_pool is not None \
+        and dataset_size >= config['RENDER_PROCESS_THRESHOLD']
 
     # Turn data into HTML dashboards for editions and builds
-    logger.debug("rendering edition_html_data")
-    edition_html_data = render_edition_dashboard(
-        product_data, edition_data, asset_dir=asset_dir)
-    logger.debug("rendering build_html_data")
-    build_html_data = render_build_dashboard(
-        product_data, build_data, asset_dir=asset_dir)
+    with product_build.phase('render'):
+        if use_render_pool and page_specs:
+            logger.debug("rendering in render process",
+                         dataset_size=dataset_size)
+            pages.update(render_dashboard_pages(
+                render_pool, product_data, page_specs, asset_dir, now=now))
+        else:
+            for path, page in page_specs.items():
+                logger.debug("rendering page", path=path)
+                # Records were hydrated by _get_page_specs
+                pages.update(render_page_documents(
+                    product_data, path, page, asset_dir=asset_dir,
+                    now=now, hydrated=True))
+
+    return {'product_url': datasets['product_url'],
+            'product_data': product_data,
+            'edition_data': edition_data,
+            'build_data': build_data,
+            'render_key': render_key,
+            'page_keys': page_keys,
+            'pages': pages}
+
+
+def _get_page_specs(product_data, edition_data, build_data, now, config):
+    """Split a product's editions and builds into dashboard pages.
+
+    Returns
+    -------
+    page_specs : `dict`
+        Mapping of page paths to the pages' ``(kind, records, options)``
+        specifications (see `app.dashboard.render.render_dashboard_page`).
+    """
+    first_screen_items = config['DASHBOARD_FIRST_SCREEN_ITEMS']
+
+    # Editions are hydrated once, then the oldest overflow to a separate
+    # page
+    hydrate_edition_data(product_data, edition_data, now)
+    editions, overflow_editions = split_edition_overflow(
+        edition_data, config['EDITION_DASHBOARD_MAX_EDITIONS'])
+    page_specs = {
+        EDITION_PAGE: ('editions', editions,
+                       {'overflow_count': len(overflow_editions)})}
+    if overflow_editions:
+        page_specs[EDITION_OVERFLOW_PAGE] = ('editions', overflow_editions,
+                                             {'overflow': True})
+
+    # Builds are hydrated once, then those of closed years are moved to
+    # archive pages
+    hydrate_build_data(product_data, build_data, now)
+    recent_builds, archives = split_build_archives(
+        build_data, now, config['BUILD_ARCHIVE_DAYS'])
+    page_specs[BUILD_PAGE] = ('builds', recent_builds,
+                              {'archive_years': list(archives)})
+    for year, builds in archives.items():
+        page_specs[BUILD_ARCHIVE_PAGE.format(year=year)] = (
+            'builds', builds, {'archive_year': year})
+    if first_screen_items:
+        for _, _, options in page_specs.values():
+            options['first_screen_items'] = first_screen_items
+    return page_specs
+
+
+def _get_render_key(product_data, asset_dir):
+    """Get the digest of the inputs of a product's pages, other than the
+    edition and build datasets.
+    """
+    return compute_digest(
+        json.dumps([product_data, asset_dir, get_templates_digest()],
+                   sort_keys=True))
+
+
+def _get_page_key(records, options):
+    """Get the digest of the records shown on a page, and of the other
+    options of the page's render function.
+    """
+    return compute_digest(
+        json.dumps([[record.to_json() for record in records.values()],
+                    options],
+                   sort_keys=True))
+
+
+def _get_reusable_pages(product_slug, render_key, page_keys, edition_data,
+                        build_data, config, product_build):
+    """Compare a product's datasets with its snapshot and get the pages
+    that don't need to be rendered again.
+
+    A page, and its JSON data, are reused if neither the ``render_key``
+    nor the page's key in ``page_keys`` changed. The differences of the
+    datasets are reported in the build's log as a ``dataset_diff`` event.
+
+    Returns
+    -------
+    pages : `dict`
+        Mapping of the paths of the snapshot's reusable pages, and of their
+        JSON data, to HTML and JSON data.
+    """
+    snapshot_store = get_snapshot_store(config)
+    if snapshot_store is None:
+        return {}
+    snapshot = snapshot_store.load(product_slug)
+    if snapshot is None:
+        product_build.log_event('dataset_diff', snapshot=False)
+        return {}
+
+    edition_diff = diff_datasets(snapshot['editions'], edition_data)
+    build_diff = diff_datasets(snapshot['builds'], build_data)
+    render_key_changed = snapshot['render_key'] != render_key
+    pages = {}
+    reused_pages = []
+    if not render_key_changed:
+        for path, page_key in page_keys.items():
+            if snapshot['page_keys'].get(path) == page_key:
+                data_path = get_data_path(path)
+                pages[path] = snapshot['pages'][path]
+                pages[data_path] = snapshot['pages'][data_path]
+                reused_pages.append(path)
+    product_build.log_event('dataset_diff',
+                            snapshot=True,
+                            render_key_changed=render_key_changed,
+                            editions=_summarize_diff(edition_diff),
+                            builds=_summarize_diff(build_diff),
+                            reused_pages=sorted(reused_pages))
+    return pages
+
+
+def _summarize_diff(diff):
+    """Summarize a dataset diff for the build log, with the number of
+    added, changed and removed records and up to `DIFF_LOG_LIMIT` of each
+    of their slugs.
+    """
+    summary = {key: len(slugs) for key, slugs in diff.items()}
+    summary['slugs'] = {key: slugs[:DIFF_LOG_LIMIT]
+                        for key, slugs in diff.items() if slugs}
+    return summary
 
-    # Upload static assets
-    upload_static_assets(product_data, config)
 
-    # Upload dashboards
+def publish_and_purge_dashboards(dashboards, config, product_build):
+    """Upload a product's dashboards and purge them from the Fastly cache
+    (the ``publish`` stage of a build).
+
+    Parameters
+    ----------
+    dashboards : `dict`
+        Rendered dashboards of the product, from `render_dashboards`.
+    config : `flask.config`
+        Flask configuration.
+    product_build : `app.jobs.ProductBuild`
+        Status record of this build.
+    """
+    logger = get_logger("ltddasher")
+    product_data = dashboards['product_data']
+
+    # Upload static assets and dashboards
+    surrogate_key = get_dashboard_surrogate_key(product_data)
+    with product_build.phase('publish'):
+        legacy_key = None
+        if config['TESTING'] is False:
+            # Checked before the upload replaces the objects' metadata
+            legacy_key = find_legacy_surrogate_key(product_data, config)
+        surrogate_keys = [surrogate_key,
+                          get_archive_surrogate_key(product_data)]
+        if legacy_key is not None:
+            surrogate_keys.append(legacy_key)
+        # Recorded before any upload, in case the build stops between the
+        # uploads and the purge
+        unpurged_keys = _add_unpurged_keys(product_data['slug'],
+                                           surrogate_keys)
+        changed_keys = publish_dashboards(dashboards['pages'],
+                                          product_data,
+                                          config,
+                                          product_build=product_build)
+
+    product_build.check_cancelled()
+
+    # Purge the keys of the changed objects from the fastly cache, along
+    # with those of uploads that an earlier build left unpurged. Archive
+    # pages have their own key, so they stay cached unless they changed.
+    with product_build.phase('purge'):
+        if config['TESTING'] is False and not changed_keys \
+                and not unpurged_keys:
+            logger.info("Dashboards unchanged; skipping Fastly purge",
+                        surrogate_key=surrogate_key)
+        elif config['TESTING'] is False:
+            # FIXME really want to mock this instead of flagging
+            surrogate_keys = changed_keys | unpurged_keys
+            if legacy_key is not None:
+                surrogate_keys.add(legacy_key)
+            surrogate_keys = sorted(surrogate_keys)
+            # Keys are purged along with those of other products that
+            # are published within the batcher's window
+            batcher = get_purge_batcher(config)
+            purges = [(key, batcher.submit(key)) for key in surrogate_keys]
+            for key, purge in purges:
+                product_build.log_event('purged', surrogate_key=key,
+                                        **purge.result())
+            if legacy_key is not None:
+                with _migrated_products_lock:
+                    _migrated_products.add(product_data['slug'])
+    with _unpurged_keys_lock:
+        _unpurged_keys.pop(product_data['slug'], None)
+
+    # Dashboards are published, so future conditional requests can rely on
+    # the validators of this Keeper response, and future builds can reuse
+    # the pages
+    validator_cache = get_validator_cache(config)
+    if validator_cache is not None:
+        validator_cache.commit(dashboards['product_url'])
+    snapshot_store = get_snapshot_store(config)
+    if snapshot_store is not None:
+        snapshot_store.save(product_data['slug'],
+                            make_snapshot(dashboards['render_key'],
+                                          dashboards['edition_data'],
+                                          dashboards['build_data'],
+                                          dashboards['pages'],
+                                          page_keys=dashboards['page_keys']))
+
+
+def publish_dashboards(pages, product_data, config, product_build=None):
+    """Upload the static assets, dashboard pages, their directory redirect
+    objects and their JSON data to S3 concurrently.
+
+    The uploads are independent of each other, so they run on a pool of
+    ``PUBLISH_CONCURRENCY`` threads. This function returns once all of
+    them have finished.
+
+    Parameters
+    ----------
+    pages : `dict`
+        Mapping of page paths, relative to the product's root prefix, to
+        the pages' HTML data, and of ``.json`` paths to the pages' JSON
+        data.
+    product_data : `dict`
+        Dataset describing the product resource from Keeper's
+        ``/products/(slug)`` endpoint.
+    config : `flask.config`
+        Flask configuration.
+    product_build : `app.jobs.ProductBuild`, optional
+        Status record of the build. If given, each upload first checks
+        whether the build was superseded, and doesn't start if so.
+
+    Returns
+    -------
+    changed_keys : `set` of `str`
+        Surrogate keys of the objects that were uploaded or deleted: the
+        dashboard key (see `get_dashboard_surrogate_key`) if static assets
+        or dashboard pages changed, and the archive key (see
+        `get_archive_surrogate_key`) if build archive pages changed.
+
+    Raises
+    ------
+    Exception
+        The first exception (in upload order) raised by any upload, once
+        all uploads have finished. This is
+        `~app.exceptions.BuildCancelled` if the build was superseded.
+    """
+    dashboard_key = get_dashboard_surrogate_key(product_data)
+    archive_key = get_archive_surrogate_key(product_data)
+    tasks = [partial(upload_static_assets, product_data, config)]
+    task_keys = [dashboard_key]
     if config['TESTING'] is False:
         # FIXME really want to mock these instead of flagging
-        upload_html_data(edition_html_data,
-                         'v/index.html',
-                         product_data,
-                         config)
-        upload_html_data(build_html_data,
-                         'builds/index.html',
-                         product_data,
-                         config)
-
-    # Purge fastly cache
-    if config['TESTING'] is False:
-        # FIXME really want to mock this instead of flagging
-        purge_key(product_data['surrogate_key'],
-                  config['FASTLY_SERVICE_ID'],
-                  config['FASTLY_KEY'])
-        logger.info("Fastly purge_key",
-                    surrogate_key=product_data['surrogate_key'])
+        for relative_path, data in pages.items():
+            page_tasks = []
+            if relative_path.endswith('.json'):
+                page_tasks.append(partial(upload_json_data, data,
+                                          relative_path, product_data,
+                                          config))
+            else:
+                page_tasks.append(partial(upload_html_data, data,
+                                          relative_path, product_data,
+                                          config))
+                page_tasks.append(partial(upload_dir_redirect_object,
+                                          relative_path, product_data,
+                                          config))
+            page_key = archive_key if is_archive_page(relative_path) \
+                else dashboard_key
+            tasks.extend(page_tasks)
+            task_keys.extend([page_key] * len(page_tasks))
+    if product_build is not None:
+        tasks = [partial(_run_unless_cancelled, task, product_build)
+                 for task in tasks]
+
+    with ThreadPoolExecutor(max_workers=config['PUBLISH_CONCURRENCY'],
+                            thread_name_prefix='dasher-publish') as executor:
+        futures = [executor.submit(task) for task in tasks]
+        wait(futures)
+    results = [future.result() for future in futures]
+    return {key for key, changed in zip(task_keys, results) if changed}
+
+
+def _run_unless_cancelled(task, product_build):
+    product_build.check_cancelled()
+    return task()
+
+
+def _add_unpurged_keys(slug, surrogate_keys):
+    """Record surrogate keys of a product that will need to be purged.
+
+    Returns
+    -------
+    unpurged_keys : `set` of `str`
+        Keys that were already recorded by an earlier build of the product
+        that didn't finish its purge.
+    """
+    with _unpurged_keys_lock:
+        keys = _unpurged_keys.setdefault(slug, set())
+        unpurged_keys = set(keys)
+        keys.update(surrogate_keys)
+    return unpurged_keys
 
 
 def upload_static_assets(product_data, config):
-    """Upload all static assets included in ``app/assets`` to S3.
+    """Sync the static assets included in ``app/dashboard/assets`` to the
+    product's ``_dasher-assets`` directory in S3.
+
+    Only new or changed files are uploaded, according to the assets
+    manifest (see `app.assets`).
 
     Parameters
     ----------
@@ -96,19 +577,24 @@ def upload_static_assets(product_data, config):
     config : `flask.config`
         Flask configuration.
 
+    Returns
+    -------
+    changed : `bool`
+        `True` if any asset object was uploaded or deleted.
+
     Notes
     -----
-    The contents of ``app/assets`` are not commited in Git since they are
-    compiled by the Gulp workflow. It would be good to script the Docker
-    image build process to ensure that asserts and compiled and installed.
+    The contents of ``app/dashboard/assets`` are not commited in Git since
+    they are compiled by the Gulp workflow. The Docker image build then
+    generates the assets manifest with ``python -m app.assets``.
     """
     logger = get_logger("ltddasher")
     logger.debug("upload_static_assets")
 
-    # local filesystem path
-    package_assets_dir = os.path.join(os.path.dirname(__file__),
-                                      'dashboard', 'assets')
-    logger.debug(package_assets_dir=package_assets_dir)
+    logger.debug(package_assets_dir=ASSETS_DIR)
+
+    if config['SHARED_ASSETS_URL']:
+        return upload_shared_static_assets(product_data, config)
 
     # path to the assets directory in the bucket
     bucket_path_prefix = os.path.join(product_data['slug'], '_dasher-assets')
@@ -116,24 +602,227 @@ def upload_static_assets(product_data, config):
     if config['TESTING'] is False:
         # css may not necessarily be built in test environment;
         # see http://ls.st/tac
-        assert os.path.isdir(package_assets_dir)
+        assert os.path.isdir(ASSETS_DIR)
 
-        # FIXME really want to mock upload_dir instead of flagging it
+        # FIXME really want to mock the upload instead of flagging it
         logger.debug(assets_bucket_path_prefix=bucket_path_prefix)
-        upload_dir(product_data['bucket_name'],
-                   bucket_path_prefix,
-                   package_assets_dir,
-                   upload_dir_redirect_objects=True,
-                   surrogate_key=product_data['surrogate_key'],
-                   surrogate_control='max-age=31536000',
-                   cache_control='no-cache',
-                   acl='public-read',
-                   aws_access_key_id=config['AWS_ID'],
-                   aws_secret_access_key=config['AWS_SECRET'])
+        bucket = open_product_bucket(product_data['bucket_name'], config)
+        return sync_assets(
+            bucket,
+            bucket_path_prefix,
+            metadata={'surrogate-key': get_dashboard_surrogate_key(
+                          product_data),
+                      'surrogate-control': get_dashboard_surrogate_control(
+                          config)},
+            acl='public-read',
+            cache_control='no-cache')
+    return False
+
+
+def upload_shared_static_assets(product_data, config):
+    """Sync the static assets to the shared, content-addressed assets
+    directory used by all products.
+
+    Assets are uploaded to a directory named after the assets manifest
+    version (see `get_asset_dir`), so they never change in place and are
+    cached as immutable by both Fastly and browsers.
+
+    Parameters
+    ----------
+    product_data : `dict`
+        Dataset describing the product resource from Keeper's
+        ``/products/(slug)`` endpoint.
+    config : `flask.config`
+        Flask configuration.
+
+    Returns
+    -------
+    changed : `bool`
+        Always `False`: new assets have a new URL, so a product's cache
+        never needs to be purged for them.
+    """
+    logger = get_logger("ltddasher")
+    logger.debug("upload_shared_static_assets")
+
+    bucket_name = config['SHARED_ASSETS_BUCKET']
+    bucket_path_prefix = '/'.join((config['SHARED_ASSETS_PREFIX'].strip('/'),
+                                   get_manifest()['version']))
+
+    if config['TESTING'] is False:
+        assert os.path.isdir(ASSETS_DIR)
+
+        # FIXME really want to mock the upload instead of flagging it
+        logger.debug(assets_bucket_path_prefix=bucket_path_prefix)
+        bucket = open_product_bucket(bucket_name, config)
+        sync_assets(
+            bucket,
+            bucket_path_prefix,
+            metadata={'surrogate-key': config['SHARED_ASSETS_SURROGATE_KEY'],
+                      'surrogate-control': 'max-age=31536000'},
+            acl='public-read',
+            cache_control='public, max-age=31536000, immutable')
+    return False
+
+
+def open_product_bucket(bucket_name, config):
+    """Open the process-wide S3 bucket resource for a bucket, using the
+    ``AWS_ID``, ``AWS_SECRET`` and ``S3_MAX_POOL_CONNECTIONS``
+    configurations (see `app.s3.open_bucket`).
+    """
+    return open_bucket(bucket_name,
+                       aws_access_key_id=config['AWS_ID'],
+                       aws_secret_access_key=config['AWS_SECRET'],
+                       max_pool_connections=config['S3_MAX_POOL_CONNECTIONS'])
+
+
+def get_dashboard_surrogate_key(product_data):
+    """Get the surrogate key of a product's dashboard objects.
+
+    The key is derived from, but different than, the product's own
+    surrogate key. Purging it only evicts the dashboards (and their
+    assets) from Fastly, never the product's documentation.
+
+    Parameters
+    ----------
+    product_data : `dict`
+        Dataset describing the product resource from Keeper's
+        ``/products/(slug)`` endpoint.
+
+    Returns
+    -------
+    surrogate_key : `str`
+        The dashboard surrogate key.
+    """
+    return 'dasher-' + product_data['surrogate_key']
+
+
+def get_archive_surrogate_key(product_data):
+    """Get the surrogate key of a product's build archive pages.
+
+    Archive pages have their own key so that purging the dashboards (see
+    `get_dashboard_surrogate_key`) doesn't evict them from Fastly; the
+    archive key is only purged when an archive page changes.
+
+    Parameters
+    ----------
+    product_data : `dict`
+        Dataset describing the product resource from Keeper's
+        ``/products/(slug)`` endpoint.
+
+    Returns
+    -------
+    surrogate_key : `str`
+        The archive surrogate key.
+    """
+    return 'dasher-archive-' + product_data['surrogate_key']
+
+
+def is_archive_page(relative_path):
+    """Check whether a dashboard page path, relative to the product's root
+    prefix, is a build archive page.
+    """
+    return relative_path.startswith(BUILD_ARCHIVE_DIR)
+
+
+def get_dashboard_surrogate_control(config):
+    """Get the ``surrogate-control`` header value of a product's dashboard
+    objects.
+
+    Fastly caches dashboards for a year, or until they're purged. If
+    ``FASTLY_SOFT_PURGE`` is enabled, the header also has
+    ``stale-while-revalidate`` and ``stale-if-error`` directives (set by
+    ``DASHBOARD_STALE_WHILE_REVALIDATE`` and ``DASHBOARD_STALE_IF_ERROR``)
+    so that Fastly keeps serving soft-purged dashboards while it fetches
+    the new ones.
+
+    Parameters
+    ----------
+    config : `flask.config`
+        Flask configuration.
+
+    Returns
+    -------
+    surrogate_control : `str`
+        The header value.
+    """
+    directives = ['max-age=31536000']
+    if config['FASTLY_SOFT_PURGE']:
+        directives.append('stale-while-revalidate={0:d}'.format(
+            config['DASHBOARD_STALE_WHILE_REVALIDATE']))
+        directives.append('stale-if-error={0:d}'.format(
+            config['DASHBOARD_STALE_IF_ERROR']))
+    return ', '.join(directives)
+
+
+def find_legacy_surrogate_key(product_data, config):
+    """Find whether a product's published dashboards are still tagged with
+    the product's own surrogate key.
+
+    Dashboards published by earlier versions of LTD Dasher used the
+    product's surrogate key. Fastly keeps those cached objects under that
+    key, so the key needs to be purged once more after the dashboards are
+    re-uploaded with the dashboard surrogate key (see
+    `get_dashboard_surrogate_key`).
+
+    Parameters
+    ----------
+    product_data : `dict`
+        Dataset describing the product resource from Keeper's
+        ``/products/(slug)`` endpoint.
+    config : `flask.config`
+        Flask configuration.
+
+    Returns
+    -------
+    surrogate_key : `str` or `None`
+        The product's surrogate key if the edition dashboard is still tagged
+        with it, `None` otherwise.
+    """
+    slug = product_data['slug']
+    with _migrated_products_lock:
+        if slug in _migrated_products:
+            return None
+
+    bucket = open_product_bucket(product_data['bucket_name'], config)
+    metadata = get_stored_metadata(
+        bucket, _get_bucket_path('v/index.html', product_data))
+    if metadata is not None \
+            and metadata.get('surrogate-key') == product_data['surrogate_key']:
+        return product_data['surrogate_key']
+
+    with _migrated_products_lock:
+        _migrated_products.add(slug)
+    return None
+
+
+def get_asset_dir(product_data, config):
+    """Get the absolute URL of the static assets directory for a product's
+    dashboards.
+
+    Parameters
+    ----------
+    product_data : `dict`
+        Dataset describing the product resource from Keeper's
+        ``/products/(slug)`` endpoint.
+    config : `flask.config`
+        Flask configuration.
+
+    Returns
+    -------
+    asset_dir : `str`
+        ``(SHARED_ASSETS_URL)/(manifest version)`` if shared assets are
+        configured, otherwise the product's own ``_dasher-assets``
+        directory.
+    """
+    if config['SHARED_ASSETS_URL']:
+        return '/'.join((config['SHARED_ASSETS_URL'].rstrip('/'),
+                         get_manifest()['version']))
+    return product_data['published_url'] + '/_dasher-assets'
 
 
 def upload_html_data(html_data, relative_path, product_data, config):
-    """Upload all static assets included in ``app/assets/manifest.yaml`` to S3.
+    """Upload a dashboard page to S3, unless an identical page is already
+    there.
 
     Parameters
     ----------
@@ -146,43 +835,135 @@ def upload_html_data(html_data, relative_path, product_data, config):
         ``/products/(slug)`` endpoint.
     config : `flask.config`
         Flask configuration.
+
+    Returns
+    -------
+    changed : `bool`
+        `True` if the page was uploaded.
     """
     logger = get_logger("ltddasher")
     logger.debug('upload_html_data', upload_path=relative_path)
 
-    surrogate_key = product_data['surrogate_key']
+    bucket_path = _get_bucket_path(relative_path, product_data)
+    bucket = open_product_bucket(product_data['bucket_name'], config)
+
+    changed = upload_object_if_changed(bucket_path,
+                                       bucket,
+                                       content=html_data,
+                                       content_type='text/html',
+                                       **_dashboard_object_settings(
+                                           product_data, config,
+                                           archive=is_archive_page(
+                                               relative_path)))
+    logger.info('upload_html_data', upload_path=bucket_path,
+                changed=changed)
+    return changed
+
+
+def upload_json_data(json_data, relative_path, product_data, config):
+    """Upload the JSON data of a dashboard page to S3, gzip-compressed,
+    unless identical data is already there.
+
+    The data is compressed deterministically (without a timestamp), so
+    unchanged data has an unchanged digest.
+
+    Parameters
+    ----------
+    json_data : `str`
+        The page's minified JSON data.
+    relative_path : `str`
+        Path of the data, relative to the product's root prefix.
+    product_data : `dict`
+        Dataset describing the product resource from Keeper's
+        ``/products/(slug)`` endpoint.
+    config : `flask.config`
+        Flask configuration.
+
+    Returns
+    -------
+    changed : `bool`
+        `True` if the data was uploaded.
+    """
+    logger = get_logger("ltddasher")
+
+    bucket_path = _get_bucket_path(relative_path, product_data)
+    bucket = open_product_bucket(product_data['bucket_name'], config)
+
+    content = gzip.compress(json_data.encode('utf-8'), mtime=0)
+    changed = upload_object_if_changed(bucket_path,
+                                       bucket,
+                                       content=content,
+                                       content_type='application/json',
+                                       content_encoding='gzip',
+                                       **_dashboard_object_settings(
+                                           product_data, config,
+                                           archive=is_archive_page(
+                                               relative_path)))
+    logger.info('upload_json_data', upload_path=bucket_path,
+                changed=changed, size=len(content))
+    return changed
+
 
+def upload_dir_redirect_object(relative_path, product_data, config):
+    """Upload the directory redirect object for a dashboard page to S3,
+    unless an identical object is already there.
+
+    Parameters
+    ----------
+    relative_path : `str`
+        Path of the page, relative to the product's root prefix. The
+        redirect object is named after the page's directory.
+    product_data : `dict`
+        Dataset describing the product resource from Keeper's
+        ``/products/(slug)`` endpoint.
+    config : `flask.config`
+        Flask configuration.
+
+    Returns
+    -------
+    changed : `bool`
+        `True` if the redirect object was uploaded.
+    """
+    bucket_dir_path = os.path.dirname(
+        _get_bucket_path(relative_path, product_data))
+    bucket = open_product_bucket(product_data['bucket_name'], config)
+
+    settings = _dashboard_object_settings(
+        product_data, config, archive=is_archive_page(relative_path))
+    # header used by LTD's Fastly Varnish config to create a 301 redirect
+    settings['metadata']['dir-redirect'] = 'true'
+    return upload_object_if_changed(bucket_dir_path,
+                                    bucket,
+                                    content='',
+                                    **settings)
+
+
+def _get_bucket_path(relative_path, product_data):
     if not relative_path.startswith('/'):
         relative_path = '/' + relative_path
-    bucket_path = product_data['slug'] + relative_path
-
-    product_data['bucket_name']
-
-    session = boto3.session.Session(
-        aws_access_key_id=config['AWS_ID'],
-        aws_secret_access_key=config['AWS_SECRET'])
-    s3 = session.resource('s3')
-    bucket = s3.Bucket(product_data['bucket_name'])
-
-    # Have Fastly cache the dashboard for a year (or until purged)
-    metadata = {'surrogate-key': surrogate_key,
-                'surrogate-control': 'max-age=31536000'}
-    acl = 'public-read'
-    # Have the *browser* never cache the dashboard
-    cache_control = 'no-cache'
-
-    # Upload HTML object
-    upload_object(bucket_path,
-                  bucket,
-                  content=html_data,
-                  metadata=metadata,
-                  acl=acl,
-                  cache_control=cache_control,
-                  content_type='text/html')
-
-    # Upload directory redirect object
-    bucket_dir_path = os.path.dirname(bucket_path)
-    create_dir_redirect_object(bucket_dir_path, bucket,
-                               metadata=metadata,
-                               acl=acl,
-                               cache_control=cache_control)
+    return product_data['slug'] + relative_path
+
+
+def _dashboard_object_settings(product_data, config, archive=False):
+    """Get the metadata and headers of dashboard pages and their redirect
+    objects, as keyword arguments for `app.s3.upload_object_if_changed`.
+
+    Build archive pages (if ``archive`` is `True`) have their own surrogate
+    key and are cached by browsers for ``BUILD_ARCHIVE_MAX_AGE`` seconds.
+    """
+    if archive:
+        surrogate_key = get_archive_surrogate_key(product_data)
+        cache_control = 'public, max-age={0:d}'.format(
+            config['BUILD_ARCHIVE_MAX_AGE'])
+    else:
+        surrogate_key = get_dashboard_surrogate_key(product_data)
+        # Have the *browser* never cache the dashboard
+        cache_control = 'no-cache'
+    return {
+        # Have Fastly cache the dashboard for a year (or until purged)
+        'metadata': {'surrogate-key': surrogate_key,
+                     'surrogate-control': get_dashboard_surrogate_control(
+                         config)},
+        'acl': 'public-read',
+        'cache_control': cache_control,
+    }
@@ -0,0 +1,86 @@
+"""Micro-benchmark of dataset hydration for the build dashboard.
+
+Compares the single-pass hydration of `app.dashboard.render` with the
+previous chain of ``_insert_*`` sweeps (reproduced here), which parsed every
+timestamp twice with ``strptime`` and called ``datetime.now()`` per item.
+
+Run from the repository root::
+
+   python -m benchmarks.hydration [number of builds]
+"""
+
+import copy
+import datetime
+import re
+import sys
+import timeit
+
+from app.dashboard.records import Build, project_records
+from app.dashboard.render import _hydrate_dataset
+
+
+TICKET_BRANCH_PATTERN = re.compile(r'^tickets/([A-Z]+-[0-9]+)')
+
+
+def make_build_data(n):
+    """Make a build dataset with ``n`` builds, as Keeper JSON data."""
+    start = datetime.datetime(2017, 1, 1)
+    build_data = {}
+    for i in range(n):
+        date_created = start + datetime.timedelta(minutes=i)
+        ref = 'tickets/DM-{0:d}'.format(i) if i % 2 else 'master'
+        build_data[str(i)] = {
+            'slug': str(i),
+            'date_created': date_created.strftime('%Y-%m-%dT%H:%M:%SZ'),
+            'git_refs': [ref],
+        }
+    return build_data
+
+
+def legacy_hydrate(product, dataset):
+    """The previous hydration: one sweep of the dataset per field."""
+    def parse(date_string):
+        return datetime.datetime.strptime(date_string, '%Y-%m-%dT%H:%M:%SZ')
+
+    for d in dataset.values():
+        d['datetime_created'] = parse(d['date_created'])
+    for d in dataset.values():
+        d['age'] = datetime.datetime.now() - parse(d['date_created'])
+    base_repo_url = product['doc_repo'].rstrip('.git')
+    for d in dataset.values():
+        d['github_ref_url'] = base_repo_url + '/tree/' + d['git_refs'][0]
+    for d in dataset.values():
+        match = TICKET_BRANCH_PATTERN.search(d['git_refs'][0])
+        if match is not None:
+            d['jira_ticket_name'] = match.group(1)
+            d['jira_url'] = 'https://jira.lsstcorp.org/browse/{0}'.format(
+                match.group(1))
+
+
+def single_pass_hydrate(product, dataset):
+    """The current single-pass hydration."""
+    _hydrate_dataset(product, dataset, datetime.datetime.now(),
+                     datetime_str_key='date_created',
+                     datetime_key='datetime_created',
+                     git_refs_key='git_refs')
+
+
+def main(n=100000, repeat=5):
+    product = {'doc_repo': 'https://github.com/lsst/pipelines_lsst_io.git'}
+    build_data = make_build_data(n)
+    build_records = project_records(Build, build_data.values())
+    print('Hydrating {0:d} builds (best of {1:d})'.format(n, repeat))
+    results = {}
+    for name, hydrate, dataset in (
+            ('legacy sweeps', legacy_hydrate, build_data),
+            ('single pass', single_pass_hydrate, build_records)):
+        datasets = [copy.deepcopy(dataset) for _ in range(repeat)]
+        timer = timeit.Timer(lambda: hydrate(product, datasets.pop()))
+        results[name] = min(timer.repeat(repeat=repeat, number=1))
+        print('{0:>14}: {1:.3f} s'.format(name, results[name]))
+    print('{0:>14}: {1:.1f}x'.format(
+        'speedup', results['legacy sweeps'] / results['single pass']))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,93 @@
+"""Memory benchmark of build records.
+
+Compares the memory used by a build dataset of Keeper JSON dictionaries
+with the same dataset projected into `app.dashboard.records.Build` records,
+both after hydration.
+
+Run from the repository root::
+
+   python -m benchmarks.records [number of builds]
+"""
+
+import datetime
+import sys
+import tracemalloc
+
+from app.dashboard.records import Build, project_records
+from app.dashboard.render import _hydrate_dataset
+
+
+def make_builds(n):
+    """Make ``n`` build resources, with all the fields Keeper provides."""
+    start = datetime.datetime(2017, 1, 1)
+    builds = []
+    for i in range(n):
+        date_created = start + datetime.timedelta(minutes=i)
+        builds.append({
+            'bucket_name': 'lsst-the-docs',
+            'bucket_root_dir': 'pipelines/builds/{0:d}'.format(i),
+            'date_created': date_created.strftime('%Y-%m-%dT%H:%M:%SZ'),
+            'date_ended': None,
+            'git_refs': ['tickets/DM-{0:d}'.format(i)],
+            'github_requester': None,
+            'product_url': 'https://keeper.lsst.codes/products/pipelines',
+            'published_url': 'https://pipelines.lsst.io/builds/{0:d}'.format(
+                i),
+            'self_url': 'https://keeper.lsst.codes/builds/{0:d}'.format(i),
+            'slug': str(i),
+            'surrogate_key': '{0:032x}'.format(i),
+            'uploaded': True,
+        })
+    return builds
+
+
+def hydrate_dicts(product, dataset, now):
+    """Add the hydration fields to JSON dictionaries."""
+    for d in dataset.values():
+        d['datetime_created'] = datetime.datetime.strptime(
+            d['date_created'], '%Y-%m-%dT%H:%M:%SZ')
+        d['age'] = now - d['datetime_created']
+        d['github_ref_url'] = product['doc_repo'] + '/tree/' \
+            + d['git_refs'][0]
+        d['jira_ticket_name'] = d['git_refs'][0][len('tickets/'):]
+        d['jira_url'] = 'https://jira.lsstcorp.org/browse/' \
+            + d['jira_ticket_name']
+
+
+def measure(build_dataset):
+    """Measure the memory allocated by ``build_dataset()``, in MiB."""
+    tracemalloc.start()
+    dataset = build_dataset()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del dataset
+    return size / 2**20
+
+
+def main(n=100000):
+    product = {'doc_repo': 'https://github.com/lsst/pipelines_lsst_io'}
+    now = datetime.datetime.now()
+
+    def dicts():
+        dataset = {b['slug']: b for b in make_builds(n)}
+        hydrate_dicts(product, dataset, now)
+        return dataset
+
+    def records():
+        dataset = project_records(Build, make_builds(n))
+        _hydrate_dataset(product, dataset, now,
+                         datetime_str_key='date_created',
+                         datetime_key='datetime_created',
+                         git_refs_key='git_refs')
+        return dataset
+
+    print('Memory of {0:d} hydrated builds'.format(n))
+    dict_size = measure(dicts)
+    record_size = measure(records)
+    print('{0:>8}: {1:.1f} MiB'.format('dicts', dict_size))
+    print('{0:>8}: {1:.1f} MiB'.format('records', record_size))
+    print('{0:>8}: {1:.1f}x'.format('ratio', dict_size / record_size))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -24,6 +24,7 @@ const env = options.env || 'dev';
 
 const dirs = {
   scss: 'src/scss',
+  js: 'src/js',
   svg: 'src/svg',
   icons: 'src/icons',
   assetsDeploy: 'app/dashboard/assets',
@@ -83,6 +84,16 @@ function svg() {
 
 exports.svg = svg;
 
+function js() {
+  return gulp
+    .src(`${dirs.js}/*.js`)
+    .pipe(env === 'dev' ? gulp.dest(dirs.assetsDev) : noop())
+    .pipe(env === 'deploy' ? gulp.dest(dirs.assetsDeploy) : noop())
+    .pipe(reload());
+}
+
+exports.js = js;
+
 function icons() {
   return gulp
     .src(`${dirs.icons}/**/*.svg`, { base: dirs.icons })
@@ -130,12 +141,16 @@ function server() {
 exports.server = server;
 
 // make all assets needed for the docker image
-const assets = gulp.parallel(scss, svg, icons);
+const assets = gulp.parallel(scss, svg, js, icons);
 exports.assets = assets;
 
 function watcher() {
   gulp.watch(
-    [`${dirs.scss}/**/*.scss`, `app/dashboard/**/*.{scss,jinja}`],
+    [
+      `${dirs.scss}/**/*.scss`,
+      `${dirs.js}/**/*.js`,
+      `app/dashboard/**/*.{scss,jinja}`,
+    ],
     {},
     gulp.series(assets, html)
   );
@@ -0,0 +1,214 @@
+// dasher-lists.js
+//
+// Client-side rendering of long dashboard lists.
+//
+// If LTD Dasher's LTD_DASHER_DASHBOARD_FIRST_SCREEN_ITEMS is set, the HTML of
+// a dashboard page only has the first screen of items of each long list.
+// Those lists have these attributes:
+//
+// - data-dasher-list: name of the list in the page's JSON data ("releases",
+//   "development" or "builds").
+// - data-dasher-src: URL of the page's JSON data (index.json).
+// - data-dasher-offset: number of items already in the HTML.
+//
+// This script fetches the JSON data and renders the remaining items with
+// list virtualization: the list gets a spacer with the height of all the
+// remaining items, and only the items near the viewport are in the DOM.
+
+(function () {
+  'use strict';
+
+  var SVG_NS = 'http://www.w3.org/2000/svg';
+  var XLINK_NS = 'http://www.w3.org/1999/xlink';
+
+  // Number of items rendered above and below the viewport
+  var OVERSCAN = 10;
+
+  // Item height if the list has no server-rendered items to measure
+  var DEFAULT_ITEM_HEIGHT = 120;
+
+  var dataRequests = {};
+
+  function fetchData(src) {
+    if (!dataRequests[src]) {
+      dataRequests[src] = fetch(src).then(function (response) {
+        if (!response.ok) {
+          throw new Error('Failed to load ' + src + ': ' + response.status);
+        }
+        return response.json();
+      });
+    }
+    return dataRequests[src];
+  }
+
+  function element(tag, className, parent) {
+    var el = document.createElement(tag);
+    if (className) {
+      el.className = className;
+    }
+    if (parent) {
+      parent.appendChild(el);
+    }
+    return el;
+  }
+
+  function link(href, text, parent, className) {
+    var a = element('a', className, parent);
+    a.href = href;
+    if (text) {
+      a.textContent = text;
+    }
+    return a;
+  }
+
+  function icon(symbol, parent, extraClass) {
+    var span = element(
+      'span',
+      'svg-icon svg-icon--left svg-baseline' + (extraClass || ''),
+      parent
+    );
+    var svg = document.createElementNS(SVG_NS, 'svg');
+    var use = document.createElementNS(SVG_NS, 'use');
+    use.setAttributeNS(XLINK_NS, 'xlink:href', '#' + symbol);
+    svg.appendChild(use);
+    span.appendChild(svg);
+    return span;
+  }
+
+  // Mirrors _edition_item.jinja and _build_item.jinja
+  function renderItem(item, listName) {
+    var isBuild = listName === 'builds';
+    var date = isBuild ? item.date_created : item.date_rebuilt;
+
+    var article = element('article', 'inventory-list__item');
+    var header = element('header', 'inventory-item__header', article);
+    var title = element('h3', 'inventory-item-header__title', header);
+    var iconLink = link(
+      item.published_url,
+      null,
+      title,
+      'hidden-link hidden-link--no-hover'
+    );
+    if (isBuild) {
+      icon('octicon-git-commit', iconLink);
+    } else {
+      icon(item.is_release ? 'octicon-tag' : 'octicon-git-branch', iconLink);
+    }
+    title.appendChild(document.createTextNode(' '));
+    link(item.published_url, item.alt_title || item.slug, title);
+
+    var dateEl = element('date', 'inventory-item-header__date', header);
+    dateEl.setAttribute('datetime', date);
+    dateEl.textContent = date ? date.slice(0, 10) : '';
+
+    var metadata = element('div', 'inventory-item__metadata', article);
+    if (item.jira_url) {
+      var jira = element(
+        'span',
+        null,
+        element('div', 'inventory-item-metadata__jira-url', metadata)
+      );
+      icon('icon-jira-blue', jira, ' svg-icon--jira');
+      jira.appendChild(document.createTextNode(' '));
+      link(item.jira_url, item.jira_ticket_name, jira);
+    }
+    if (isBuild || item.github_ref_url) {
+      var github = element(
+        'span',
+        null,
+        element('div', 'inventory-item-metadata__github-branch-box', metadata)
+      );
+      icon('octicon-mark-github', github);
+      link(item.github_ref_url, 'View source', github);
+    }
+    return article;
+  }
+
+  function VirtualList(list, items, listName) {
+    this.items = items;
+    this.listName = listName;
+    this.start = 0;
+    this.end = 0;
+
+    // Items have the height of the tallest server-rendered item
+    this.itemHeight = DEFAULT_ITEM_HEIGHT;
+    var rendered = list.children;
+    if (rendered.length > 0) {
+      this.itemHeight = 0;
+      for (var i = 0; i < rendered.length; i++) {
+        this.itemHeight = Math.max(this.itemHeight, rendered[i].offsetHeight);
+      }
+    }
+
+    this.spacer = element('li', 'inventory-list__spacer', list);
+    this.spacer.style.position = 'relative';
+    this.spacer.style.height = items.length * this.itemHeight + 'px';
+
+    var self = this;
+    var scheduled = false;
+    function schedule() {
+      if (!scheduled) {
+        scheduled = true;
+        window.requestAnimationFrame(function () {
+          scheduled = false;
+          self.update();
+        });
+      }
+    }
+    window.addEventListener('scroll', schedule, { passive: true });
+    window.addEventListener('resize', schedule);
+    this.update();
+  }
+
+  VirtualList.prototype.update = function () {
+    var top = this.spacer.getBoundingClientRect().top;
+    var start = Math.floor(-top / this.itemHeight) - OVERSCAN;
+    var end = Math.ceil((window.innerHeight - top) / this.itemHeight) + OVERSCAN;
+    start = Math.max(0, Math.min(start, this.items.length));
+    end = Math.max(start, Math.min(end, this.items.length));
+    if (start === this.start && end === this.end) {
+      return;
+    }
+    this.start = start;
+    this.end = end;
+
+    var fragment = document.createDocumentFragment();
+    for (var i = start; i < end; i++) {
+      var item = element('div', 'inventory-list__virtual-item', fragment);
+      item.style.position = 'absolute';
+      item.style.top = i * this.itemHeight + 'px';
+      item.style.left = '0';
+      item.style.right = '0';
+      item.appendChild(renderItem(this.items[i], this.listName));
+    }
+    while (this.spacer.firstChild) {
+      this.spacer.removeChild(this.spacer.firstChild);
+    }
+    this.spacer.appendChild(fragment);
+  };
+
+  function init() {
+    var lists = document.querySelectorAll('ul[data-dasher-list]');
+    Array.prototype.forEach.call(lists, function (list) {
+      var listName = list.getAttribute('data-dasher-list');
+      var src = list.getAttribute('data-dasher-src');
+      var offset = parseInt(list.getAttribute('data-dasher-offset'), 10) || 0;
+      fetchData(src)
+        .then(function (data) {
+          var items = (data[listName] || []).slice(offset);
+          if (items.length > 0) {
+            new VirtualList(list, items, listName);
+          }
+        })
+        .catch(function (error) {
+          console.error(error);
+        });
+    });
+  }
+
+  if (document.readyState === 'loading') {
+    document.addEventListener('DOMContentLoaded', init);
+  } else {
+    init();
+  }
+})();
@@ -0,0 +1,56 @@
+"""Test app.assets."""
+
+import pytest
+
+from app.assets import build_manifest, diff_manifests
+from app.config import check_config
+from app.exceptions import ConfigurationError
+
+
+def test_build_manifest(tmpdir):
+    tmpdir.join('app.css').write('body {}')
+    tmpdir.mkdir('icons').join('icon.svg').write('<svg></svg>')
+
+    manifest = build_manifest(str(tmpdir))
+    assert sorted(manifest['files']) == ['app.css', 'icons/icon.svg']
+
+    # The version only changes when file contents change
+    assert build_manifest(str(tmpdir))['version'] == manifest['version']
+    tmpdir.join('app.css').write('body { color: red; }')
+    assert build_manifest(str(tmpdir))['version'] != manifest['version']
+
+
+def test_diff_manifests():
+    local = {'version': '2', 'files': {'app.css': 'b', 'logo.svg': 'c'}}
+    remote = {'version': '1', 'files': {'app.css': 'a', 'logo.svg': 'c',
+                                        'old.css': 'd'}}
+
+    assert diff_manifests(local, remote) == (['app.css'], ['old.css'])
+    assert diff_manifests(local, None) == (['app.css', 'logo.svg'], [])
+    assert diff_manifests(local, local) == ([], [])
+
+
+def test_get_asset_dir(empty_app):
+    from app.assets import get_manifest
+    from app.worker import get_asset_dir
+
+    product_data = {'published_url': 'https://sqr-000.lsst.io'}
+    config = dict(empty_app.config)
+
+    assert get_asset_dir(product_data, config) \
+        == 'https://sqr-000.lsst.io/_dasher-assets'
+
+    config['SHARED_ASSETS_URL'] = 'https://www.lsst.io/_dasher-assets/'
+    assert get_asset_dir(product_data, config) \
+        == 'https://www.lsst.io/_dasher-assets/' + get_manifest()['version']
+
+
+def test_check_shared_assets_config(empty_app):
+    config = dict(empty_app.config)
+    config['SHARED_ASSETS_URL'] = 'https://www.lsst.io/_dasher-assets/'
+    # Shared assets need their own bucket
+    with pytest.raises(ConfigurationError):
+        check_config(config)
+
+    config['SHARED_ASSETS_BUCKET'] = 'lsst-the-docs'
+    check_config(config)
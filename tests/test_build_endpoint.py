@@ -1,5 +1,6 @@
 """Test app.routes.build."""
 
+import pytest
 import responses
 
 
@@ -130,6 +131,90 @@ def test_rebuild_dashboards(anon_client):
         }
     )
     assert r.status == 202
+    assert r.headers['Location'] == r.json['job_url']
+
+    # Builds run eagerly in the testing profile
+    r = anon_client.get(r.headers['Location'])
+    assert r.status == 200
+    assert r.json['state'] == 'succeeded'
+    product_status = r.json['products'][0]
+    assert product_status['state'] == 'succeeded'
+    assert product_status['error'] is None
+    assert set(product_status['phases']) == {'fetch', 'render', 'publish',
+                                             'purge'}
+
+
+@responses.activate
+def test_rebuild_dashboards_failure(anon_client):
+    """Test that a failed product build is reported in the job status."""
+    responses.add(
+        responses.GET,
+        'https://keeper-staging.lsst.codes/products/test-059/dashboard',
+        json={},
+        status=500,
+        content_type='application/json')
+    responses.add(
+        responses.GET,
+        'https://keeper-staging.lsst.codes/products/test-059',
+        json={},
+        status=500,
+        content_type='application/json')
+
+    r = anon_client.post(
+        '/build',
+        {
+            'product_urls': ['https://keeper-staging.lsst.codes/'
+                             'products/test-059']
+        }
+    )
+    assert r.status == 202
+
+    r = anon_client.get(r.headers['Location'])
+    assert r.json['state'] == 'failed'
+    assert r.json['products'][0]['error']['phase'] == 'fetch'
+
+
+def test_rebuild_dashboards_bad_request(anon_client):
+    r = anon_client.post('/build', {'product_url': 'not-a-list'})
+    assert r.status == 400
+
+
+@pytest.mark.parametrize('product_urls', [
+    'https://keeper-staging.lsst.codes/products/test-059',
+    [['https://keeper-staging.lsst.codes/products/test-059']],
+    [{'url': 'https://keeper-staging.lsst.codes/products/test-059'}],
+    [],
+    [1],
+    [''],
+    [None],
+])
+def test_rebuild_dashboards_bad_product_urls(anon_client, product_urls):
+    r = anon_client.post('/build', {'product_urls': product_urls})
+    assert r.status == 400
+
+
+def test_build_job_without_products():
+    from app.jobs import SUCCEEDED, BuildJob
+
+    job = BuildJob([])
+    assert job.finished
+    assert job.state == SUCCEEDED
+    assert job.to_dict()['products'] == []
+
+
+@pytest.mark.parametrize('body', [
+    ['https://keeper-staging.lsst.codes/products/test-059'],
+    'https://keeper-staging.lsst.codes/products/test-059',
+    1,
+])
+def test_rebuild_dashboards_not_an_object(anon_client, body):
+    r = anon_client.post('/build', body)
+    assert r.status == 400
+
+
+def test_unknown_build_job(anon_client):
+    r = anon_client.get('/build/unknown')
+    assert r.status == 404
 
 
 @responses.activate
@@ -199,3 +284,30 @@ def test_rebuild_dashboards_oldstyle(anon_client):
         }
     )
     assert r.status == 202
+
+
+@responses.activate
+def test_rebuild_dashboards_not_modified(anon_client):
+    """A 304 response from the bulk endpoint skips the rest of the build."""
+    product_url = 'https://keeper-staging.lsst.codes/products/test-304'
+    bulk_url = product_url + '/dashboard'
+    responses.add(
+        responses.GET,
+        bulk_url,
+        json=mock_bulk_data,
+        status=200,
+        headers={'ETag': '"abc123"'},
+        content_type='application/json')
+    responses.add(responses.GET, bulk_url, status=304)
+
+    r = anon_client.post('/build', {'product_urls': [product_url]})
+    r = anon_client.get(r.headers['Location'])
+    assert r.json['products'][0]['skipped'] is None
+    assert 'render' in r.json['products'][0]['phases']
+
+    r = anon_client.post('/build', {'product_urls': [product_url]})
+    r = anon_client.get(r.headers['Location'])
+    assert responses.calls[1].request.headers['If-None-Match'] == '"abc123"'
+    assert r.json['products'][0]['state'] == 'succeeded'
+    assert r.json['products'][0]['skipped'] == 'Keeper data not modified'
+    assert list(r.json['products'][0]['phases']) == ['fetch']
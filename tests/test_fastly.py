@@ -0,0 +1,62 @@
+"""Test app.fastly."""
+
+import pytest
+import responses
+
+from app.fastly import PurgeBatcher
+
+
+PURGE_URL = 'https://api.fastly.com/service/fastly_test_id/purge'
+
+
+@responses.activate
+def test_purge_batcher():
+    responses.add(responses.POST, PURGE_URL,
+                  json={'key-a': '108-1', 'key-b': '108-2'},
+                  status=200)
+
+    # Long window so that only flush() sends the batch
+    batcher = PurgeBatcher('fastly_test_id', 'fastly_test_key', window=60.)
+    futures = [batcher.submit('key-a'),
+               batcher.submit('key-b'),
+               batcher.submit('key-a')]
+    assert len(responses.calls) == 0
+    batcher.flush()
+
+    # Keys are deduplicated and purged in one request
+    assert len(responses.calls) == 1
+    assert responses.calls[0].request.headers['Surrogate-Key'] \
+        == 'key-a key-b'
+    assert futures[0].result() == {'purge_id': '108-1', 'batch_size': 2}
+    assert futures[1].result() == {'purge_id': '108-2', 'batch_size': 2}
+    assert futures[2].result() == futures[0].result()
+
+
+@responses.activate
+def test_purge_batcher_window():
+    responses.add(responses.POST, PURGE_URL, json={'key-a': '108-1'},
+                  status=200)
+
+    batcher = PurgeBatcher('fastly_test_id', 'fastly_test_key', window=0.01)
+    assert batcher.submit('key-a').result(timeout=5)['purge_id'] == '108-1'
+
+
+@responses.activate
+def test_purge_batcher_error():
+    responses.add(responses.POST, PURGE_URL, json={}, status=500)
+
+    batcher = PurgeBatcher('fastly_test_id', 'fastly_test_key', window=0.)
+    future = batcher.submit('key-a')
+    with pytest.raises(Exception):
+        future.result()
+
+
+@responses.activate
+def test_soft_purge():
+    responses.add(responses.POST, PURGE_URL, json={'key-a': '108-1'},
+                  status=200)
+
+    batcher = PurgeBatcher('fastly_test_id', 'fastly_test_key', window=0.,
+                           soft=True)
+    batcher.submit('key-a').result()
+    assert responses.calls[0].request.headers['Fastly-Soft-Purge'] == '1'
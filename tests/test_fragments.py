@@ -0,0 +1,66 @@
+"""Test app.dashboard.fragments."""
+
+import copy
+
+from app.dashboard.fragments import (FragmentCache, get_fragment_cache,
+                                     init_fragment_cache)
+from app.dashboard.records import Build, project_records
+from app.dashboard.render import render_build_dashboard
+
+from .test_build_endpoint import mock_product_data, mock_build_1322_data
+
+
+def test_fragment_cache():
+    cache = FragmentCache(max_size=2)
+    rendered = []
+
+    def render(key):
+        def _render():
+            rendered.append(key)
+            return '<p>{0}</p>'.format(key)
+        return _render
+
+    assert cache.stats()['hit_rate'] is None
+    assert cache.get_or_render('a', render('a')) == '<p>a</p>'
+    assert cache.get_or_render('b', render('b')) == '<p>b</p>'
+    assert cache.get_or_render('a', render('a')) == '<p>a</p>'
+    # 'b' is the least recently used fragment
+    assert cache.get_or_render('c', render('c')) == '<p>c</p>'
+    assert cache.get_or_render('a', render('a')) == '<p>a</p>'
+    assert cache.get_or_render('b', render('b')) == '<p>b</p>'
+    assert rendered == ['a', 'b', 'c', 'b']
+
+    assert cache.stats() == {'size': 2, 'max_size': 2, 'hits': 2,
+                             'misses': 4, 'evictions': 2,
+                             'hit_rate': 2 / 6}
+
+
+def test_fragment_cache_disabled():
+    cache = FragmentCache(max_size=0)
+    cache.get_or_render('a', lambda: 'a')
+    cache.get_or_render('a', lambda: 'a')
+    assert cache.stats()['size'] == 0
+    assert cache.stats()['misses'] == 2
+
+
+def test_render_uses_fragment_cache(monkeypatch):
+    # The process-wide cache is restored after the test
+    monkeypatch.setattr('app.dashboard.fragments._cache', None)
+    cache = init_fragment_cache({'FRAGMENT_CACHE_SIZE': 10})
+    assert get_fragment_cache() is cache
+
+    product_data = copy.deepcopy(mock_product_data)
+    html = render_build_dashboard(
+        product_data, project_records(Build, [mock_build_1322_data]))
+    assert cache.stats()['misses'] == 1
+    # A fresh dataset with the same build reuses the cached item
+    assert render_build_dashboard(
+        product_data,
+        project_records(Build, [mock_build_1322_data])) == html
+    assert cache.stats()['hits'] == 1
+
+
+def test_stats_endpoint(anon_client):
+    r = anon_client.get('/stats')
+    assert r.status == 200
+    assert r.json['fragment_cache']['max_size'] == 5000
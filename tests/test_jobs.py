@@ -0,0 +1,126 @@
+"""Test app.jobs."""
+
+import threading
+import time
+
+from app.jobs import BuildQueue, BuildStage
+
+
+def _make_queue(*stages):
+    config = {'BUILD_QUEUE_EAGER': False,
+              'BUILD_JOB_HISTORY': 10,
+              'BUILD_STAGE_QUEUE_SIZE': 1}
+    return BuildQueue(config,
+                      [BuildStage('stage{0:d}'.format(i), function, 2)
+                       for i, function in enumerate(stages)])
+
+
+def test_coalesce_builds():
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def target(product_url, config, product_build=None):
+        calls.append(product_url)
+        started.set()
+        release.wait(timeout=5)
+
+    queue = _make_queue(target)
+    product_url = 'https://keeper.lsst.codes/products/test'
+
+    job1 = queue.submit([product_url])
+    assert started.wait(timeout=5)
+
+    # Triggers while the first build runs share one follow-up build
+    job2 = queue.submit([product_url])
+    job3 = queue.submit([product_url, product_url])
+    assert job2.products[0] is job3.products[0]
+    assert job2.products[0] is not job1.products[0]
+    assert job2.products[0].state == 'queued'
+    assert job2.products[0].coalesced == 2
+
+    release.set()
+    _wait_until(lambda: job3.finished)
+
+    assert calls == [product_url, product_url]
+    assert job1.state == 'succeeded'
+    assert job3.state == 'succeeded'
+    assert job3.to_dict()['products'][0]['coalesced'] == 2
+
+
+def test_cancel_superseded_build():
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def target(product_url, config, product_build=None):
+        calls.append(product_url)
+        with product_build.phase('fetch'):
+            started.set()
+            release.wait(timeout=5)
+        product_build.check_cancelled()
+        with product_build.phase('render'):
+            pass
+
+    queue = _make_queue(target)
+    product_url = 'https://keeper.lsst.codes/products/test'
+
+    job1 = queue.submit([product_url])
+    assert started.wait(timeout=5)
+    job2 = queue.submit([product_url])
+    assert job1.products[0].superseded
+
+    release.set()
+    _wait_until(lambda: job2.finished)
+
+    assert calls == [product_url, product_url]
+    assert job1.state == 'cancelled'
+    product = job1.to_dict()['products'][0]
+    assert list(product['phases'].keys()) == ['fetch']
+    assert product['log'][-1]['event'] == 'cancelled'
+    assert product['log'][-1]['after_phase'] == 'fetch'
+    assert job2.state == 'succeeded'
+    assert not job2.products[0].superseded
+
+
+def test_pipeline():
+    fetched = threading.Event()
+
+    def fetch(product_url, config, product_build):
+        if product_url.endswith('second'):
+            fetched.set()
+        elif product_url.endswith('skipped'):
+            return None
+        return product_url
+
+    def render(product_url, config, product_build):
+        if product_url.endswith('first'):
+            # The next product is fetched while this one renders
+            assert fetched.wait(timeout=5)
+        if product_url.endswith('bad'):
+            raise RuntimeError('render failed')
+        return product_url
+
+    def publish(product_url, config, product_build):
+        product_build.log_event('published')
+
+    queue = _make_queue(fetch, render, publish)
+    urls = ['https://keeper.lsst.codes/products/' + name
+            for name in ('first', 'second', 'bad', 'skipped')]
+    job = queue.submit(urls)
+    _wait_until(lambda: job.finished)
+
+    states = [p.state for p in job.products]
+    assert states == ['succeeded', 'succeeded', 'failed', 'succeeded']
+    assert job.state == 'failed'
+    assert job.products[0].log[-1]['event'] == 'published'
+    assert job.products[2].error['message'] == 'render failed'
+    assert job.products[2].log == []
+    assert job.products[3].log == []
+
+
+def _wait_until(condition, timeout=5.):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
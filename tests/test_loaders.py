@@ -0,0 +1,116 @@
+"""Test app.dashboard.loaders."""
+
+import pytest
+import responses
+
+from app.dashboard.keeper import KeeperClient
+from app.dashboard.loaders import (load_build_data, load_bulk_dashboard_data,
+                                   load_product_data)
+from app.dashboard.validatorcache import ValidatorCache
+from app.exceptions import KeeperError
+
+
+PRODUCT_URL = 'https://keeper-staging.lsst.codes/products/test-059'
+
+
+def _add_build_responses(n_builds, failing=()):
+    build_urls = ['https://keeper-staging.lsst.codes/builds/{0:d}'.format(i)
+                  for i in range(n_builds)]
+    responses.add(
+        responses.GET,
+        PRODUCT_URL + '/builds/',
+        json={'builds': build_urls},
+        status=200)
+    for i, url in enumerate(build_urls):
+        if i in failing:
+            responses.add(responses.GET, url, json={}, status=500)
+        else:
+            responses.add(responses.GET, url, json={'slug': str(i)},
+                          status=200)
+    return build_urls
+
+
+@pytest.mark.parametrize('concurrency', [1, 4])
+@responses.activate
+def test_load_build_data(concurrency):
+    _add_build_responses(20)
+
+    build_data = load_build_data(PRODUCT_URL, concurrency=concurrency)
+
+    # Order follows the Keeper listing regardless of completion order
+    assert list(build_data.keys()) == [str(i) for i in range(20)]
+
+
+@pytest.mark.parametrize('concurrency', [1, 4])
+@responses.activate
+def test_load_build_data_failure(concurrency):
+    build_urls = _add_build_responses(10, failing=(3, 7))
+
+    keeper = KeeperClient(retries=0)
+    with pytest.raises(KeeperError) as excinfo:
+        load_build_data(PRODUCT_URL, keeper=keeper, concurrency=concurrency)
+
+    assert excinfo.value.failed_urls == [build_urls[3], build_urls[7]]
+
+
+@responses.activate
+def test_keeper_client_retry():
+    """The Keeper client retries requests that fail with a 5xx status."""
+    responses.add(responses.GET, PRODUCT_URL, json={}, status=503)
+    responses.add(responses.GET, PRODUCT_URL, json={'slug': 'test-059'},
+                  status=200)
+
+    keeper = KeeperClient(retries=2, backoff_factor=0.)
+    product_data = load_product_data(PRODUCT_URL, keeper=keeper)
+
+    assert product_data['slug'] == 'test-059'
+    assert len(responses.calls) == 2
+
+
+@pytest.mark.parametrize('stream', [False, True])
+@responses.activate
+def test_load_bulk_dashboard_data(stream):
+    bulk_data = {
+        'editions': [{'slug': 'main', 'published_url': 'https://a.io',
+                      'date_rebuilt': '2017-02-03T23:51:21Z',
+                      'tracked_refs': ['master'], 'title': 'Latest'}],
+        'product': {'slug': 'test-059', 'title': 'Test',
+                    'metadata': {'version': 1.5, 'tags': ['a', 'b']}},
+        'builds': [{'slug': str(i), 'git_refs': ['master'],
+                    'date_created': '2017-02-03T23:51:08Z'}
+                   for i in range(3)],
+    }
+    responses.add(responses.GET, PRODUCT_URL + '/dashboard',
+                  json=bulk_data, status=200)
+
+    product_data, edition_data, build_data = load_bulk_dashboard_data(
+        PRODUCT_URL, keeper=KeeperClient(), stream=stream)
+
+    assert product_data == bulk_data['product']
+    assert list(edition_data.keys()) == ['main']
+    assert edition_data['main'].tracked_refs == ['master']
+    assert list(build_data.keys()) == ['0', '1', '2']
+
+
+@pytest.mark.parametrize('validator_cache', [None, ValidatorCache()])
+@responses.activate
+def test_load_bulk_dashboard_data_unexpected_304(validator_cache):
+    # No validators are cached (e.g., after a restart), so there's no data
+    # to reuse
+    responses.add(responses.GET, PRODUCT_URL + '/dashboard', status=304)
+
+    with pytest.raises(KeeperError) as excinfo:
+        load_bulk_dashboard_data(PRODUCT_URL, keeper=KeeperClient(),
+                                 validator_cache=validator_cache)
+    assert excinfo.value.failed_urls == [PRODUCT_URL + '/dashboard']
+
+
+@responses.activate
+def test_load_bulk_dashboard_data_invalid_stream():
+    responses.add(responses.GET, PRODUCT_URL + '/dashboard',
+                  body='{"product": {"slug": "test-059"}, "builds": [',
+                  status=200)
+
+    with pytest.raises(ValueError):
+        load_bulk_dashboard_data(PRODUCT_URL, keeper=KeeperClient(),
+                                 stream=True)
@@ -1,6 +1,37 @@
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import copy
+import datetime
+import json
+import multiprocessing
+import os
+import sys
+
 import pytest
-from app.dashboard.render import (_insert_doc_handle,
-                                  _normalize_product_title)
+from app.dashboard.render import (_compute_templates_digest,
+                                  _insert_doc_handle,
+                                  _normalize_product_title,
+                                  _parse_keeper_datetime,
+                                  _hydrate_dataset,
+                                  hydrate_product_data,
+                                  hydrate_build_data,
+                                  hydrate_edition_data,
+                                  get_jinja_env, init_jinja_env,
+                                  render_edition_dashboard,
+                                  render_build_dashboard,
+                                  render_build_data,
+                                  render_dashboard_data,
+                                  render_dashboard_page,
+                                  render_page_documents,
+                                  split_build_archives,
+                                  split_edition_overflow)
+from app.dashboard.records import Build, Edition, project_records
+from app.dashboard.renderpool import (get_python_executable,
+                                      get_render_pool,
+                                      render_dashboard_pages)
+
+from .test_build_endpoint import (mock_product_data, mock_edition_388_data,
+                                  mock_edition_390_data, mock_build_1322_data)
 
 
 @pytest.mark.parametrize(
@@ -37,3 +68,290 @@ def test_product_title(title, expected_title):
 
     _normalize_product_title(product)
     assert product['title'] == expected_title
+
+
+def test_parse_keeper_datetime():
+    assert _parse_keeper_datetime('2017-02-03T23:51:08Z') \
+        == datetime.datetime(2017, 2, 3, 23, 51, 8)
+    with pytest.raises(ValueError):
+        _parse_keeper_datetime('2017-02-03 23:51:08')
+
+
+def test_hydrate_product_data():
+    product = {'slug': 'sqr-000',
+               'title': 'SQR-000: SQR-000 and more',
+               'doc_repo': 'https://github.com/lsst-sqre/sqr-000.git'}
+    hydrate_product_data(product)
+    assert product['title'] == 'SQR-000 and more'
+    assert product['github_handle'] == 'lsst-sqre/sqr-000'
+    assert product['ci_url'] == 'https://travis-ci.org/lsst-sqre/sqr-000'
+
+    # Fields are only computed once
+    hydrate_product_data(product)
+    assert product['title'] == 'SQR-000 and more'
+
+
+def test_hydrate_dataset():
+    product = {'doc_repo': 'https://github.com/lsst-sqre/test-059.git'}
+    editions = project_records(Edition, [
+        {'slug': 'v1', 'date_rebuilt': '2017-02-03T23:51:21Z',
+         'tracked_refs': ['v1']},
+        {'slug': 'DM-1', 'date_rebuilt': '2017-02-09T23:41:17Z',
+         'tracked_refs': ['tickets/DM-1']},
+        {'slug': 'old', 'date_rebuilt': '2017-02-09T23:41:17Z',
+         'tracked_refs': None},
+    ])
+    now = datetime.datetime(2017, 2, 10)
+    _hydrate_dataset(product, editions, now, insert_is_release=True)
+
+    assert editions['v1'].is_release is True
+    assert editions['v1'].alt_title == 'v1'
+    assert editions['v1'].datetime_rebuilt \
+        == datetime.datetime(2017, 2, 3, 23, 51, 21)
+    assert editions['v1'].age == now - editions['v1'].datetime_rebuilt
+    assert editions['DM-1'].is_release is False
+    assert editions['DM-1'].jira_ticket_name == 'DM-1'
+    assert editions['DM-1'].github_ref_url \
+        == 'https://github.com/lsst-sqre/test-059/tree/tickets/DM-1'
+    assert editions['old'].github_ref_url is None
+    assert editions['old'].age is not None
+
+
+def test_init_jinja_env(tmpdir, monkeypatch):
+    # The process-wide environment is restored after the test
+    monkeypatch.setattr('app.dashboard.render._jinja_env', None)
+    config = {'JINJA_AUTO_RELOAD': False,
+              'JINJA_BYTECODE_CACHE_DIR': str(tmpdir)}
+    env = init_jinja_env(config)
+
+    assert get_jinja_env() is env
+    assert env.auto_reload is False
+    # Templates are compiled up front and their bytecode is cached on disk
+    assert len(env.cache) > 0
+    assert len(tmpdir.listdir()) == len(env.cache)
+
+
+def test_compute_templates_digest(tmpdir):
+    tmpdir.join('base.jinja').write('base')
+    # Templates in subdirectories are included, and directories are skipped
+    tmpdir.mkdir('partials').join('_item.jinja').write('item')
+    digest = _compute_templates_digest(str(tmpdir))
+    assert _compute_templates_digest(str(tmpdir)) == digest
+
+    tmpdir.join('partials', '_item.jinja').write('changed item')
+    assert _compute_templates_digest(str(tmpdir)) != digest
+
+
+def test_render_dashboard_pages():
+    product_data = copy.deepcopy(mock_product_data)
+    edition_data = project_records(
+        Edition, [mock_edition_388_data, mock_edition_390_data])
+    build_data = project_records(Build, [mock_build_1322_data])
+    asset_dir = 'https://test-059.lsst.io/_dasher-assets'
+
+    with ProcessPoolExecutor(
+            max_workers=1,
+            mp_context=multiprocessing.get_context('spawn')) as pool:
+        html_data = render_dashboard_pages(
+            pool, product_data,
+            {'v/index.html': ('editions', edition_data, {}),
+             'builds/index.html': ('builds', build_data,
+                                   {'archive_years': [2016]})},
+            asset_dir)
+
+    # Datasets aren't modified by rendering in another process
+    assert product_data == mock_product_data
+
+    assert html_data['v/index.html'] == render_edition_dashboard(
+        product_data, edition_data, asset_dir=asset_dir)
+    assert html_data['builds/index.html'] == render_build_dashboard(
+        product_data, build_data, asset_dir=asset_dir,
+        archive_years=[2016])
+    # Documents are in page order
+    assert list(html_data) == ['v/index.html', 'v/index.json',
+                               'builds/index.html', 'builds/index.json']
+
+
+def test_render_page_documents(monkeypatch):
+    product_data = copy.deepcopy(mock_product_data)
+    edition_data = project_records(
+        Edition, [mock_edition_388_data, mock_edition_390_data])
+    now = datetime.datetime(2018, 1, 1)
+    page = ('editions', edition_data, {'overflow_count': 2})
+    hydrate_edition_data(product_data, edition_data, now)
+
+    # Hydrated records aren't parsed again for the page or its data
+    def fail(date_string):
+        raise AssertionError(date_string)
+    monkeypatch.setattr('app.dashboard.render._parse_keeper_datetime', fail)
+    documents = render_page_documents(product_data, 'v/index.html', page,
+                                      now=now, hydrated=True)
+    monkeypatch.undo()
+
+    assert documents == {
+        'v/index.html': render_dashboard_page(product_data, page, now=now),
+        'v/index.json': render_dashboard_data(product_data, page, now=now)}
+
+
+def test_render_dashboard_pages_broken_pool(monkeypatch):
+    product_data = copy.deepcopy(mock_product_data)
+    build_data = project_records(Build, [mock_build_1322_data])
+    pages = {'builds/index.html': ('builds', build_data, {})}
+    now = datetime.datetime(2018, 1, 1)
+
+    pool = ProcessPoolExecutor(
+        max_workers=1, mp_context=multiprocessing.get_context('spawn'))
+    # A worker process dies
+    with pytest.raises(BrokenProcessPool):
+        pool.submit(os._exit, 1).result()
+    monkeypatch.setattr('app.dashboard.renderpool._pool', pool)
+
+    # The product is rendered in this thread instead
+    html_data = render_dashboard_pages(pool, product_data, pages,
+                                       '/_dasher-assets', now=now)
+    assert html_data['builds/index.html'] == render_build_dashboard(
+        product_data, build_data, now=now)
+
+    # and the next render gets a new pool
+    new_pool = get_render_pool({'RENDER_PROCESSES': 1,
+                                'JINJA_AUTO_RELOAD': False,
+                                'JINJA_BYTECODE_CACHE_DIR': None,
+                                'FRAGMENT_CACHE_SIZE': 10})
+    assert new_pool is not pool
+    new_pool.shutdown()
+
+
+def test_get_python_executable(monkeypatch):
+    assert get_python_executable() == sys.executable
+    # In uWSGI, sys.executable is the uwsgi binary
+    monkeypatch.setattr(sys, 'executable', '/usr/local/bin/uwsgi')
+    assert os.path.basename(get_python_executable()).startswith('python')
+
+
+def test_records():
+    edition = Edition.from_json(mock_edition_388_data)
+    assert edition.slug == 'main'
+    assert edition.tracked_refs == ['master']
+    assert edition.jira_url is None
+    # Only the fields used by the dashboards are kept
+    assert not hasattr(edition, 'surrogate_key')
+    assert not hasattr(edition, '__dict__')
+    assert Edition.from_json(edition.to_json()) == edition
+
+
+def test_split_build_archives():
+    build_data = project_records(Build, [
+        {'slug': '1', 'date_created': '2017-02-03T23:51:08Z'},
+        {'slug': '2', 'date_created': '2018-12-31T23:00:00Z'},
+        {'slug': '3', 'date_created': '2019-01-01T00:00:00Z'},
+        {'slug': '4', 'date_created': '2017-06-01T00:00:00Z'}])
+    hydrate_build_data(copy.deepcopy(mock_product_data), build_data,
+                       datetime.datetime(2019, 1, 31))
+
+    # 2018 is closed 30 days after its end
+    recent, archives = split_build_archives(
+        build_data, datetime.datetime(2019, 1, 31), 30)
+    assert list(recent) == ['3']
+    assert list(archives) == [2018, 2017]
+    assert list(archives[2017]) == ['1', '4']
+
+    recent, archives = split_build_archives(
+        build_data, datetime.datetime(2019, 1, 30), 30)
+    assert list(recent) == ['2', '3']
+    assert list(archives) == [2017]
+
+
+def test_render_build_archive_page():
+    product_data = copy.deepcopy(mock_product_data)
+    build_data = project_records(Build, [mock_build_1322_data])
+
+    html = render_build_dashboard(product_data, build_data,
+                                  archive_years=[2017])
+    assert '/builds/archive/2017/' in html
+
+    archive_html = render_build_dashboard(product_data, build_data,
+                                          archive_years=[2018, 2017],
+                                          archive_year=2017)
+    assert 'Builds from 2017' in archive_html
+    assert '/builds/archive/' not in archive_html
+    # Archive pages don't depend on the time of rendering
+    assert archive_html == render_build_dashboard(
+        product_data, build_data, now=datetime.datetime(2030, 1, 1),
+        archive_year=2017)
+
+
+def test_split_edition_overflow():
+    product_data = copy.deepcopy(mock_product_data)
+
+    def edition(slug, date_rebuilt):
+        return dict(mock_edition_388_data, slug=slug,
+                    date_rebuilt=date_rebuilt, tracked_refs=[slug])
+
+    edition_data = project_records(Edition, [
+        edition('main', '2016-01-01T00:00:00Z'),
+        edition('v1', '2017-01-01T00:00:00Z'),
+        edition('v2', '2017-02-01T00:00:00Z'),
+        edition('v3', '2017-03-01T00:00:00Z'),
+        edition('DM-1', '2017-01-01T00:00:00Z'),
+        edition('DM-2', '2017-04-01T00:00:00Z')])
+    hydrate_edition_data(product_data, edition_data,
+                         datetime.datetime(2018, 1, 1))
+
+    editions, overflow = split_edition_overflow(edition_data, 2)
+    # The main edition is always shown
+    assert list(editions) == ['main', 'v2', 'v3', 'DM-1', 'DM-2']
+    assert list(overflow) == ['v1']
+
+    assert split_edition_overflow(edition_data, 0) == (edition_data, {})
+
+    html = render_edition_dashboard(product_data, editions,
+                                    overflow_count=3)
+    assert '/v/_dasher-older/' in html
+    overflow_html = render_edition_dashboard(product_data, overflow,
+                                             overflow=True)
+    assert 'Older releases' in overflow_html
+    assert '/v/_dasher-older/' not in overflow_html
+
+
+def test_render_build_data():
+    product_data = copy.deepcopy(mock_product_data)
+    build_data = project_records(Build, [
+        dict(mock_build_1322_data, slug='1',
+             date_created='2017-02-03T23:51:08Z'),
+        dict(mock_build_1322_data, slug='2',
+             date_created='2017-02-04T23:51:08Z')])
+
+    json_data = render_build_data(product_data, build_data,
+                                  archive_years=[2016])
+    # Data is minified, and doesn't depend on the time of rendering
+    assert ' ' not in json_data
+    assert json_data == render_build_data(
+        product_data, build_data, now=datetime.datetime(2030, 1, 1),
+        archive_years=[2016])
+
+    doc = json.loads(json_data)
+    assert doc['product']['slug'] == 'test-059'
+    assert [build['slug'] for build in doc['builds']] == ['2', '1']
+    assert doc['builds'][0]['date_created'] == '2017-02-04T23:51:08Z'
+    assert doc['archives'] == [
+        'https://test-059.lsst.io/builds/archive/2016/index.json']
+
+
+def test_render_first_screen_items():
+    product_data = copy.deepcopy(mock_product_data)
+    build_data = project_records(Build, [
+        dict(mock_build_1322_data, slug='1'),
+        dict(mock_build_1322_data, slug='2')])
+
+    html = render_build_dashboard(product_data, build_data,
+                                  first_screen_items=1)
+    assert html.count('inventory-list__item') == 1
+    assert 'data-dasher-list="builds"' in html
+    assert 'data-dasher-offset="1"' in html
+    assert 'dasher-lists.js' in html
+
+    # Short lists are rendered in full, without the script
+    html = render_build_dashboard(product_data, build_data,
+                                  first_screen_items=2)
+    assert html.count('inventory-list__item') == 2
+    assert 'dasher-lists.js' not in html
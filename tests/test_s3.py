@@ -0,0 +1,93 @@
+"""Test app.s3."""
+
+import boto3
+from botocore.stub import ANY, Stubber
+
+from app.s3 import (DIGEST_METADATA_KEY, compute_digest, open_bucket,
+                    upload_object_if_changed)
+
+
+def _open_bucket():
+    session = boto3.session.Session(aws_access_key_id='test',
+                                    aws_secret_access_key='test',
+                                    region_name='us-east-1')
+    return session.resource('s3').Bucket('test-bucket')
+
+
+def test_compute_digest():
+    digest = compute_digest('<html></html>', {'surrogate-key': 'a'},
+                            acl='public-read')
+    assert digest == compute_digest(b'<html></html>', {'surrogate-key': 'a'},
+                                    acl='public-read')
+    # Metadata and headers are part of the digest
+    assert digest != compute_digest('<html></html>', {'surrogate-key': 'b'},
+                                    acl='public-read')
+    assert digest != compute_digest('<html></html>', {'surrogate-key': 'a'})
+
+
+def test_upload_object_if_changed():
+    bucket = _open_bucket()
+    metadata = {'surrogate-key': 'a'}
+    digest = compute_digest('<html></html>', metadata, acl=None,
+                            cache_control=None, content_type='text/html')
+    head_params = {'Bucket': 'test-bucket', 'Key': 'test/v/index.html'}
+
+    with Stubber(bucket.meta.client) as stubber:
+        # Object doesn't exist yet
+        stubber.add_client_error('head_object', service_error_code='404',
+                                 http_status_code=404,
+                                 expected_params=head_params)
+        stubber.add_response(
+            'put_object', {},
+            {'Bucket': 'test-bucket', 'Key': 'test/v/index.html',
+             'Body': ANY, 'ContentType': 'text/html',
+             'Metadata': {'surrogate-key': 'a',
+                          DIGEST_METADATA_KEY: digest}})
+        # Object exists with the same digest
+        stubber.add_response(
+            'head_object', {'Metadata': {DIGEST_METADATA_KEY: digest}},
+            head_params)
+
+        assert upload_object_if_changed('test/v/index.html', bucket,
+                                        content='<html></html>',
+                                        metadata=metadata,
+                                        content_type='text/html')
+        assert not upload_object_if_changed('test/v/index.html', bucket,
+                                            content='<html></html>',
+                                            metadata=metadata,
+                                            content_type='text/html')
+        stubber.assert_no_pending_responses()
+
+
+def test_upload_object_if_changed_encoding():
+    bucket = _open_bucket()
+    content = b'compressed'
+    digest = compute_digest(content, None, acl=None, cache_control=None,
+                            content_type='application/json',
+                            content_encoding='gzip')
+
+    with Stubber(bucket.meta.client) as stubber:
+        stubber.add_client_error('head_object', service_error_code='404',
+                                 http_status_code=404)
+        stubber.add_response(
+            'put_object', {},
+            {'Bucket': 'test-bucket', 'Key': 'test/v/index.json',
+             'Body': ANY, 'ContentType': 'application/json',
+             'ContentEncoding': 'gzip',
+             'Metadata': {DIGEST_METADATA_KEY: digest}})
+
+        assert upload_object_if_changed('test/v/index.json', bucket,
+                                        content=content,
+                                        content_type='application/json',
+                                        content_encoding='gzip')
+        stubber.assert_no_pending_responses()
+
+
+def test_open_bucket():
+    bucket = open_bucket('test-bucket', 'id', 'secret',
+                         max_pool_connections=5)
+    assert open_bucket('test-bucket', 'id', 'secret',
+                       max_pool_connections=5) is bucket
+    assert open_bucket('test-bucket', 'id2', 'secret',
+                       max_pool_connections=5) is not bucket
+    assert bucket.meta.client.meta.config.max_pool_connections == 5
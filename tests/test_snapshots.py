@@ -0,0 +1,33 @@
+"""Test app.dashboard.snapshots."""
+
+from app.dashboard.records import Build, project_records
+from app.dashboard.snapshots import (SnapshotStore, diff_datasets,
+                                     make_snapshot)
+
+
+def _builds(*slugs, **refs):
+    return project_records(Build, [
+        {'slug': slug, 'git_refs': [refs.get(slug, 'master')],
+         'date_created': '2017-02-03T23:51:08Z'}
+        for slug in slugs])
+
+
+def test_diff_datasets():
+    snapshot = make_snapshot('key', {}, _builds('1', '2', '3'), {})
+    fresh = _builds('2', '3', '4', **{'3': 'tickets/DM-1'})
+
+    diff = diff_datasets(snapshot['builds'], fresh)
+
+    assert diff == {'added': ['4'], 'changed': ['3'], 'removed': ['1']}
+
+
+def test_snapshot_store(tmpdir):
+    store = SnapshotStore(str(tmpdir))
+    assert store.load('test-059') is None
+
+    snapshot = make_snapshot('key', {}, _builds('1'),
+                             {'builds/index.html': '<html/>'})
+    store.save('test-059', snapshot)
+
+    assert store.load('test-059') == snapshot
+    assert tmpdir.listdir() == [tmpdir.join('test-059.json')]
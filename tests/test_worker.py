@@ -0,0 +1,193 @@
+"""Test app.worker."""
+
+import pytest
+
+import copy
+import datetime
+
+from app import worker
+from app.dashboard.records import Build, Edition, project_records
+from app.dashboard.snapshots import get_snapshot_store, make_snapshot
+from app.exceptions import BuildCancelled
+from app.jobs import ProductBuild
+
+from .test_build_endpoint import (mock_product_data, mock_edition_388_data,
+                                  mock_build_1322_data)
+
+
+@pytest.fixture
+def publish_config(empty_app):
+    config = dict(empty_app.config)
+    config['TESTING'] = False
+    return config
+
+
+def test_publish_dashboards(monkeypatch, publish_config):
+    uploads = []
+
+    def fake_upload(*args):
+        uploads.append(args)
+        return len(uploads) == 1
+
+    monkeypatch.setattr(worker, 'upload_static_assets',
+                        lambda *args: False)
+    monkeypatch.setattr(worker, 'upload_html_data', fake_upload)
+    monkeypatch.setattr(worker, 'upload_dir_redirect_object', fake_upload)
+    monkeypatch.setattr(worker, 'upload_json_data', fake_upload)
+
+    changed_keys = worker.publish_dashboards(
+        {'v/index.html': '<html></html>', 'builds/index.html': '<html/>',
+         'builds/archive/2017/index.html': '<html/>',
+         'builds/archive/2017/index.json': '{}'},
+        {'slug': 'test-059', 'surrogate_key': 'abc'}, publish_config)
+
+    # JSON data has no directory redirect object
+    assert len(uploads) == 7
+    # Only the edition dashboard changed, so the archive key isn't purged
+    assert changed_keys == {'dasher-abc'}
+
+
+def test_publish_dashboards_failure(monkeypatch, publish_config):
+    uploads = []
+
+    def failed_upload(*args):
+        raise RuntimeError('upload failed')
+
+    monkeypatch.setattr(worker, 'upload_static_assets', failed_upload)
+    monkeypatch.setattr(worker, 'upload_html_data',
+                        lambda *args: uploads.append(args))
+    monkeypatch.setattr(worker, 'upload_dir_redirect_object',
+                        lambda *args: uploads.append(args))
+
+    with pytest.raises(RuntimeError):
+        worker.publish_dashboards({'v/index.html': '<html></html>'},
+                                  {'slug': 'test-059', 'surrogate_key': 'abc'},
+                                  publish_config)
+
+    # Other uploads still finish before the error is raised
+    assert len(uploads) == 2
+
+
+def test_publish_dashboards_cancelled(monkeypatch, publish_config):
+    uploads = []
+    monkeypatch.setattr(worker, 'upload_static_assets',
+                        lambda *args: uploads.append(args))
+    monkeypatch.setattr(worker, 'upload_html_data',
+                        lambda *args: uploads.append(args))
+    monkeypatch.setattr(worker, 'upload_dir_redirect_object',
+                        lambda *args: uploads.append(args))
+
+    product_build = ProductBuild('https://keeper.lsst.codes/products/test')
+    product_build.supersede()
+    with pytest.raises(BuildCancelled):
+        worker.publish_dashboards({'v/index.html': '<html></html>'},
+                                  {'slug': 'test-059', 'surrogate_key': 'abc'},
+                                  publish_config,
+                                  product_build=product_build)
+
+    assert uploads == []
+
+
+def test_find_legacy_surrogate_key(monkeypatch, publish_config):
+    stored_metadata = {}
+    monkeypatch.setattr(worker, 'open_product_bucket', lambda *args: None)
+    monkeypatch.setattr(worker, 'get_stored_metadata',
+                        lambda bucket, path: stored_metadata[path])
+
+    legacy_product = {'slug': 'legacy', 'surrogate_key': 'abc',
+                      'bucket_name': 'test-bucket'}
+    stored_metadata['legacy/v/index.html'] = {'surrogate-key': 'abc'}
+    assert worker.find_legacy_surrogate_key(
+        legacy_product, publish_config) == 'abc'
+
+    new_product = {'slug': 'new', 'surrogate_key': 'def',
+                   'bucket_name': 'test-bucket'}
+    stored_metadata['new/v/index.html'] = {
+        'surrogate-key': worker.get_dashboard_surrogate_key(new_product)}
+    assert worker.find_legacy_surrogate_key(
+        new_product, publish_config) is None
+    # The result is remembered without another HEAD request
+    del stored_metadata['new/v/index.html']
+    assert worker.find_legacy_surrogate_key(
+        new_product, publish_config) is None
+
+
+def test_get_dashboard_surrogate_control(publish_config):
+    publish_config['FASTLY_SOFT_PURGE'] = False
+    assert worker.get_dashboard_surrogate_control(publish_config) \
+        == 'max-age=31536000'
+
+    publish_config['FASTLY_SOFT_PURGE'] = True
+    publish_config['DASHBOARD_STALE_WHILE_REVALIDATE'] = 60
+    publish_config['DASHBOARD_STALE_IF_ERROR'] = 3600
+    assert worker.get_dashboard_surrogate_control(publish_config) \
+        == ('max-age=31536000, stale-while-revalidate=60, '
+            'stale-if-error=3600')
+
+
+def test_render_dashboards_incremental(tmpdir, publish_config):
+    publish_config['DATASET_SNAPSHOT_DIR'] = str(tmpdir)
+    publish_config['SHARED_ASSETS_URL'] = None
+
+    def make_datasets(*builds):
+        return {'product_url': mock_product_data['self_url'],
+                'product_data': copy.deepcopy(mock_product_data),
+                'edition_data': project_records(Edition,
+                                                [mock_edition_388_data]),
+                'build_data': project_records(Build, builds)}
+
+    # Without a snapshot, all pages are rendered; the 2017 build is on
+    # that year's archive page
+    product_build = ProductBuild(mock_product_data['self_url'])
+    dashboards = worker.render_dashboards(
+        make_datasets(mock_build_1322_data), publish_config, product_build)
+    assert product_build.log[-1]['snapshot'] is False
+    assert sorted(dashboards['pages']) == [
+        'builds/archive/2017/index.html', 'builds/archive/2017/index.json',
+        'builds/index.html', 'builds/index.json',
+        'v/index.html', 'v/index.json']
+    assert '/builds/archive/2017/' in dashboards['pages']['builds/index.html']
+    get_snapshot_store(publish_config).save(
+        'test-059',
+        make_snapshot(dashboards['render_key'], dashboards['edition_data'],
+                      dashboards['build_data'], dashboards['pages'],
+                      page_keys=dashboards['page_keys']))
+
+    # A new build only re-renders the recent build dashboard
+    new_build = dict(mock_build_1322_data, slug='2',
+                     date_created=datetime.datetime.now().strftime(
+                         '%Y-%m-%dT%H:%M:%SZ'))
+    product_build = ProductBuild(mock_product_data['self_url'])
+    new_dashboards = worker.render_dashboards(
+        make_datasets(mock_build_1322_data, new_build), publish_config,
+        product_build)
+
+    event = product_build.log[-1]
+    assert event['event'] == 'dataset_diff'
+    assert event['builds']['added'] == 1
+    assert event['builds']['slugs'] == {'added': ['2']}
+    assert event['editions'] == {'added': 0, 'changed': 0, 'removed': 0,
+                                 'slugs': {}}
+    assert event['reused_pages'] == ['builds/archive/2017/index.html',
+                                     'v/index.html']
+    assert new_dashboards['pages']['v/index.html'] \
+        == dashboards['pages']['v/index.html']
+    assert new_dashboards['pages']['builds/index.html'] \
+        != dashboards['pages']['builds/index.html']
+
+
+def test_archive_object_settings(publish_config):
+    product_data = {'slug': 'test-059', 'surrogate_key': 'abc'}
+    publish_config['BUILD_ARCHIVE_MAX_AGE'] = 3600
+
+    settings = worker._dashboard_object_settings(
+        product_data, publish_config,
+        archive=worker.is_archive_page('builds/archive/2017/index.html'))
+    assert settings['metadata']['surrogate-key'] == 'dasher-archive-abc'
+    assert settings['cache_control'] == 'public, max-age=3600'
+
+    settings = worker._dashboard_object_settings(
+        product_data, publish_config,
+        archive=worker.is_archive_page('builds/index.html'))
+    assert settings['metadata']['surrogate-key'] == 'dasher-abc'
+    assert settings['cache_control'] == 'no-cache'